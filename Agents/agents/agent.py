@@ -43,7 +43,7 @@ rag_insight_agent = LlmAgent(
     name="rag_insight_agent",
     model="gemini-2.5-pro",
     description="Gathers deep understanding of a user's problem by searching two knowledge bases: one with similar anonymized conversations and another with expert advice from textbooks.",
-    instruction="To understand the user's query, you must use BOTH search_similar_conversations AND search_counselor_textbooks. After getting results from both, synthesize them into a single, comprehensive insight.",
+    instruction="To understand the user's query, call search_knowledge_bases_async once; it searches BOTH the similar conversations AND the counselor textbooks. Only use search_similar_conversations_async or search_counselor_textbooks_async for a follow-up search of a single source. If a source is listed as unavailable, work with the results you have. Synthesize the results from both sources into a single, comprehensive insight.",
     tools=rag_tools
 )
 
@@ -54,7 +54,7 @@ Your process is very strict:
 1.  For any user query that involves a date or a time range (like 'today', 'next week', 'what exams are coming up?'), you MUST first call the get_current_datetime tool to get the current date.
 2.  Use the date_iso_format value from the output of get_current_datetime as your anchor for "today".
 3.  Based on that current date, calculate the required start and end dates for the user's query. For example, if today is 2025-09-15 and the user asks 'what's happening next week?', you calculate the start_date as 2025-09-15 and the end_date as 2025-09-22.
-4.  Finally, call the appropriate academic calendar tool (get_events_by_type or get_events_in_duration) with the calculated dates.
+4.  Finally, call the appropriate academic calendar tool (get_events_by_type or get_events_in_duration) with the calculated dates. If the question needs more than one lookup (e.g. next week's events and all upcoming exams), make a single get_events_batch call with one entry per lookup instead.
 """
 
 college_schedule_agent = LlmAgent(
@@ -0,0 +1,631 @@
+# src/aura_agent/ann_index.py
+# In-process approximate nearest-neighbour replica of a TiDB vector table (IVF, NumPy only).
+# The index lives on disk and is memory-mapped; refresh() pulls changed rows from TiDB.
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, so give each process its own ANN_INDEX_DIR
+    fcntl = None
+
+# --- Configuration ---
+DEFAULT_INDEX_DIR = Path(os.environ.get("ANN_INDEX_DIR", Path.home() / ".cache" / "aura_ann"))
+INDEX_SUFFIX = ".ann"
+FORMAT_VERSION = 1
+# Inverted lists probed per query; more lists means higher recall and more vectors scored
+DEFAULT_NPROBE = int(os.environ.get("ANN_NPROBE", 16))
+# Compact scan copy of the vectors: a Matryoshka prefix of this many dimensions and/or int8 codes.
+# Lists are scanned on the copy and the best k * ANN_RERANK_FACTOR candidates re-ranked on full vectors,
+# which stay on disk and are only paged in for those candidates. int8 codes take a quarter of the
+# memory but scan somewhat slower than float32, since every query widens them back to float32.
+ANN_SCAN_DIM = int(os.environ["ANN_SCAN_DIM"]) if os.environ.get("ANN_SCAN_DIM") else None
+ANN_QUANTIZE = os.environ.get("ANN_QUANTIZE", "none")
+RERANK_FACTOR = int(os.environ.get("ANN_RERANK_FACTOR", 4))
+# Seconds before the watermark that each refresh reads again, so rows committed late (stamped
+# before a refresh but invisible to it, e.g. a bulk load in flight) are still picked up.
+# Unchanged rows in the window are recognized by digest and skipped.
+REFRESH_OVERLAP = float(os.environ.get("ANN_REFRESH_OVERLAP", 300))
+# Fold the delta segments back into one once there are more than this many
+MAX_SEGMENTS = 8
+KMEANS_ITERATIONS = 12
+# Centroids are trained on at most this many rows
+KMEANS_SAMPLE = 50_000
+_ASSIGN_BATCH = 4096
+# int8 scan rows widened to float32 at a time
+_SCAN_BLOCK = 1024
+_ID_DTYPE = "S36"
+
+
+@dataclass
+class AnnResult:
+    """Same fields as tidb_vector's QueryResult, so the tools format both alike"""
+    id: str
+    document: str
+    metadata: dict
+    distance: float
+
+
+def default_nlist(count: int) -> int:
+    """Roughly 4 * sqrt(n) lists, the usual IVF rule of thumb"""
+    return int(max(1, min(count, round(4 * np.sqrt(max(count, 1))))))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (by inner product) of each normalized vector"""
+    lists = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _ASSIGN_BATCH):
+        lists[start:start + _ASSIGN_BATCH] = np.argmax(vectors[start:start + _ASSIGN_BATCH] @ centroids.T, axis=1)
+    return lists
+
+
+def scan_query(query: np.ndarray, scan_dim: Optional[int]) -> np.ndarray:
+    """The normalized query in the scan copy's space (its first ``scan_dim`` dimensions)"""
+    return query if scan_dim is None else _normalize(query[:scan_dim])
+
+
+def encode_scan(vectors: np.ndarray, scan_dim: Optional[int], quantize: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Compact scan copy of normalized vectors: (float32 prefix or int8 codes, per-row int8 scales)"""
+    scan = vectors if scan_dim is None else _normalize(vectors[:, :scan_dim])
+    if quantize == "none":
+        return np.ascontiguousarray(scan, dtype=np.float32), None
+    if quantize != "int8":
+        raise ValueError(f"Unknown quantization {quantize!r} (expected 'none' or 'int8')")
+    # Symmetric per-vector scale: the largest coordinate maps to +/-127
+    scales = np.abs(scan).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(scan / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def scan_scores(scan: np.ndarray, scales: Optional[np.ndarray], query: np.ndarray) -> np.ndarray:
+    """Approximate inner products of a scan copy (rows) with a scan-space query"""
+    query = np.asarray(query, dtype=np.float32)
+    if scan.dtype == np.float32:
+        scores = scan @ query
+    else:
+        # Widen int8 codes a block at a time into one cache-sized buffer; converting the
+        # whole scan per query cost more than scanning float32 directly
+        scores = np.empty(len(scan), dtype=np.float32)
+        block = np.empty((min(_SCAN_BLOCK, len(scan)), scan.shape[1]), dtype=np.float32)
+        for start in range(0, len(scan), _SCAN_BLOCK):
+            stop = min(start + _SCAN_BLOCK, len(scan))
+            rows = block[:stop - start]
+            np.copyto(rows, scan[start:stop], casting='unsafe')
+            np.dot(rows, query, out=scores[start:stop])
+    return scores * scales if scales is not None else scores
+
+
+def train_centroids(vectors: np.ndarray, nlist: int, iterations: int = KMEANS_ITERATIONS,
+                    seed: int = 0) -> np.ndarray:
+    """Spherical k-means over (a sample of) normalized vectors"""
+    rng = np.random.default_rng(seed)
+    if len(vectors) > KMEANS_SAMPLE:
+        vectors = vectors[np.sort(rng.choice(len(vectors), KMEANS_SAMPLE, replace=False))]
+    vectors = np.asarray(vectors, dtype=np.float32)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        lists = _assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, lists, vectors)
+        counts = np.bincount(lists, minlength=nlist)
+        # Re-seed empty lists with random rows so every list stays in use
+        empty = np.flatnonzero(counts == 0)
+        sums[empty] = vectors[rng.choice(len(vectors), len(empty))]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class _Segment:
+    """One immutable batch of rows, grouped by inverted list
+
+    Files: ``vectors.npy`` (normalized float32, rows of list l at
+    ``list_offsets[l]:list_offsets[l + 1]``), ``ids.npy`` and
+    ``payload.bin`` + ``payload_offsets.npy`` (JSON ``[document, metadata]`` per row).
+    With a compact scan copy also ``scan.npy`` in the same row order (and
+    ``scan_scales.npy`` for int8 codes).
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.vectors = np.load(path / "vectors.npy", mmap_mode='r')
+        self.ids = np.load(path / "ids.npy", mmap_mode='r')
+        self.list_offsets = np.load(path / "list_offsets.npy")
+        self.payload_offsets = np.load(path / "payload_offsets.npy", mmap_mode='r')
+        payload_path = path / "payload.bin"
+        self._payload = (np.memmap(payload_path, dtype=np.uint8, mode='r')
+                         if payload_path.stat().st_size else np.zeros(0, dtype=np.uint8))
+        self.scan = np.load(path / "scan.npy", mmap_mode='r') if (path / "scan.npy").exists() else None
+        self.scan_scales = (np.load(path / "scan_scales.npy", mmap_mode='r')
+                            if (path / "scan_scales.npy").exists() else None)
+        self.live = np.ones(len(self.ids), dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def payload(self, row: int) -> Tuple[str, dict]:
+        blob = self._payload[self.payload_offsets[row]:self.payload_offsets[row + 1]].tobytes()
+        document, metadata = json.loads(blob.decode('utf-8'))
+        return document, metadata
+
+    @staticmethod
+    def write(path: Path, centroids: np.ndarray, ids: Sequence[str], vectors: np.ndarray,
+              payloads: Sequence[Tuple[str, dict]], scan_dim: Optional[int] = None, quantize: str = "none"):
+        vectors = _normalize(vectors)
+        lists = _assign(vectors, centroids)
+        order = np.argsort(lists, kind='stable')
+        list_offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(lists, minlength=len(centroids)), out=list_offsets[1:])
+
+        path.mkdir(parents=True)
+        np.save(path / "vectors.npy", vectors[order])
+        np.save(path / "ids.npy", np.array([ids[i] for i in order], dtype=_ID_DTYPE))
+        np.save(path / "list_offsets.npy", list_offsets)
+        if scan_dim is not None or quantize != "none":
+            scan, scales = encode_scan(vectors[order], scan_dim, quantize)
+            np.save(path / "scan.npy", scan)
+            if scales is not None:
+                np.save(path / "scan_scales.npy", scales)
+        encoded = [json.dumps(payloads[i], ensure_ascii=False, default=str).encode('utf-8') for i in order]
+        with open(path / "payload.bin", 'wb') as f:
+            for blob in encoded:
+                f.write(blob)
+        payload_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(np.array([len(blob) for blob in encoded], dtype=np.int64), out=payload_offsets[1:])
+        np.save(path / "payload_offsets.npy", payload_offsets)
+
+
+class IvfIndex:
+    """Inverted-file index over cosine similarity, stored as a directory
+
+      - ``meta.json``: dimension, scan copy settings, segment names, refresh state, deleted ids
+      - ``centroids.npy``: nlist x dim normalized float32
+      - ``seg-NNNNNN/``: one _Segment per build or refresh
+
+    A row in an older segment is superseded by the same id in a newer one, and
+    dropped if its id is in ``deleted``. Writers replace ``meta.json``
+    atomically, so an open index keeps serving until it is reopened.
+
+    Several processes may share an index directory: open it with open_index()
+    and write it (build, append, compact) only while holding index_lock().
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path / "meta.json", 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported ANN index version {self.meta.get('format_version')} in {self.path}")
+        self.dim: int = self.meta["dim"]
+        self.scan_dim: Optional[int] = self.meta.get("scan_dim")
+        self.quantize: str = self.meta.get("quantize", "none")
+        self.centroids = np.load(self.path / "centroids.npy")
+        self.segments = [_Segment(self.path / name) for name in self.meta["segments"]]
+        self._mark_live(set(self.meta.get("deleted", [])))
+
+    def _mark_live(self, deleted: set):
+        seen = np.array(sorted(deleted), dtype=_ID_DTYPE)
+        for segment in reversed(self.segments):
+            segment.live = ~np.isin(segment.ids, seen)
+            seen = np.union1d(seen, segment.ids)
+
+    def matches(self, scan_dim: Optional[int], quantize: str) -> bool:
+        """True if the index was built with these scan copy settings"""
+        if scan_dim is not None and scan_dim >= self.dim:
+            scan_dim = None
+        return self.scan_dim == scan_dim and self.quantize == quantize
+
+    def scan_bytes(self) -> int:
+        """Bytes a full scan touches: the compact copy if there is one, else the full vectors"""
+        total = 0
+        for segment in self.segments:
+            for array in (segment.scan, segment.scan_scales) if segment.scan is not None else (segment.vectors,):
+                total += array.nbytes if array is not None else 0
+        return total
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def watermark(self) -> Optional[str]:
+        """Newest update_time replicated from TiDB"""
+        return self.meta.get("watermark")
+
+    @property
+    def recent_rows(self) -> Dict[str, List[str]]:
+        """[update_time, content digest] of the rows inside the window the next refresh re-reads"""
+        return self.meta.get("recent_rows", {})
+
+    def __len__(self) -> int:
+        return int(sum(segment.live.sum() for segment in self.segments))
+
+    def live_ids(self) -> np.ndarray:
+        return np.concatenate([segment.ids[segment.live] for segment in self.segments]
+                              or [np.zeros(0, dtype=_ID_DTYPE)])
+
+    def _results(self, hits: List[Tuple[float, int, int]]) -> List[AnnResult]:
+        results = []
+        for score, segment_index, row in hits:
+            segment = self.segments[segment_index]
+            document, metadata = segment.payload(row)
+            results.append(AnnResult(segment.ids[row].decode('ascii'), document, metadata, 1.0 - float(score)))
+        return results
+
+    @staticmethod
+    def _top(candidates: List[Tuple[np.ndarray, int, np.ndarray]], k: int) -> List[Tuple[float, int, int]]:
+        """Best k of (scores, segment index, rows) candidate blocks"""
+        if not candidates:
+            return []
+        scores = np.concatenate([block[0] for block in candidates])
+        segments = np.concatenate([np.full(len(block[0]), block[1]) for block in candidates])
+        rows = np.concatenate([block[2] for block in candidates])
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(scores[i], int(segments[i]), int(rows[i])) for i in best if np.isfinite(scores[i])]
+
+    def search(self, query_vector: Sequence[float], k: int = 5, nprobe: int = DEFAULT_NPROBE,
+               rerank: int = RERANK_FACTOR) -> List[AnnResult]:
+        """Approximate top-k by cosine distance, scanning the ``nprobe`` closest lists
+
+        With a compact scan copy the lists are scored on it, and the best
+        ``k * rerank`` candidates are re-scored on the full vectors.
+        """
+        query = _normalize(query_vector)
+        probe = np.argsort(-(self.centroids @ query))[:min(nprobe, self.nlist)]
+        compact = query if self.scan_dim is None else scan_query(query, self.scan_dim)
+        candidates = []
+        for segment_index, segment in enumerate(self.segments):
+            for list_id in probe:
+                start, stop = segment.list_offsets[list_id], segment.list_offsets[list_id + 1]
+                if start == stop:
+                    continue
+                if segment.scan is None:
+                    scores = segment.vectors[start:stop] @ query
+                else:
+                    scales = segment.scan_scales[start:stop] if segment.scan_scales is not None else None
+                    scores = scan_scores(segment.scan[start:stop], scales, compact)
+                scores[~segment.live[start:stop]] = -np.inf
+                candidates.append((scores, segment_index, np.arange(start, stop)))
+        if not any(segment.scan is not None for segment in self.segments):
+            return self._results(self._top(candidates, k))
+        shortlist = self._top(candidates, k * max(rerank, 1))
+        rescored = []
+        for segment_index in {s for _, s, _ in shortlist}:
+            rows = np.sort([row for _, s, row in shortlist if s == segment_index])
+            rescored.append((self.segments[segment_index].vectors[rows] @ query, segment_index, rows))
+        return self._results(self._top(rescored, k))
+
+    def exact_search(self, query_vector: Sequence[float], k: int = 5) -> List[AnnResult]:
+        """Brute-force top-k over every live row; the reference for recall measurements"""
+        query = _normalize(query_vector)
+        candidates = []
+        for segment_index, segment in enumerate(self.segments):
+            scores = np.asarray(segment.vectors) @ query
+            scores[~segment.live] = -np.inf
+            candidates.append((scores, segment_index, np.arange(len(segment))))
+        return self._results(self._top(candidates, k))
+
+    # --- Writing ---
+    @classmethod
+    def build(cls, path: Path, ids: Sequence[str], vectors: np.ndarray, payloads: Sequence[Tuple[str, dict]],
+              nlist: Optional[int] = None, sync: Optional[Dict] = None, scan_dim: Optional[int] = None,
+              quantize: str = "none") -> "IvfIndex":
+        """Train centroids and write a fresh single-segment index, replacing any existing one"""
+        path = Path(path)
+        vectors = _normalize(vectors)
+        if len(vectors) == 0:
+            raise ValueError("Cannot build an ANN index without vectors")
+        if scan_dim is not None and scan_dim >= vectors.shape[1]:
+            scan_dim = None
+        centroids = train_centroids(vectors, nlist or default_nlist(len(vectors)))
+
+        tmp_path = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+        np.save(tmp_path / "centroids.npy", centroids)
+        _Segment.write(tmp_path / "seg-000000", centroids, ids, vectors, payloads, scan_dim, quantize)
+        _write_meta(tmp_path, {
+            "format_version": FORMAT_VERSION,
+            "dim": int(vectors.shape[1]),
+            "scan_dim": scan_dim,
+            "quantize": quantize,
+            "segments": ["seg-000000"],
+            "next_segment": 1,
+            "deleted": [],
+            **(sync or {}),
+        })
+        shutil.rmtree(path, ignore_errors=True)
+        tmp_path.rename(path)
+        return cls(path)
+
+    def append(self, ids: Sequence[str], vectors: np.ndarray, payloads: Sequence[Tuple[str, dict]],
+               deleted: Sequence[str] = (), sync: Optional[Dict] = None) -> "IvfIndex":
+        """Add new/changed rows as a new segment and drop ``deleted`` ids; returns the reopened index
+
+        ``sync`` holds refresh state (watermark) to record along with the change.
+        """
+        meta = dict(self.meta)
+        if len(ids):
+            name = f"seg-{meta['next_segment']:06d}"
+            _Segment.write(self.path / name, self.centroids, ids, vectors, payloads, self.scan_dim, self.quantize)
+            meta["segments"] = meta["segments"] + [name]
+            meta["next_segment"] += 1
+        # Re-added ids live again in the new segment, which supersedes older copies anyway
+        meta["deleted"] = sorted((set(meta.get("deleted", [])) | set(deleted)) - set(ids))
+        meta.update(sync or {})
+        _write_meta(self.path, meta)
+        index = type(self)(self.path)
+        if len(index.segments) > MAX_SEGMENTS:
+            index = index.compact()
+        return index
+
+    def compact(self) -> "IvfIndex":
+        """Merge the live rows of every segment into one, keeping the trained centroids"""
+        ids, vectors, payloads = [], [], []
+        for segment in self.segments:
+            rows = np.flatnonzero(segment.live)
+            ids.extend(segment.ids[rows].astype(str))
+            vectors.append(np.asarray(segment.vectors[rows]))
+            payloads.extend(segment.payload(row) for row in rows)
+        meta = dict(self.meta)
+        name = f"seg-{meta['next_segment']:06d}"
+        _Segment.write(self.path / name, self.centroids, ids,
+                       np.concatenate(vectors) if vectors else np.zeros((0, self.dim), dtype=np.float32), payloads,
+                       self.scan_dim, self.quantize)
+        old_segments = meta["segments"]
+        meta.update(segments=[name], next_segment=meta["next_segment"] + 1, deleted=[])
+        _write_meta(self.path, meta)
+        # Open maps keep the unlinked files readable until they are closed
+        for old in old_segments:
+            shutil.rmtree(self.path / old, ignore_errors=True)
+        return type(self)(self.path)
+
+
+@contextmanager
+def index_lock(path: Path, exclusive: bool = True):
+    """flock on ``<index>.lock`` beside the index directory, which build() replaces wholesale
+
+    Writers hold it exclusively from reading meta.json until the new one is in
+    place, so two refreshes never pick the same segment name and a compaction
+    never deletes segments another process is still opening.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + ".lock"), 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        # Closing the file releases the lock
+        yield
+
+
+def open_index(path: Path) -> Optional[IvfIndex]:
+    """The index at ``path``, opened under a shared lock, or None if there is none"""
+    with index_lock(path, exclusive=False):
+        if not (Path(path) / "meta.json").exists():
+            return None
+        return IvfIndex(path)
+
+
+def _write_meta(path: Path, meta: Dict):
+    tmp = path / "meta.json.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp, path / "meta.json")
+
+
+# --- TiDB replica ---
+_ID_BATCH = 1000
+
+
+class VectorTable:
+    """The columns of a TiDBVectorClient table that the replica reads, on an engine of its own"""
+
+    def __init__(self, connection_string: str, table_name: str, engine_args: Optional[Dict] = None):
+        import sqlalchemy
+        from tidb_vector.sqlalchemy import VectorType
+
+        self.name = table_name
+        self.engine = sqlalchemy.create_engine(connection_string, **(engine_args or {}))
+        self.table = sqlalchemy.Table(
+            table_name, sqlalchemy.MetaData(),
+            sqlalchemy.Column("id", sqlalchemy.String(36), primary_key=True),
+            sqlalchemy.Column("embedding", VectorType()),
+            sqlalchemy.Column("document", sqlalchemy.Text),
+            sqlalchemy.Column("meta", sqlalchemy.JSON),
+            sqlalchemy.Column("update_time", sqlalchemy.DateTime),
+        )
+
+
+def _fetch_rows(source: VectorTable, since: Optional[datetime] = None, ids: Optional[Sequence[str]] = None):
+    """(ids, vectors, payloads, update_time stamps) of the rows updated at or after ``since``, or with these ``ids``"""
+    import sqlalchemy
+
+    table = source.table
+    query = sqlalchemy.select(table.c.id, table.c.embedding, table.c.document, table.c.meta, table.c.update_time)
+    if ids is not None:
+        queries = [query.where(table.c.id.in_(ids[start:start + _ID_BATCH]))
+                   for start in range(0, len(ids), _ID_BATCH)]
+    elif since is not None:
+        queries = [query.where(table.c.update_time >= since)]
+    else:
+        queries = [query]
+    fetched_ids, vectors, payloads, stamps = [], [], [], []
+    with source.engine.connect() as conn:
+        for statement in queries:
+            for row in conn.execution_options(stream_results=True, yield_per=1000).execute(statement):
+                fetched_ids.append(row.id)
+                vectors.append(np.asarray(row.embedding, dtype=np.float32))
+                payloads.append((row.document, row.meta))
+                stamps.append(row.update_time.isoformat() if row.update_time is not None else None)
+    return fetched_ids, vectors, payloads, stamps
+
+
+def _row_digest(vector: np.ndarray, payload: Tuple[str, dict]) -> str:
+    digest = hashlib.sha256(vector.tobytes())
+    digest.update(json.dumps(payload, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()[:32]
+
+
+def _sync_state(ids, vectors, payloads, stamps, previous: Optional[Dict] = None,
+                overlap: float = REFRESH_OVERLAP) -> Dict:
+    """Watermark after replicating these rows, with digests of the rows the next refresh re-reads"""
+    previous = previous or {}
+    recent = dict(previous.get("recent_rows", {}))
+    for row_id, vector, payload, stamp in zip(ids, vectors, payloads, stamps):
+        if stamp is not None:
+            recent[row_id] = [stamp, _row_digest(vector, payload)]
+    known = [stamp for stamp in [previous.get("watermark")] + list(stamps) if stamp is not None]
+    if not known:
+        return {"watermark": None, "recent_rows": {}}
+    newest = max(known, key=datetime.fromisoformat)
+    cutoff = datetime.fromisoformat(newest) - timedelta(seconds=overlap)
+    recent = {row_id: entry for row_id, entry in recent.items() if datetime.fromisoformat(entry[0]) >= cutoff}
+    return {"watermark": newest, "recent_rows": recent}
+
+
+def _stack(vectors: List[np.ndarray]) -> np.ndarray:
+    if not vectors:
+        # A refresh that only deletes rows
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.array(vectors, dtype=np.float32).reshape(len(vectors), -1)
+
+
+def _fetch_ids(source: VectorTable) -> set:
+    import sqlalchemy
+
+    with source.engine.connect() as conn:
+        return {row.id for row in conn.execute(sqlalchemy.select(source.table.c.id))}
+
+
+def refresh_from_tidb(path: Path, source: VectorTable, rebuild: bool = False, scan_dim: Optional[int] = None,
+                      quantize: str = "none", overlap: float = REFRESH_OVERLAP) -> Optional[IvfIndex]:
+    """Build the index from a vector table, or bring an existing one up to date
+
+    An update fetches the rows whose update_time is at most ``overlap`` seconds
+    before the watermark or newer, skipping the ones already replicated
+    unchanged (by digest), so an idle table writes nothing. The id column is
+    compared with the index to drop deleted rows and to fetch rows that were
+    never replicated, whatever their update_time. An index with different scan
+    copy settings is rebuilt. Returns None, writing nothing, when there is no
+    index to update and the table is still empty. Holds index_lock()
+    throughout, so concurrent refreshes of a shared index run one after the other.
+    """
+    path = Path(path)
+    with index_lock(path):
+        index = None if rebuild or not (path / "meta.json").exists() else IvfIndex(path)
+        if index is not None and not index.matches(scan_dim, quantize):
+            index = None
+        if index is None:
+            ids, vectors, payloads, stamps = _fetch_rows(source)
+            if not ids:
+                return None
+            sync = _sync_state(ids, vectors, payloads, stamps, overlap=overlap)
+            return IvfIndex.build(path, ids, _stack(vectors), payloads, sync=sync, scan_dim=scan_dim,
+                                  quantize=quantize)
+
+        since = (datetime.fromisoformat(index.watermark) - timedelta(seconds=overlap)
+                 if index.watermark is not None else None)
+        fetched = _fetch_rows(source, since)
+        recent = index.recent_rows
+        changed = [i for i, (row_id, vector, payload, stamp) in enumerate(zip(*fetched))
+                   if recent.get(row_id, [None, None])[1] != _row_digest(vector, payload)]
+        ids, vectors, payloads, stamps = ([column[i] for i in changed] for column in fetched)
+
+        table_ids = _fetch_ids(source)
+        live = set(index.live_ids().astype(str))
+        deleted = live - table_ids
+        missing = sorted(table_ids - live - set(fetched[0]))
+        if missing:
+            for column, values in zip((ids, vectors, payloads, stamps), _fetch_rows(source, ids=missing)):
+                column.extend(values)
+        if not ids and not deleted:
+            return index
+        # A deleted id that comes back must not be skipped as "already replicated"
+        previous = {"watermark": index.watermark,
+                    "recent_rows": {row_id: entry for row_id, entry in recent.items() if row_id not in deleted}}
+        sync = _sync_state(ids, vectors, payloads, stamps, previous, overlap)
+        return index.append(ids, _stack(vectors), payloads, sorted(deleted), sync)
+
+
+class AnnReplica:
+    """Drop-in for TiDBVectorClient.query served from a local IvfIndex
+
+    The index is built on first use if missing, then refreshed from TiDB in a
+    background thread every ``refresh_interval`` seconds (0 disables it).
+    Until the table has rows to build it from, queries go to ``fallback``
+    (e.g. the table's TiDBVectorClient), or return nothing without one.
+    """
+
+    def __init__(self, source: VectorTable, fallback=None, path: Optional[Path] = None,
+                 refresh_interval: float = 300, nprobe: int = DEFAULT_NPROBE,
+                 scan_dim: Optional[int] = ANN_SCAN_DIM, quantize: str = ANN_QUANTIZE):
+        self.source = source
+        self.fallback = fallback
+        self.path = Path(path or DEFAULT_INDEX_DIR / (source.name + INDEX_SUFFIX))
+        self.nprobe = nprobe
+        self.scan_dim = scan_dim
+        self.quantize = quantize
+        self.refresh_interval = refresh_interval
+        self._index: Optional[IvfIndex] = None
+        self._started = False
+        self._lock = threading.Lock()
+        self._refresher: Optional[threading.Thread] = None
+
+    def _ensure_index(self) -> Optional[IvfIndex]:
+        if not self._started:
+            with self._lock:
+                if not self._started:
+                    self._index = self._open_or_build()
+                    self._started = True
+                    if self.refresh_interval > 0:
+                        self._refresher = threading.Thread(target=self._refresh_loop, daemon=True,
+                                                           name=f"ann-refresh-{self.path.name}")
+                        self._refresher.start()
+        return self._index
+
+    def _open_or_build(self) -> Optional[IvfIndex]:
+        index = open_index(self.path)
+        if index is not None and index.matches(self.scan_dim, self.quantize):
+            return index
+        return self._refresh_from_tidb()
+
+    def _refresh_from_tidb(self) -> Optional[IvfIndex]:
+        return refresh_from_tidb(self.path, self.source, scan_dim=self.scan_dim, quantize=self.quantize)
+
+    def refresh(self):
+        with self._lock:
+            self._index = self._refresh_from_tidb()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"WARNING: ANN index refresh for {self.path.name} failed: {e}")
+
+    def query(self, query_vector: Sequence[float], k: int = 5, **kwargs) -> list:
+        index = self._ensure_index()
+        if index is None:
+            return self.fallback.query(query_vector, k=k, **kwargs) if self.fallback is not None else []
+        return index.search(query_vector, k, self.nprobe)
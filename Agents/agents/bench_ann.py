@@ -0,0 +1,120 @@
+# src/aura_agent/bench_ann.py
+# Recall and latency of the local IVF index (ann_index.py) against exact brute-force search.
+#
+#   python bench_ann.py --synthetic 50000 --dim 3072
+#   python bench_ann.py --synthetic 50000 --dim 3072 --scan-dim 768 --quantize int8
+#   TIDB_DATABASE_URL=... python bench_ann.py --table semantic_chunks_dataset --tidb
+#
+# With --table the index is built/refreshed from that TiDB vector table; --tidb also
+# times the same queries against TiDB's own vector search for comparison.
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from ann_index import DEFAULT_INDEX_DIR, INDEX_SUFFIX, IvfIndex, VectorTable, refresh_from_tidb
+
+
+def synthetic_index(path: Path, rows: int, dim: int, clusters: int, seed: int = 0,
+                    scan_dim: Optional[int] = None, quantize: str = "none") -> IvfIndex:
+    """Clustered random vectors, which (unlike uniform noise) resemble text embeddings"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, rows)] + 1.5 * rng.standard_normal((rows, dim)).astype(np.float32)
+    ids = [f"row-{i}" for i in range(rows)]
+    payloads = [(f"document {i}", {}) for i in range(rows)]
+    start = time.perf_counter()
+    index = IvfIndex.build(path, ids, vectors, payloads, scan_dim=scan_dim, quantize=quantize)
+    print(f"Built {rows} x {dim} index with {index.nlist} lists in {time.perf_counter() - start:.1f}s")
+    return index
+
+
+def sample_queries(index: IvfIndex, count: int, seed: int = 1) -> np.ndarray:
+    """Stored vectors plus noise, so each query has a realistic neighbourhood"""
+    rng = np.random.default_rng(seed)
+    vectors = np.concatenate([np.asarray(segment.vectors) for segment in index.segments])
+    picked = vectors[rng.choice(len(vectors), count, replace=False)]
+    return picked + 0.02 * rng.standard_normal(picked.shape).astype(np.float32)
+
+
+def timed(search, queries):
+    results, timings = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query))
+        timings.append(time.perf_counter() - start)
+    return results, timings
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def report(name: str, timings, recall=None):
+    recall_text = f"{recall:>9.3f}" if recall is not None else f"{'-':>9}"
+    print(f"{name:18} {recall_text} {statistics.median(timings) * 1e3:>9.2f} {percentile(timings, 0.95) * 1e3:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall/latency of the local ANN index vs exact search")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--synthetic", type=int, help="Build a synthetic index with this many rows")
+    source.add_argument("--table", help="Build/refresh the index from this TiDB vector table")
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32, 64])
+    parser.add_argument("--scan-dim", type=int, help="Scan a Matryoshka prefix of this many dimensions")
+    parser.add_argument("--quantize", choices=["none", "int8"], default="none", help="Scan int8 codes")
+    parser.add_argument("--rerank", type=int, default=4, help="Re-rank k * this many candidates on full vectors")
+    parser.add_argument("--tidb", action="store_true", help="Also time TiDB's vector search (--table only)")
+    args = parser.parse_args()
+
+    vector_store = None
+    if args.table:
+        from tidb_vector.integrations import TiDBVectorClient
+
+        vector_store = TiDBVectorClient(table_name=args.table, connection_string=os.environ['TIDB_DATABASE_URL'],
+                                        distance_strategy="cosine", drop_existing_table=False)
+        start = time.perf_counter()
+        index = refresh_from_tidb(DEFAULT_INDEX_DIR / (args.table + INDEX_SUFFIX),
+                                  VectorTable(os.environ['TIDB_DATABASE_URL'], args.table),
+                                  scan_dim=args.scan_dim, quantize=args.quantize)
+        if index is None:
+            raise SystemExit(f"Table {args.table} has no rows to index")
+        print(f"Refreshed {len(index)} rows ({index.nlist} lists) in {time.perf_counter() - start:.1f}s")
+    else:
+        index = synthetic_index(Path(tempfile.mkdtemp()) / ("synthetic" + INDEX_SUFFIX),
+                                args.synthetic, args.dim, args.clusters, scan_dim=args.scan_dim,
+                                quantize=args.quantize)
+    full_bytes = sum(segment.vectors.nbytes for segment in index.segments)
+    print(f"Scanned data: {index.scan_bytes() / 2**20:.1f} MiB (full vectors: {full_bytes / 2**20:.1f} MiB)")
+
+    queries = sample_queries(index, min(args.queries, len(index)))
+    exact, exact_timings = timed(lambda q: index.exact_search(q, args.k), queries)
+    truth = [{result.id for result in results} for results in exact]
+
+    print(f"\n{'search':18} {'recall@' + str(args.k):>9} {'p50 ms':>9} {'p95 ms':>9}")
+    report("exact (numpy)", exact_timings, 1.0)
+    for nprobe in args.nprobe:
+        found, timings = timed(lambda q: index.search(q, args.k, nprobe, args.rerank), queries)
+        recall = np.mean([len({r.id for r in results} & expected) / len(expected)
+                          for results, expected in zip(found, truth)])
+        report(f"ivf nprobe={nprobe}", timings, recall)
+    if args.tidb and vector_store is not None:
+        found, timings = timed(lambda q: vector_store.query(q.tolist(), k=args.k), queries)
+        recall = np.mean([len({r.id for r in results} & expected) / len(expected)
+                          for results, expected in zip(found, truth)])
+        report("tidb", timings, recall)
+
+
+if __name__ == "__main__":
+    main()
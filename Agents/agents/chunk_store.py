@@ -0,0 +1,119 @@
+# src/aura_agent/chunk_store.py
+# Compact columnar store for one book's semantic chunks, written by the chunker next to
+# its JSON/TXT outputs and memory-mapped by insertion and retrieval.
+
+import json
+import shutil
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+# --- Configuration ---
+STORE_SUFFIX = ".chunks"
+FORMAT_VERSION = 1
+
+
+def _ragged(rows: Sequence[Sequence], dtype) -> Tuple[np.ndarray, np.ndarray]:
+    """Flatten variable-length rows into a values array plus (n + 1) offsets"""
+    lengths = np.fromiter((len(row) for row in rows), dtype=np.int64, count=len(rows))
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    values = np.fromiter((value for row in rows for value in row), dtype=dtype, count=int(offsets[-1]))
+    return values, offsets
+
+
+class ChunkStore:
+    """Memory-mapped chunks of one book
+
+    A store is a directory (``<book>_semantic_chunks.chunks``) of flat files:
+      - ``meta.json``: book name, chunk count
+      - ``text.bin`` + ``text_offsets.npy``: UTF-8 texts back to back, chunk i is
+        ``text.bin[offsets[i]:offsets[i + 1]]``
+      - ``word_count.npy``, ``char_count.npy``: int32 per chunk
+      - ``original_indices.npy``/``similarity_scores.npy`` (+ ``*_offsets.npy``):
+        ragged per-chunk lists, flattened
+
+    Opening a store maps every file read-only, so it costs a few syscalls
+    regardless of book size; only the chunks that are read get paged in.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path / "meta.json", 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported chunk store version {self.meta.get('format_version')} in {self.path}")
+        self.book_name: str = self.meta["book_name"]
+
+        text_path = self.path / "text.bin"
+        # np.memmap refuses empty files
+        self._text = (np.memmap(text_path, dtype=np.uint8, mode='r')
+                      if text_path.stat().st_size else np.zeros(0, dtype=np.uint8))
+        self.text_offsets = self._load("text_offsets")
+        self.word_counts = self._load("word_count")
+        self.char_counts = self._load("char_count")
+        self.original_indices = self._load("original_indices")
+        self.original_offsets = self._load("original_indices_offsets")
+        self.similarity_scores = self._load("similarity_scores")
+        self.similarity_offsets = self._load("similarity_scores_offsets")
+
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(self.path / f"{name}.npy", mmap_mode='r')
+
+    def __len__(self) -> int:
+        return len(self.text_offsets) - 1
+
+    def text(self, i: int) -> str:
+        return self._text[self.text_offsets[i]:self.text_offsets[i + 1]].tobytes().decode('utf-8')
+
+    def record(self, i: int) -> Dict:
+        """Chunk i in the same shape as the chunker's JSON output"""
+        original = slice(self.original_offsets[i], self.original_offsets[i + 1])
+        scores = slice(self.similarity_offsets[i], self.similarity_offsets[i + 1])
+        return {
+            'chunk_id': i,
+            'text': self.text(i),
+            'word_count': int(self.word_counts[i]),
+            'char_count': int(self.char_counts[i]),
+            'original_indices': self.original_indices[original].tolist(),
+            'similarity_scores': self.similarity_scores[scores].tolist(),
+        }
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self.record(i)
+
+    @classmethod
+    def write(cls, path: Path, book_name: str, records: List[Dict]) -> Path:
+        """Write records (chunker JSON shape) to a store directory, replacing any existing one"""
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+
+        encoded = [record['text'].encode('utf-8') for record in records]
+        with open(tmp_path / "text.bin", 'wb') as f:
+            for blob in encoded:
+                f.write(blob)
+        text_offsets = np.zeros(len(records) + 1, dtype=np.int64)
+        np.cumsum(np.array([len(blob) for blob in encoded], dtype=np.int64), out=text_offsets[1:])
+        np.save(tmp_path / "text_offsets.npy", text_offsets)
+
+        np.save(tmp_path / "word_count.npy", np.array([r['word_count'] for r in records], dtype=np.int32))
+        np.save(tmp_path / "char_count.npy", np.array([r['char_count'] for r in records], dtype=np.int32))
+        for name, dtype in (("original_indices", np.int32), ("similarity_scores", np.float64)):
+            values, offsets = _ragged([r.get(name, []) for r in records], dtype)
+            np.save(tmp_path / f"{name}.npy", values)
+            np.save(tmp_path / f"{name}_offsets.npy", offsets)
+
+        with open(tmp_path / "meta.json", 'w', encoding='utf-8') as f:
+            json.dump({
+                "format_version": FORMAT_VERSION,
+                "book_name": book_name,
+                "count": len(records),
+            }, f, ensure_ascii=False)
+
+        shutil.rmtree(path, ignore_errors=True)
+        tmp_path.rename(path)
+        return path
@@ -0,0 +1,188 @@
+# src/aura_agent/db_pool.py
+# Bounded pool of pymysql connections for the agent process's plain SQL
+# (session summaries). The vector stores keep using their own SQLAlchemy engines.
+
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+import pymysql
+
+# --- Configuration ---
+POOL_SIZE = int(os.environ.get("AGENT_DB_POOL_SIZE", 5))
+# Seconds a caller waits for a free connection before PoolTimeout
+POOL_TIMEOUT = float(os.environ.get("AGENT_DB_POOL_TIMEOUT", 10))
+# Connections idle longer than this are closed instead of reused (TiDB Cloud drops idle connections)
+POOL_RECYCLE = float(os.environ.get("AGENT_DB_POOL_RECYCLE", 300))
+# Connections idle longer than this are pinged before being handed out
+PRE_PING_AFTER = float(os.environ.get("AGENT_DB_PRE_PING_AFTER", 5))
+
+_BOOL_OPTIONS = {"ssl_verify_cert", "ssl_verify_identity", "autocommit"}
+_STR_OPTIONS = {"ssl_ca", "ssl_cert", "ssl_key", "charset"}
+
+
+class PoolTimeout(Exception):
+    """No pooled connection became free within the timeout"""
+
+
+def connect_kwargs_from_url(url: str) -> Dict:
+    """pymysql.connect keyword arguments for a SQLAlchemy-style URL
+
+    e.g. ``mysql+pymysql://user:pw@host:4000/db?ssl_ca=/etc/ssl/cert.pem&ssl_verify_cert=true``
+    """
+    parsed = urlsplit(url)
+    kwargs = {
+        "host": parsed.hostname,
+        "port": parsed.port or 4000,
+        "user": unquote(parsed.username) if parsed.username is not None else None,
+        "password": unquote(parsed.password or ""),
+        "database": unquote(parsed.path.lstrip("/")) or None,
+    }
+    # A repeated option keeps its last value
+    for name, value in dict(parse_qsl(parsed.query)).items():
+        if name in _BOOL_OPTIONS:
+            kwargs[name] = value.lower() in ("1", "true", "yes")
+        elif name in _STR_OPTIONS:
+            kwargs[name] = value
+    return kwargs
+
+
+class _Pooled:
+    __slots__ = ("conn", "last_used")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.last_used = time.monotonic()
+
+
+class ConnectionPool:
+    """Thread-safe pool of at most ``max_size`` pymysql connections
+
+    Connections are opened lazily, reused most-recently-returned first, closed
+    once idle for ``recycle`` seconds, and pinged on checkout when idle for
+    more than ``pre_ping_after`` seconds. A connection whose block raised a
+    connection-level error is discarded rather than returned to the pool.
+    """
+
+    def __init__(self, connect_kwargs: Dict, max_size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT,
+                 recycle: float = POOL_RECYCLE, pre_ping_after: float = PRE_PING_AFTER):
+        if max_size < 1:
+            raise ValueError(f"max_size must be at least 1, got {max_size}")
+        if recycle <= 0:
+            raise ValueError(f"recycle must be positive, got {recycle}")
+        self.connect_kwargs = connect_kwargs
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping_after = pre_ping_after
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._idle: "deque[_Pooled]" = deque()
+        self._lock = threading.Lock()
+        self.opened = 0
+
+    def _connect(self):
+        with self._lock:
+            self.opened += 1
+        return pymysql.connect(**self.connect_kwargs)
+
+    def _checkout(self):
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                pooled = self._idle.pop()
+            idle_for = now - pooled.last_used
+            if idle_for > self.recycle:
+                _close_quietly(pooled.conn)
+                continue
+            if idle_for > self.pre_ping_after:
+                try:
+                    pooled.conn.ping(reconnect=False)
+                except pymysql.err.Error:
+                    _close_quietly(pooled.conn)
+                    continue
+            return pooled.conn
+        return self._connect()
+
+    def _checkin(self, conn):
+        stale = []
+        with self._lock:
+            self._idle.append(_Pooled(conn))
+            # The least recently returned connections sit at the left end
+            cutoff = time.monotonic() - self.recycle
+            while self._idle and self._idle[0].last_used < cutoff:
+                stale.append(self._idle.popleft().conn)
+        for old in stale:
+            _close_quietly(old)
+
+    @contextmanager
+    def connection(self) -> Iterator[pymysql.connections.Connection]:
+        """Check out a live connection for the duration of the block
+
+        Uncommitted work is rolled back when the block exits, so callers commit explicitly.
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"No TiDB connection available after {self.timeout}s")
+        try:
+            conn = self._checkout()
+            try:
+                yield conn
+            except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+                _close_quietly(conn)
+                raise
+            except BaseException:
+                self._release(conn)
+                raise
+            else:
+                self._release(conn)
+        finally:
+            self._slots.release()
+
+    def _release(self, conn):
+        try:
+            conn.rollback()
+        except pymysql.err.Error:
+            _close_quietly(conn)
+            return
+        self._checkin(conn)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for pooled in idle:
+            _close_quietly(pooled.conn)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"idle": len(self._idle), "max_size": self.max_size, "opened": self.opened}
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except pymysql.err.Error:
+        pass
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(url: Optional[str] = None) -> ConnectionPool:
+    """The process-wide pool for ``url`` (default: TIDB_DATABASE_URL), created on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                url = url or os.environ.get("TIDB_DATABASE_URL")
+                if not url:
+                    raise RuntimeError("TIDB_DATABASE_URL is not set")
+                _pool = ConnectionPool(connect_kwargs_from_url(url))
+                atexit.register(_pool.close)
+    return _pool
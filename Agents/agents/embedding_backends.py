@@ -0,0 +1,138 @@
+# src/aura_agent/embedding_backends.py
+# Pluggable embedding backends shared by the ingestion scripts and the agent.
+# EMBEDDING_BACKEND=gemini (default) calls the Gemini API; EMBEDDING_BACKEND=local
+# uses a CPU-only hashing embedder so the whole pipeline runs without network access.
+
+import asyncio
+import hashlib
+import math
+import os
+import re
+from typing import List, Optional
+
+import numpy as np
+
+# --- Configuration ---
+DEFAULT_BACKEND = "gemini"
+DEFAULT_LOCAL_DIM = 768
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+class EmbeddingBackend:
+    """Interface for embedding providers
+
+    ``name`` identifies the model in cache keys and build manifests, so two
+    backends that can return different vectors must never share a name.
+    """
+
+    name: str = ""
+    dimensionality: Optional[int] = None
+
+    def embed(self, texts: List[str], task_type: str) -> List[List[float]]:
+        """Embed a batch of texts, returning one vector per text in order"""
+        raise NotImplementedError
+
+    async def embed_async(self, texts: List[str], task_type: str) -> List[List[float]]:
+        """Async variant of ``embed``; runs ``embed`` on a worker thread unless overridden"""
+        return await asyncio.to_thread(self.embed, texts, task_type)
+
+
+class GeminiBackend(EmbeddingBackend):
+    """Gemini embedding API via google.generativeai"""
+
+    def __init__(self, model: str, dimensionality: Optional[int] = None, api_key: Optional[str] = None,
+                 title: Optional[str] = None):
+        import google.generativeai as genai
+
+        api_key = api_key or os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY or GOOGLE_API_KEY not found in environment variables "
+                             "(set EMBEDDING_BACKEND=local to embed without the API).")
+        genai.configure(api_key=api_key)
+        self._genai = genai
+        self.model = model
+        self.name = model.split("/", 1)[1] if model.startswith("models/") else model
+        self.dimensionality = dimensionality
+        self.title = title
+
+    def _request(self, texts: List[str], task_type: str) -> dict:
+        kwargs = {"model": self.model, "content": texts, "task_type": task_type}
+        if self.dimensionality:
+            kwargs["output_dimensionality"] = self.dimensionality
+        if self.title:
+            kwargs["title"] = self.title
+        return kwargs
+
+    def embed(self, texts: List[str], task_type: str) -> List[List[float]]:
+        return self._genai.embed_content(**self._request(texts, task_type))['embedding']
+
+    async def embed_async(self, texts: List[str], task_type: str) -> List[List[float]]:
+        result = await self._genai.embed_content_async(**self._request(texts, task_type))
+        return result['embedding']
+
+
+class HashingBackend(EmbeddingBackend):
+    """CPU-only local embedder using the signed hashing trick
+
+    Lowercased word unigrams and bigrams are hashed (BLAKE2b, so results are
+    stable across processes) into ``dimensionality`` buckets with a hash-derived
+    sign, weighted by 1 + log(term frequency) and L2-normalized. Lexical rather
+    than semantic, but deterministic, fast and good enough to exercise and
+    profile the clean -> chunk -> insert -> query pipeline offline.
+    ``task_type`` is accepted for interface compatibility and ignored.
+    """
+
+    def __init__(self, dimensionality: Optional[int] = None):
+        self.dimensionality = dimensionality or DEFAULT_LOCAL_DIM
+        self.name = f"local-hashing-v1-{self.dimensionality}"
+
+    def _bucket(self, feature: str):
+        digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+        return digest % self.dimensionality, 1.0 if (digest >> 63) & 1 else -1.0
+
+    def embed_one(self, text: str) -> np.ndarray:
+        tokens = _TOKEN_PATTERN.findall(text.lower())
+        counts = {}
+        for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+            counts[feature] = counts.get(feature, 0) + 1
+
+        vector = np.zeros(self.dimensionality, dtype=np.float32)
+        for feature, count in counts.items():
+            bucket, sign = self._bucket(feature)
+            vector[bucket] += sign * (1.0 + math.log(count))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed(self, texts: List[str], task_type: str) -> List[List[float]]:
+        return [self.embed_one(text).tolist() for text in texts]
+
+
+def truncate_embeddings(vectors, dim: Optional[int]) -> np.ndarray:
+    """Matryoshka-style reduction: keep the first ``dim`` coordinates and re-normalize
+
+    gemini-embedding-001 is trained so that prefixes of its output are usable
+    embeddings on their own (its 768/1536 output sizes are such prefixes).
+    ``dim`` of None, or at least the full size, only converts to float32.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dim is None or dim >= vectors.shape[-1]:
+        return vectors
+    prefix = vectors[..., :dim]
+    norms = np.linalg.norm(prefix, axis=-1, keepdims=True)
+    return prefix / np.where(norms == 0, 1, norms)
+
+
+def get_embedding_backend(model: str, dimensionality: Optional[int] = None, api_key: Optional[str] = None,
+                          title: Optional[str] = None, backend: Optional[str] = None) -> EmbeddingBackend:
+    """Backend selected by ``backend`` or the EMBEDDING_BACKEND environment variable
+
+    ``model`` and ``title`` only apply to Gemini. The local backend uses
+    ``dimensionality`` (so vectors fit the caller's TiDB table) or EMBEDDING_DIM.
+    """
+    backend = (backend or os.environ.get("EMBEDDING_BACKEND", DEFAULT_BACKEND)).lower()
+    if backend == "gemini":
+        return GeminiBackend(model, dimensionality, api_key=api_key, title=title)
+    if backend in ("local", "hashing"):
+        return HashingBackend(dimensionality or int(os.environ.get("EMBEDDING_DIM", DEFAULT_LOCAL_DIM)))
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}' (expected 'gemini' or 'local')")
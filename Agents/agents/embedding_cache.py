@@ -0,0 +1,315 @@
+# src/aura_agent/embedding_cache.py
+# Persistent, size-bounded embedding cache shared by the ingestion scripts
+# (datasets/books_dataset/preprocessing) and the agent's query-time tools.
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, so give each process its own EMBEDDING_CACHE_DIR
+    fcntl = None
+
+# --- Configuration ---
+DEFAULT_CACHE_DIR = Path(os.environ.get("EMBEDDING_CACHE_DIR", Path.home() / ".cache" / "aura_embeddings"))
+# Budget per (model, task_type, dimensionality) namespace; 512 MB holds ~43k 3072-dim vectors
+DEFAULT_MAX_BYTES = int(os.environ.get("EMBEDDING_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+# Persist last-used ticks after this many cache hits (and always at exit); new entries are persisted at once
+FLUSH_EVERY = 256
+_INITIAL_ROWS = 1024
+
+
+def text_key(text: str) -> bytes:
+    """Fixed-width key for a text: hex SHA-256 truncated to 128 bits"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32].encode("ascii")
+
+
+def _normalize_model(model: str) -> str:
+    # "models/gemini-embedding-001" and "gemini-embedding-001" are the same model
+    return model.split("/", 1)[1] if model.startswith("models/") else model
+
+
+class _Namespace:
+    """Embeddings for one (model, task_type, dimensionality) combination
+
+    Vectors live in a float32 memory-mapped file of fixed-size slots; the index
+    (``index.npz``) stores each slot's text key and last-used tick. When the
+    byte budget is reached, the least recently used slot is overwritten.
+
+    Several processes (ingestion, each agent worker) may share a directory, so
+    every read or write happens under a ``flock`` on ``lock`` (shared for reads,
+    exclusive for writes) after reloading the index if another process replaced
+    it. Writers allocate slots and replace the index while holding the lock, so
+    two processes never hand out the same slot.
+    """
+
+    def __init__(self, directory: Path, meta: Dict, max_bytes: int):
+        self.directory = directory
+        self.meta = meta
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.directory / "vectors.f32"
+        self.index_path = self.directory / "index.npz"
+        self.meta_path = self.directory / "meta.json"
+        self._lock_file = open(self.directory / "lock", "a+b")
+
+        self._reset()
+        self.clock = 0
+        # Last-used ticks of hits since the index was last written, re-applied after a reload
+        self.touched: Dict[bytes, int] = {}
+        self.dirty = 0
+        self._stamp = None
+        with self._locked(exclusive=False):
+            self._sync()
+
+    def _reset(self):
+        self.dim: Optional[int] = None
+        self.vectors: Optional[np.memmap] = None
+        # keys/last_used are sized to the vectors file; only the first ``size`` slots are in use
+        self.keys = np.zeros(0, dtype="S32")
+        self.last_used = np.zeros(0, dtype=np.uint64)
+        self.size = 0
+        self.slots: Dict[bytes, int] = {}
+
+    @property
+    def max_rows(self) -> int:
+        return max(1, self.max_bytes // (self.dim * 4))
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _disk_stamp(self):
+        try:
+            stat = self.index_path.stat()
+            index = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            index = None
+        return index, self.meta_path.exists()
+
+    def _sync(self):
+        """Reload the index if another process replaced it since we last read or wrote it (lock held)"""
+        stamp = self._disk_stamp()
+        if stamp == self._stamp:
+            return
+        clock = self.clock
+        self._reset()
+        self._load()
+        self.clock = max(self.clock, clock)
+        for key, tick in self.touched.items():
+            slot = self.slots.get(key)
+            if slot is not None:
+                self.last_used[slot] = max(int(self.last_used[slot]), tick)
+        self._stamp = stamp
+
+    def _load(self):
+        if not self.meta_path.exists():
+            return
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            self.dim = json.load(f)["dim"]
+        if not (self.index_path.exists() and self.vectors_path.exists()):
+            return
+        with np.load(self.index_path) as index:
+            keys = index["keys"]
+            last_used = index["last_used"]
+            clock = int(index["clock"])
+        capacity = self.vectors_path.stat().st_size // (self.dim * 4)
+        if capacity < len(keys):
+            # Vectors file truncated behind our back; start over rather than serve garbage
+            return
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self.keys = np.zeros(capacity, dtype="S32")
+        self.last_used = np.zeros(capacity, dtype=np.uint64)
+        self.size = len(keys)
+        self.keys[:self.size] = keys
+        self.last_used[:self.size] = last_used
+        self.clock = clock
+        self.slots = {key: slot for slot, key in enumerate(keys.tolist())}
+
+    def _grow(self):
+        """Double the vectors file (up to the byte budget) along with the slot arrays"""
+        capacity = len(self.keys)
+        new_capacity = min(self.max_rows, max(capacity * 2, _INITIAL_ROWS))
+        if self.vectors is not None:
+            self.vectors.flush()
+            self.vectors = None
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(new_capacity * self.dim * 4)
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(new_capacity, self.dim))
+        self.keys = np.concatenate([self.keys, np.zeros(new_capacity - capacity, dtype="S32")])
+        self.last_used = np.concatenate([self.last_used, np.zeros(new_capacity - capacity, dtype=np.uint64)])
+
+    def get_many(self, keys: Sequence[bytes]) -> List[Optional[np.ndarray]]:
+        with self._locked(exclusive=False):
+            self._sync()
+            return [self._get(key) for key in keys]
+
+    def _get(self, key: bytes) -> Optional[np.ndarray]:
+        slot = self.slots.get(key)
+        if slot is None:
+            return None
+        self.clock += 1
+        self.last_used[slot] = self.clock
+        self.touched[key] = self.clock
+        self.dirty += 1
+        return np.array(self.vectors[slot])
+
+    def put_many(self, keys: Sequence[bytes], vectors: Sequence[np.ndarray]):
+        """Store vectors and persist the index before releasing the lock"""
+        with self._locked(exclusive=True):
+            self._sync()
+            for key, vector in zip(keys, vectors):
+                self._put(key, vector)
+            self._write_index()
+
+    def _put(self, key: bytes, vector: np.ndarray):
+        if self.dim is None:
+            self.dim = int(vector.shape[0])
+            with open(self.meta_path, "w", encoding="utf-8") as f:
+                json.dump({**self.meta, "dim": self.dim}, f)
+        if vector.shape[0] != self.dim:
+            raise ValueError(f"Embedding has {vector.shape[0]} dims, cache namespace holds {self.dim}")
+
+        self.clock += 1
+        slot = self.slots.get(key)
+        if slot is None:
+            if self.size < self.max_rows:
+                if self.size == len(self.keys):
+                    self._grow()
+                slot = self.size
+                self.size += 1
+            else:
+                # Evict the least recently used entry and reuse its slot
+                slot = int(np.argmin(self.last_used[:self.size]))
+                del self.slots[self.keys[slot]]
+            self.keys[slot] = key
+            self.slots[key] = slot
+        self.vectors[slot] = vector
+        self.last_used[slot] = self.clock
+        self.dirty += 1
+
+    def _write_index(self):
+        if not self.dirty or self.vectors is None:
+            return
+        self.vectors.flush()
+        tmp_path = self.index_path.with_name("index.tmp.npz")
+        np.savez(tmp_path, keys=self.keys[:self.size], last_used=self.last_used[:self.size],
+                 clock=np.uint64(self.clock))
+        os.replace(tmp_path, self.index_path)
+        self._stamp = self._disk_stamp()
+        self.touched.clear()
+        self.dirty = 0
+
+    def flush(self):
+        """Persist pending last-used ticks"""
+        if not self.dirty:
+            return
+        with self._locked(exclusive=True):
+            self._sync()
+            self._write_index()
+
+
+class EmbeddingCache:
+    """On-disk embedding cache keyed by (model, task_type, dimensionality, text hash)
+
+    Vectors are stored as float32 in memory-mapped files, one directory per
+    (model, task_type, dimensionality), with least-recently-used eviction once a
+    directory reaches ``max_bytes``. Processes may share a cache directory:
+    new entries are persisted as soon as they are stored, and last-used ticks
+    every ``FLUSH_EVERY`` hits and when the process exits.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir or DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        atexit.register(self.flush)
+
+    def _namespace(self, model: str, task_type: str, dimensionality: Optional[int]) -> _Namespace:
+        meta = {
+            "model": _normalize_model(model),
+            "task_type": task_type.upper(),
+            "dimensionality": dimensionality,
+        }
+        name = hashlib.sha256(json.dumps(meta, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        if name not in self._namespaces:
+            self._namespaces[name] = _Namespace(self.cache_dir / name, meta, self.max_bytes)
+        return self._namespaces[name]
+
+    def get_many(self, model: str, task_type: str, dimensionality: Optional[int],
+                 texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Cached float32 vectors for ``texts``, with None for misses"""
+        with self._lock:
+            namespace = self._namespace(model, task_type, dimensionality)
+            found = namespace.get_many([text_key(text) for text in texts])
+            if namespace.dirty >= FLUSH_EVERY:
+                namespace.flush()
+            hits = sum(vector is not None for vector in found)
+            self.hits += hits
+            self.misses += len(found) - hits
+        return found
+
+    def put_many(self, model: str, task_type: str, dimensionality: Optional[int],
+                 texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        """Store vectors for ``texts``"""
+        with self._lock:
+            namespace = self._namespace(model, task_type, dimensionality)
+            namespace.put_many([text_key(text) for text in texts],
+                               [np.asarray(vector, dtype=np.float32) for vector in vectors])
+
+    def get_or_compute(self, model: str, task_type: str, dimensionality: Optional[int],
+                       texts: Sequence[str],
+                       compute: Callable[[List[str]], Sequence[Sequence[float]]]) -> List[List[float]]:
+        """Embeddings for ``texts``, calling ``compute`` only for the ones not cached
+
+        ``compute`` receives the missing texts (deduplicated, in order) and must
+        return one vector per text. Results are returned as float32-rounded lists
+        so cached and freshly computed vectors are indistinguishable.
+        """
+        found = self.get_many(model, task_type, dimensionality, texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, found) if vector is None))
+        if missing:
+            computed = [np.asarray(vector, dtype=np.float32) for vector in compute(missing)]
+            if len(computed) != len(missing):
+                raise ValueError(f"Expected {len(missing)} embeddings, got {len(computed)}")
+            self.put_many(model, task_type, dimensionality, missing, computed)
+            by_text = dict(zip(missing, computed))
+            found = [vector if vector is not None else by_text[text] for text, vector in zip(texts, found)]
+        return [vector.tolist() for vector in found]
+
+    def flush(self):
+        """Persist all pending index updates"""
+        with self._lock:
+            for namespace in self._namespaces.values():
+                namespace.flush()
+
+
+_default_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Process-wide cache instance, or None if disabled with EMBEDDING_CACHE_DISABLED=1"""
+    global _default_cache
+    if os.environ.get("EMBEDDING_CACHE_DISABLED", "").lower() in ("1", "true", "yes"):
+        return None
+    if _default_cache is None:
+        _default_cache = EmbeddingCache()
+    return _default_cache
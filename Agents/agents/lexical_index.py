@@ -0,0 +1,257 @@
+# src/aura_agent/lexical_index.py
+# BM25 inverted index over the semantic chunks, written by the chunker next to its other
+# outputs, plus reciprocal rank fusion for combining lexical and vector rankings.
+
+import json
+import math
+import os
+import re
+import shutil
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Hashable, List, Optional, Sequence
+
+import numpy as np
+
+# --- Configuration ---
+INDEX_SUFFIX = ".bm25"
+FORMAT_VERSION = 1
+# Standard BM25 parameters: term-frequency saturation and document-length normalization
+BM25_K1 = float(os.environ.get("BM25_K1", 1.2))
+BM25_B = float(os.environ.get("BM25_B", 0.75))
+# The usual RRF constant; larger values flatten the difference between top and lower ranks
+RRF_K = int(os.environ.get("RRF_K", 60))
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just me more most
+my myself no nor not now of off on once only or other our ours ourselves out over own same she should
+so some such than that the their theirs them themselves then there these they this those through to
+too under until up very vs was we were what when where which while who whom why will with would you
+your yours yourself yourselves
+""".split())
+
+
+def _stem(token: str) -> str:
+    """Harman's S-stemmer: folds plurals ("theories" -> "theory") and nothing else"""
+    if len(token) > 4 and token.endswith("ies") and not token.endswith(("eies", "aies")):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("es") and not token.endswith(("aes", "ees", "oes")):
+        return token[:-1]
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("us", "ss")):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased, plural-folded word tokens without stopwords; used for chunks and queries alike"""
+    return [_stem(token) for token in _TOKEN.findall(text.lower())
+            if len(token) > 1 and token not in _STOPWORDS]
+
+
+@dataclass
+class LexicalResult:
+    """A BM25 hit; ``document`` and ``metadata`` are shaped like the vector stores' results"""
+    id: str
+    document: str
+    metadata: dict
+    score: float
+
+
+class BookIndex:
+    """Memory-mapped BM25 postings of one book
+
+    An index is a directory (``<book>_semantic_chunks.bm25``) of flat files:
+      - ``meta.json``: book name, chunk count, total token count
+      - ``terms.json``: the vocabulary; term i's postings are
+        ``postings_*[postings_offsets[i]:postings_offsets[i + 1]]``
+      - ``postings_docs.npy`` (int32 chunk rows) and ``postings_tf.npy`` (uint16 term counts)
+      - ``doc_len.npy``: tokens per chunk, ``chunk_ids.npy``: the chunker's chunk_id per row
+      - ``text.bin`` + ``text_offsets.npy``: chunk texts, as in chunk_store.py
+
+    Scores need corpus-wide statistics, so searching goes through LexicalIndex.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path / "meta.json", 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported lexical index version {self.meta.get('format_version')} in {self.path}")
+        self.book_name: str = self.meta["book_name"]
+        with open(self.path / "terms.json", 'r', encoding='utf-8') as f:
+            self.vocabulary: Dict[str, int] = {term: i for i, term in enumerate(json.load(f))}
+        self.postings_offsets = self._load("postings_offsets")
+        self.postings_docs = self._load("postings_docs")
+        self.postings_tf = self._load("postings_tf")
+        self.doc_len = self._load("doc_len")
+        self.chunk_ids = self._load("chunk_ids")
+        text_path = self.path / "text.bin"
+        # np.memmap refuses empty files
+        self._text = (np.memmap(text_path, dtype=np.uint8, mode='r')
+                      if text_path.stat().st_size else np.zeros(0, dtype=np.uint8))
+        self.text_offsets = self._load("text_offsets")
+        # Per-chunk BM25 length normalization, set by LexicalIndex once the corpus average is known
+        self.norm: Optional[np.ndarray] = None
+
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(self.path / f"{name}.npy", mmap_mode='r')
+
+    def __len__(self) -> int:
+        return len(self.doc_len)
+
+    @property
+    def total_length(self) -> int:
+        return int(self.meta["total_length"])
+
+    def postings(self, term: str):
+        """(chunk rows, term counts) of a term, or None if the book never uses it"""
+        i = self.vocabulary.get(term)
+        if i is None:
+            return None
+        span = slice(self.postings_offsets[i], self.postings_offsets[i + 1])
+        return self.postings_docs[span], self.postings_tf[span]
+
+    def text(self, row: int) -> str:
+        return self._text[self.text_offsets[row]:self.text_offsets[row + 1]].tobytes().decode('utf-8')
+
+    def result(self, row: int, score: float) -> LexicalResult:
+        chunk_id = int(self.chunk_ids[row])
+        metadata = {"book_name": self.book_name, "chunk_id": chunk_id}
+        return LexicalResult(f"{self.book_name}_c{chunk_id}", self.text(row), metadata, score)
+
+    @classmethod
+    def write(cls, path: Path, book_name: str, records: List[Dict]) -> Path:
+        """Index records (chunker JSON shape) into a directory, replacing any existing one"""
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+
+        postings: Dict[str, List] = {}
+        doc_len = np.zeros(len(records), dtype=np.int32)
+        for row, record in enumerate(records):
+            tokens = tokenize(record['text'])
+            doc_len[row] = len(tokens)
+            for term, count in Counter(tokens).items():
+                postings.setdefault(term, []).append((row, count))
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum([len(postings[term]) for term in terms], out=offsets[1:])
+        docs = np.fromiter((row for term in terms for row, _ in postings[term]),
+                           dtype=np.int32, count=int(offsets[-1]))
+        tfs = np.fromiter((min(count, 65535) for term in terms for _, count in postings[term]),
+                          dtype=np.uint16, count=int(offsets[-1]))
+        np.save(tmp_path / "postings_offsets.npy", offsets)
+        np.save(tmp_path / "postings_docs.npy", docs)
+        np.save(tmp_path / "postings_tf.npy", tfs)
+        np.save(tmp_path / "doc_len.npy", doc_len)
+        np.save(tmp_path / "chunk_ids.npy",
+                np.array([r.get('chunk_id', i) for i, r in enumerate(records)], dtype=np.int32))
+
+        encoded = [record['text'].strip().encode('utf-8') for record in records]
+        with open(tmp_path / "text.bin", 'wb') as f:
+            for blob in encoded:
+                f.write(blob)
+        text_offsets = np.zeros(len(records) + 1, dtype=np.int64)
+        np.cumsum(np.array([len(blob) for blob in encoded], dtype=np.int64), out=text_offsets[1:])
+        np.save(tmp_path / "text_offsets.npy", text_offsets)
+
+        with open(tmp_path / "terms.json", 'w', encoding='utf-8') as f:
+            json.dump(terms, f, ensure_ascii=False)
+        with open(tmp_path / "meta.json", 'w', encoding='utf-8') as f:
+            json.dump({
+                "format_version": FORMAT_VERSION,
+                "book_name": book_name,
+                "count": len(records),
+                "total_length": int(doc_len.sum()),
+            }, f, ensure_ascii=False)
+
+        shutil.rmtree(path, ignore_errors=True)
+        tmp_path.rename(path)
+        return path
+
+
+class LexicalIndex:
+    """BM25 search over several books' indexes, scored as one corpus
+
+    Document frequencies are summed across books at query time, so adding or
+    rebuilding one book never requires touching the others. A query costs a
+    dictionary lookup and a postings slice per term and book; nothing is read
+    from the chunk texts except the returned hits.
+    """
+
+    def __init__(self, books: Sequence[BookIndex], k1: float = BM25_K1, b: float = BM25_B):
+        self.books = list(books)
+        self.k1 = k1
+        self.b = b
+        self.count = sum(len(book) for book in self.books)
+        avg_len = sum(book.total_length for book in self.books) / max(self.count, 1)
+        for book in self.books:
+            book.norm = (k1 * (1 - b + b * np.asarray(book.doc_len, dtype=np.float32) / max(avg_len, 1e-9))
+                         ).astype(np.float32)
+
+    @classmethod
+    def open_folder(cls, folder: Path) -> "LexicalIndex":
+        """Every book index (``*<INDEX_SUFFIX>``) in a folder; empty if there are none"""
+        return cls([BookIndex(path) for path in sorted(Path(folder).glob(f"*{INDEX_SUFFIX}")) if path.is_dir()])
+
+    def __len__(self) -> int:
+        return self.count
+
+    def search(self, query: str, k: int = 5) -> List[LexicalResult]:
+        """The k best-scoring chunks for a query; empty when no query term occurs in the corpus"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.books:
+            return []
+        per_book = [[book.postings(term) for term in terms] for book in self.books]
+        idf = []
+        for t in range(len(terms)):
+            df = sum(len(postings[t][0]) for postings in per_book if postings[t] is not None)
+            idf.append(math.log(1 + (self.count - df + 0.5) / (df + 0.5)))
+
+        candidates = []
+        for book, postings in zip(self.books, per_book):
+            if all(p is None for p in postings):
+                continue
+            scores = np.zeros(len(book), dtype=np.float32)
+            for weight, p in zip(idf, postings):
+                if p is None:
+                    continue
+                docs, tf = p
+                tf = tf.astype(np.float32)
+                # A chunk appears once per term's postings, so plain fancy-index addition is safe
+                scores[docs] += weight * tf * (self.k1 + 1) / (tf + book.norm[docs])
+            top = np.flatnonzero(scores)
+            if len(top) > k:
+                top = top[np.argpartition(-scores[top], k - 1)[:k]]
+            candidates.extend((float(scores[row]), book, int(row)) for row in top)
+        candidates.sort(key=lambda c: -c[0])
+        return [book.result(row, score) for score, book, row in candidates[:k]]
+
+
+def fusion_key(result) -> Hashable:
+    """Identity of a chunk across lexical and vector results: (book, chunk) when known, else its text"""
+    metadata = getattr(result, "metadata", None) or {}
+    if "book_name" in metadata and "chunk_id" in metadata:
+        return metadata["book_name"], int(metadata["chunk_id"])
+    return result.document.strip()
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence], rrf_k: int = RRF_K) -> List:
+    """Merge ranked result lists by summing 1 / (rrf_k + rank) per chunk
+
+    Only ranks are used, so BM25 scores and cosine distances need no calibration.
+    Each chunk is represented by the first result object seen for it.
+    """
+    scores: Dict[Hashable, float] = {}
+    first_seen: Dict[Hashable, object] = {}
+    for ranking in rankings:
+        for rank, result in enumerate(ranking, start=1):
+            key = fusion_key(result)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            first_seen.setdefault(key, result)
+    return [first_seen[key] for key in sorted(scores, key=scores.get, reverse=True)]
@@ -1,26 +1,41 @@
 # src/aura_agent/tidb_helpers.py
 import os
-import pymysql
-from typing import List
-
-# <<< CHANGE START 1: Correct the import and configuration pattern >>>
-import google.generativeai as genai
-# <<< CHANGE END 1 >>>
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import List, Optional
 
 from tidb_vector.integrations import TiDBVectorClient
 
+from .embedding_backends import get_embedding_backend, truncate_embeddings
+from .embedding_cache import get_embedding_cache
+from .db_pool import get_pool
+from .ann_index import AnnReplica, VectorTable
+from .lexical_index import LexicalIndex
+
 # --- Configuration ---
 TIDB_CONNECTION_STRING = os.environ.get('TIDB_DATABASE_URL')
 EMBED_MODEL = "gemini-embedding-001"
 EMBED_DIM = 3072
+# Dimensions stored in the books table; must match EMBED_STORE_DIM used by insertion.py
+EMBED_STORE_DIM = int(os.environ.get('EMBED_STORE_DIM', EMBED_DIM))
+# Recent query embeddings kept in memory, so one user turn's searches embed its query once
+QUERY_MEMO_SIZE = int(os.environ.get('QUERY_EMBEDDING_MEMO_SIZE', 256))
+# "tidb" runs the RAG searches in TiDB; "ann" serves them from local IVF replicas (ann_index.py)
+VECTOR_SEARCH_BACKEND = os.environ.get('VECTOR_SEARCH_BACKEND', 'tidb')
+# Seconds between incremental refreshes of the local replicas from TiDB
+ANN_REFRESH_INTERVAL = float(os.environ.get('ANN_REFRESH_INTERVAL', 300))
+# Textbook retrieval: "hybrid" fuses BM25 (lexical_index.py) and vector rankings, "vector" or "lexical" use one
+TEXTBOOK_RETRIEVAL = os.environ.get('TEXTBOOK_RETRIEVAL', 'hybrid')
+# Folder holding the *.bm25 indexes written by semantic_chunker.py
+LEXICAL_INDEX_DIR = Path(os.environ.get(
+    'LEXICAL_INDEX_DIR',
+    Path(__file__).resolve().parents[2] / "datasets" / "books_dataset" / "preprocessing" / "semantic_chunks"))
 
-# <<< CHANGE START 2: Configure the genai library directly >>>
-# This is the correct way to initialize the library with your API key.
-_api_key = os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
-if not _api_key:
-    raise ValueError("GEMINI_API_KEY or GOOGLE_API_KEY not found in environment variables.")
-genai.configure(api_key=_api_key)
-# <<< CHANGE END 2 >>>
+# Gemini by default (raises if GEMINI_API_KEY/GOOGLE_API_KEY is missing);
+# EMBEDDING_BACKEND=local uses the CPU-only hashing embedder. Must match the backend used for ingestion.
+embedding_backend = get_embedding_backend(EMBED_MODEL, EMBED_DIM)
 
 # --- Vector Store Clients (Unchanged) ---
 conversation_vector_store = TiDBVectorClient(
@@ -34,33 +49,101 @@ conversation_vector_store = TiDBVectorClient(
 books_vector_store = TiDBVectorClient(
     table_name='semantic_chunks_dataset',
     connection_string=TIDB_CONNECTION_STRING,
-    vector_dimension=EMBED_DIM,
+    vector_dimension=EMBED_STORE_DIM,
     distance_strategy="cosine",
     drop_existing_table=False,
 )
 
+class ReducedDimSearch:
+    """Truncates full query embeddings to the Matryoshka prefix a table was loaded with"""
+
+    def __init__(self, search, dim: int):
+        self.search = search
+        self.dim = dim
+
+    def query(self, query_vector: List[float], k: int = 5, **kwargs):
+        return self.search.query(truncate_embeddings(query_vector, self.dim).tolist(), k=k, **kwargs)
+
+def search_backend(vector_store, table_name: str, dim: int = EMBED_DIM):
+    """The object the RAG tools call .query(full_embedding, k=...) on for this store"""
+    if VECTOR_SEARCH_BACKEND == 'ann':
+        # TiDB answers until the table has rows to build the replica from
+        search = AnnReplica(VectorTable(TIDB_CONNECTION_STRING, table_name), fallback=vector_store,
+                            refresh_interval=ANN_REFRESH_INTERVAL)
+    elif VECTOR_SEARCH_BACKEND == 'tidb':
+        search = vector_store
+    else:
+        raise ValueError(f"Unknown VECTOR_SEARCH_BACKEND {VECTOR_SEARCH_BACKEND!r} (expected 'tidb' or 'ann')")
+    return ReducedDimSearch(search, dim) if dim < EMBED_DIM else search
+
+conversation_search = search_backend(conversation_vector_store, 'conversation_dataset')
+books_search = search_backend(books_vector_store, 'semantic_chunks_dataset', EMBED_STORE_DIM)
+
+def load_lexical_index() -> Optional[LexicalIndex]:
+    """The textbooks' BM25 index, or None when TEXTBOOK_RETRIEVAL is "vector" or no index was built"""
+    if TEXTBOOK_RETRIEVAL not in ('hybrid', 'vector', 'lexical'):
+        raise ValueError(f"Unknown TEXTBOOK_RETRIEVAL {TEXTBOOK_RETRIEVAL!r} (expected 'hybrid', 'vector' or 'lexical')")
+    if TEXTBOOK_RETRIEVAL == 'vector':
+        return None
+    index = LexicalIndex.open_folder(LEXICAL_INDEX_DIR)
+    if len(index):
+        return index
+    if TEXTBOOK_RETRIEVAL == 'lexical':
+        raise RuntimeError(f"TEXTBOOK_RETRIEVAL=lexical but no BM25 indexes were found in {LEXICAL_INDEX_DIR}")
+    print(f"WARNING: No BM25 indexes in {LEXICAL_INDEX_DIR}; textbook search is vector-only.")
+    return None
+
+books_lexical = load_lexical_index()
+
 # --- Embedding Function ---
 def text_to_embedding(text: str, task_type: str = "RETRIEVAL_DOCUMENT") -> List[float]:
-    """Embeds text using the Gemini embedding model."""
-    # <<< CHANGE START 3: Call embed_content from the top-level genai module >>>
-    result = genai.embed_content(
-        model=EMBED_MODEL,
-        content=text,
-        task_type=task_type,
+    """Embeds text with the configured backend, served from the on-disk cache when possible."""
+    cache = get_embedding_cache()
+    if cache is None:
+        return embedding_backend.embed([text], task_type)[0]
+    [embedding] = cache.get_or_compute(
+        embedding_backend.name, task_type, EMBED_DIM, [text],
+        lambda missing: embedding_backend.embed(missing, task_type),
     )
-    # <<< CHANGE END 3 >>>
-    return result['embedding']
+    return embedding
+
+# --- Query Embedding Memo ---
+_query_memo: "OrderedDict[str, Future]" = OrderedDict()
+_query_memo_lock = threading.Lock()
+
+def query_embedding(query: str) -> List[float]:
+    """RETRIEVAL_QUERY embedding of a search query, memoized in memory.
+
+    Concurrent callers asking for the same text wait on a single embedding call
+    instead of each missing the cache and calling the backend.
+    """
+    with _query_memo_lock:
+        future = _query_memo.get(query)
+        owner = future is None
+        if owner:
+            future = _query_memo[query] = Future()
+            while len(_query_memo) > QUERY_MEMO_SIZE:
+                _query_memo.popitem(last=False)
+        else:
+            _query_memo.move_to_end(query)
+    if owner:
+        try:
+            future.set_result(text_to_embedding(query, task_type="RETRIEVAL_QUERY"))
+        except BaseException as err:
+            with _query_memo_lock:
+                if _query_memo.get(query) is future:
+                    del _query_memo[query]
+            future.set_exception(err)
+    return future.result()
 
-# --- Summary Storage Functions (Unchanged) ---
+# --- Summary Storage Functions ---
 def get_db_connection():
-    """Establishes a raw connection to TiDB for standard SQL operations."""
-    url = pymysql.connections.uri_to_kwargs(TIDB_CONNECTION_STRING)
-    return pymysql.connect(**url)
+    """Checks out a pooled TiDB connection for standard SQL operations: `with get_db_connection() as conn:`"""
+    return get_pool(TIDB_CONNECTION_STRING).connection()
 
 def setup_summary_table():
     """Ensures the session_summaries table exists."""
-    conn = get_db_connection()
-    try:
+    with get_db_connection() as conn:
         with conn.cursor() as cursor:
             cursor.execute("""
             CREATE TABLE IF NOT EXISTS session_summaries (
@@ -72,6 +155,4 @@ def setup_summary_table():
             );
             """)
         conn.commit()
-        print("session_summaries table checked/created successfully.")
-    finally:
-        conn.close()
\ No newline at end of file
+        print("session_summaries table checked/created successfully.")
\ No newline at end of file
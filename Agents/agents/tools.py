@@ -2,8 +2,11 @@
 # This file centralizes all tool definitions for a clean, modular architecture.
 
 import os
+import time
 import asyncio
-from typing import Dict, List, AsyncGenerator
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, AsyncGenerator
 from datetime import datetime
 import pytz
 
@@ -13,11 +16,14 @@ from google.adk.tools.openapi_tool.openapi_spec_parser.openapi_toolset import Op
 
 # --- Local Helper Imports ---
 from .tidb_helpers import (
-    conversation_vector_store,
-    books_vector_store,
-    text_to_embedding,
-    get_db_connection
+    conversation_search,
+    books_search,
+    books_lexical,
+    query_embedding,
+    get_db_connection,
+    TEXTBOOK_RETRIEVAL
 )
+from .lexical_index import reciprocal_rank_fusion
 
 # ==============================================================================
 #  TOOLBOX: All tool functions and instantiations are defined here.
@@ -39,24 +45,160 @@ guardrail_tool = FunctionTool(func=contact_emergency_support)
 
 
 # --- 2. RAG & Insight Tools ---
-def search_similar_conversations(query: str) -> List[str]:
+# Stores are queried side by side; each search holds one worker while it waits on TiDB
+RAG_SEARCH_WORKERS = int(os.environ.get('RAG_SEARCH_WORKERS', 16))
+# Seconds allowed for the query embedding and for each vector search
+RAG_SEARCH_TIMEOUT = float(os.environ.get('RAG_SEARCH_TIMEOUT', 8))
+RAG_TOP_K = 2
+# Results taken from each of the BM25 and vector rankings before they are fused
+RRF_CANDIDATES = int(os.environ.get('RRF_CANDIDATES', 20))
+# Seconds a hybrid search waits for the embedding + vector search before answering from BM25 alone
+LEXICAL_FALLBACK_TIMEOUT = float(os.environ.get('RAG_LEXICAL_FALLBACK_TIMEOUT', 2))
+# Seconds hybrid searches skip straight to BM25 after the embedding or vector search fails or
+# times out; a background probe that gets vector results in the meantime ends the backoff early
+EMBEDDING_BACKOFF = float(os.environ.get('RAG_EMBEDDING_BACKOFF', 30))
+# time.monotonic() until which the embedding + vector search path counts as degraded
+_embedding_degraded_until = 0.0
+# The vector search probing a degraded path; at most one runs at a time
+_embedding_probe: "Optional[asyncio.Future]" = None
+_search_executor = ThreadPoolExecutor(max_workers=RAG_SEARCH_WORKERS, thread_name_prefix="rag-search")
+
+def _conversation_outputs(results) -> List[str]:
+    return [r.metadata.get('output', 'No output found.') for r in results]
+
+def _textbook_passages(results) -> List[str]:
+    return [r.document for r in results]
+
+# Result key -> (vector store, result formatter). search_knowledge_bases_async fans out over
+# all of them, so attaching another store adds no latency beyond the slowest one.
+KNOWLEDGE_BASES = {
+    "similar_conversations": (conversation_search, _conversation_outputs),
+    "counselor_textbooks": (books_search, _textbook_passages),
+}
+# Result key -> BM25 index whose ranking is fused (RRF) with that store's vector ranking
+LEXICAL_INDEXES = {"counselor_textbooks": books_lexical} if books_lexical is not None else {}
+# TEXTBOOK_RETRIEVAL=lexical: indexed stores answer from BM25 alone, without embedding the query
+LEXICAL_ONLY = TEXTBOOK_RETRIEVAL == 'lexical'
+
+def _note_lexical_fallback(name: str, err: BaseException):
+    reason = "timed out" if isinstance(err, asyncio.TimeoutError) else repr(err)
+    print(f"WARNING: Vector search for '{name}' {reason}; answering from the BM25 index alone")
+
+# --- Searches run off the event loop, which never blocks on the embedding API or TiDB ---
+async def _in_executor(func, *args, **kwargs):
+    """Run a blocking call on the search pool, giving up after RAG_SEARCH_TIMEOUT.
+
+    A timed-out call keeps its worker until TiDB answers; only the caller stops waiting.
+    """
+    loop = asyncio.get_running_loop()
+    call = loop.run_in_executor(_search_executor, functools.partial(func, *args, **kwargs))
+    return await asyncio.wait_for(call, RAG_SEARCH_TIMEOUT)
+
+def _mark_embedding_degraded():
+    global _embedding_degraded_until
+    _embedding_degraded_until = time.monotonic() + EMBEDDING_BACKOFF
+
+def _embedding_degraded() -> bool:
+    return time.monotonic() < _embedding_degraded_until
+
+def _settle_embedding(embedding: "asyncio.Future"):
+    """Done-callback of every query embedding: retrieves its exception, which nobody
+    awaits once the searches have fallen back to BM25, and starts a backoff on failure"""
+    if not embedding.cancelled() and embedding.exception() is not None:
+        _mark_embedding_degraded()
+
+def _settle_probe(probe: "asyncio.Future"):
+    global _embedding_degraded_until
+    if probe.cancelled() or probe.exception() is not None:
+        _mark_embedding_degraded()
+    else:
+        _embedding_degraded_until = 0.0
+
+def _start_probe(store, embedding: "asyncio.Future"):
+    """Run one vector search in the background; an answer within LEXICAL_FALLBACK_TIMEOUT ends the backoff"""
+    global _embedding_probe
+    if _embedding_probe is None or _embedding_probe.done():
+        _embedding_probe = asyncio.ensure_future(
+            asyncio.wait_for(_vector_candidates(store, embedding), LEXICAL_FALLBACK_TIMEOUT))
+        _embedding_probe.add_done_callback(_settle_probe)
+
+def _embed_async(query: str) -> "asyncio.Future":
+    """The query embedding as a future that several searches can await"""
+    embedding = asyncio.ensure_future(_in_executor(query_embedding, query))
+    embedding.add_done_callback(_settle_embedding)
+    return embedding
+
+async def _vector_candidates(store, embedding: "asyncio.Future") -> list:
+    # Shielded: giving up on this search must not cancel the embedding other searches await
+    return await _in_executor(store.query, await asyncio.shield(embedding), k=RRF_CANDIDATES)
+
+async def _search_store_async(name: str, query: str, embedding: "Optional[asyncio.Future]") -> List[str]:
+    """Formatted results of one knowledge base; ``embedding`` may be None only for LEXICAL_ONLY stores.
+
+    BM25 hits are ready before the embedding is, so a hybrid search that gets no
+    vector results within LEXICAL_FALLBACK_TIMEOUT answers from them alone. After
+    such a fallback, hybrid searches answer from BM25 at once for EMBEDDING_BACKOFF
+    seconds, while a background probe checks whether vector search has recovered.
+    """
+    store, format_results = KNOWLEDGE_BASES[name]
+    lexical = LEXICAL_INDEXES.get(name)
+    if lexical is None:
+        return format_results(await _in_executor(store.query, await embedding, k=RAG_TOP_K))
+    lexical_hits = lexical.search(query, RRF_CANDIDATES)
+    if LEXICAL_ONLY:
+        return format_results(lexical_hits[:RAG_TOP_K])
+    if not lexical_hits:
+        return format_results(await _in_executor(store.query, await embedding, k=RAG_TOP_K))
+    if _embedding_degraded():
+        _start_probe(store, embedding)
+        return format_results(lexical_hits[:RAG_TOP_K])
+    try:
+        vector_hits = await asyncio.wait_for(_vector_candidates(store, embedding), LEXICAL_FALLBACK_TIMEOUT)
+    except Exception as err:
+        _mark_embedding_degraded()
+        _note_lexical_fallback(name, err)
+        return format_results(lexical_hits[:RAG_TOP_K])
+    return format_results(reciprocal_rank_fusion([lexical_hits, vector_hits])[:RAG_TOP_K])
+
+async def search_similar_conversations_async(query: str) -> List[str]:
     """Searches the TiDB Shenlabs dataset for similar past conversations to gain empathetic context."""
     print(f"--- Tool: Searching similar conversations for '{query}' ---")
-    embedding = text_to_embedding(query, task_type="RETRIEVAL_QUERY")
-    results = conversation_vector_store.query(embedding, k=2)
-    return [r.metadata.get('output', 'No output found.') for r in results]
+    return await _search_store_async("similar_conversations", query, _embed_async(query))
 
-def search_counselor_textbooks(query: str) -> List[str]:
+async def search_counselor_textbooks_async(query: str) -> List[str]:
     """Searches the TiDB counselor textbook knowledge base for expert advice and strategies."""
     print(f"--- Tool: Searching counselor textbooks for '{query}' ---")
-    embedding = text_to_embedding(query, task_type="RETRIEVAL_QUERY")
-    results = books_vector_store.query(embedding, k=2)
-    return [r.document for r in results]
+    return await _search_store_async("counselor_textbooks", query, None if LEXICAL_ONLY else _embed_async(query))
+
+async def search_knowledge_bases_async(query: str) -> Dict[str, List[str]]:
+    """
+    Searches both knowledge bases at once: similar past conversations for
+    empathetic context and counselor textbooks for expert advice and strategies.
+    A source that fails or times out is listed under "unavailable" instead of
+    failing the whole search.
+    """
+    print(f"--- Tool: Searching conversations and counselor textbooks for '{query}' ---")
+    embedding = _embed_async(query)
+    names = list(KNOWLEDGE_BASES)
+    results = await asyncio.gather(*(_search_store_async(name, query, embedding) for name in names),
+                                   return_exceptions=True)
+    response, unavailable = {}, []
+    for name, result in zip(names, results):
+        if isinstance(result, Exception):
+            reason = "timed out" if isinstance(result, asyncio.TimeoutError) else repr(result)
+            print(f"WARNING: Knowledge base search '{name}' failed: {reason}")
+            unavailable.append(name)
+            result = []
+        response[name] = result
+    if unavailable:
+        response["unavailable"] = unavailable
+    return response
 
 # We group related tools into a list for easy import.
 rag_tools = [
-    FunctionTool(func=search_similar_conversations),
-    FunctionTool(func=search_counselor_textbooks)
+    FunctionTool(func=search_knowledge_bases_async),
+    FunctionTool(func=search_similar_conversations_async),
+    FunctionTool(func=search_counselor_textbooks_async)
 ]
 
 
@@ -73,7 +215,7 @@ paths:
   /get_events_in_duration:
     get:
       summary: Get Events Within A Date Range
-      description: Retrieves all academic events scheduled between a start and end date.
+      description: Retrieves the academic events scheduled between a start and end date, at most `limit` (default 100) per call. When next_cursor is not null there are more events; call again with cursor set to it to get them.
       operationId: get_events_in_duration
       parameters:
         - name: start_date
@@ -92,13 +234,34 @@ paths:
             format: date
             example: "2025-09-10"
           description: The end date of the period, in 'YYYY-MM-DD' format.
+        - name: limit
+          in: query
+          required: false
+          schema:
+            type: integer
+            default: 100
+            maximum: 1000
+          description: Maximum number of events to return in one page.
+        - name: cursor
+          in: query
+          required: false
+          schema:
+            type: string
+          description: The next_cursor value from the previous page, to fetch the following page.
+        - name: fields
+          in: query
+          required: false
+          schema:
+            type: string
+            example: "event_name,event_date,start_time"
+          description: Comma-separated event columns to return instead of all of them.
       responses:
         '200':
-          description: A list of events within the specified duration.
+          description: A page of events within the specified duration, ordered by date and start time, with a next_cursor that is null on the last page.
   /get_events_by_type:
     get:
       summary: Get Events By Type
-      description: Retrieves all academic events of a specific type (e.g., 'exam', 'lecture').
+      description: Retrieves the academic events of a specific type (e.g., 'exam', 'lecture'), at most `limit` (default 100) per call. When next_cursor is not null there are more events; call again with cursor set to it to get them.
       operationId: get_events_by_type
       parameters:
         - name: event_type
@@ -108,9 +271,78 @@ paths:
             type: string
             example: "exam"
           description: The type of the event to retrieve.
+        - name: limit
+          in: query
+          required: false
+          schema:
+            type: integer
+            default: 100
+            maximum: 1000
+          description: Maximum number of events to return in one page.
+        - name: cursor
+          in: query
+          required: false
+          schema:
+            type: string
+          description: The next_cursor value from the previous page, to fetch the following page.
+        - name: fields
+          in: query
+          required: false
+          schema:
+            type: string
+            example: "event_name,event_date,start_time"
+          description: Comma-separated event columns to return instead of all of them.
+      responses:
+        '200':
+          description: A page of events of the specified type, ordered by date and start time, with a next_cursor that is null on the last page.
+  /get_events_batch:
+    post:
+      summary: Get Events For Several Filters At Once
+      description: Answers several date-range and/or event-type lookups in a single call. Prefer this over calling get_events_in_duration and get_events_by_type one after another.
+      operationId: get_events_batch
+      requestBody:
+        required: true
+        content:
+          application/json:
+            schema:
+              type: object
+              required:
+                - queries
+              properties:
+                queries:
+                  type: array
+                  minItems: 1
+                  maxItems: 10
+                  description: The lookups to run. Give start_date and end_date for a date range, event_type for a type, or all three for events of that type within the range.
+                  items:
+                    type: object
+                    properties:
+                      start_date:
+                        type: string
+                        format: date
+                        example: "2025-09-01"
+                      end_date:
+                        type: string
+                        format: date
+                        example: "2025-09-10"
+                      event_type:
+                        type: string
+                        example: "exam"
+                      cursor:
+                        type: string
+                        description: The next_cursor from this lookup's previous page, to fetch the following page.
+                limit:
+                  type: integer
+                  default: 100
+                  maximum: 1000
+                  description: Maximum number of events per lookup.
+                fields:
+                  type: string
+                  example: "event_name,event_date,start_time"
+                  description: Comma-separated event columns to return instead of all of them.
       responses:
         '200':
-          description: A list of events of the specified type.
+          description: A results list with one page of events (and its next_cursor) per lookup, in the order the lookups were given.
 """
 
 # The OpenAPIToolset is a tool provider itself.
@@ -124,19 +356,17 @@ academic_calendar_toolset = OpenAPIToolset(
 def save_summary_to_tidb(session_id: str, user_id: str, summary: str, tool_context: ToolContext) -> Dict[str, str]:
     """Saves the conversation summary to the session_summaries TiDB table."""
     print(f"--- Tool: Saving summary for session {session_id} to TiDB ---")
-    conn = get_db_connection()
     try:
-        with conn.cursor() as cursor:
-            sql = "REPLACE INTO session_summaries (session_id, user_id, summary) VALUES (%s, %s, %s)"
-            cursor.execute(sql, (session_id, user_id, summary))
-        conn.commit()
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                sql = "REPLACE INTO session_summaries (session_id, user_id, summary) VALUES (%s, %s, %s)"
+                cursor.execute(sql, (session_id, user_id, summary))
+            conn.commit()
         tool_context.state['last_summary'] = summary
         return {"status": "success"}
     except Exception as e:
         print(f"ERROR: Failed to save summary to TiDB: {e}")
         return {"status": "error", "message": str(e)}
-    finally:
-        conn.close()
 
 summarizer_tool = FunctionTool(func=save_summary_to_tidb)
 
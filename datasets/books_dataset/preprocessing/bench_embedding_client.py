@@ -0,0 +1,59 @@
+"""Offline throughput benchmark: per-chunk serial embedding vs AsyncEmbeddingClient.
+
+Starts fake_embedding_server.py in-process and embeds the same synthetic chunks
+once the way get_embeddings used to (one blocking request per chunk) and once
+through the batched, concurrent client.
+
+    python bench_embedding_client.py --chunks 2000 --latency 0.1 --batch-size 100 --concurrency 8
+"""
+import argparse
+import time
+
+from embedding_client import AsyncEmbeddingClient, HttpTransport
+from fake_embedding_server import start_in_thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--serial-chunks", type=int, default=100,
+                        help="Chunks to time on the serial path (extrapolated to --chunks)")
+    parser.add_argument("--latency", type=float, default=0.1, help="Simulated seconds per request")
+    parser.add_argument("--per-text-latency", type=float, default=0.001, help="Simulated seconds per text")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rps", type=float, default=50.0, help="Token-bucket requests per second")
+    args = parser.parse_args()
+
+    server, url = start_in_thread(dim=args.dim, latency=args.latency, per_text_latency=args.per_text_latency)
+    texts = [f"synthetic chunk {i} about adolescent identity development and peer relationships"
+             for i in range(args.chunks)]
+    transport = HttpTransport(url)
+
+    try:
+        serial_count = min(args.serial_chunks, args.chunks)
+        start = time.perf_counter()
+        for text in texts[:serial_count]:
+            transport._post([text])
+        serial_seconds = (time.perf_counter() - start) * args.chunks / serial_count
+
+        client = AsyncEmbeddingClient(transport, batch_size=args.batch_size,
+                                      max_concurrency=args.concurrency, requests_per_second=args.rps)
+        start = time.perf_counter()
+        embeddings = client.embed_sync(texts)
+        batched_seconds = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    failed = sum(e is None for e in embeddings)
+    print(f"Chunks:                {args.chunks} (dim {args.dim}, {args.latency * 1e3:.0f} ms/request)")
+    print(f"Serial per-chunk:      {serial_seconds:.1f} s ({args.chunks / serial_seconds:.0f} chunks/s, "
+          f"extrapolated from {serial_count})")
+    print(f"Batched + concurrent:  {batched_seconds:.1f} s ({args.chunks / batched_seconds:.0f} chunks/s, "
+          f"batch {args.batch_size}, concurrency {args.concurrency}, failed {failed})")
+    print(f"Speedup:               {serial_seconds / batched_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
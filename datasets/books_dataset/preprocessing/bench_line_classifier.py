@@ -0,0 +1,99 @@
+"""Micro-benchmark: combined-regex LineClassifier vs the original per-pattern loop.
+
+Lines come from the processed sample texts, re-wrapped to PDF-like line widths
+and mixed with typical header/footer/figure lines so every filter is exercised.
+
+    python bench_line_classifier.py --repeat 200
+"""
+import argparse
+import re
+import textwrap
+import time
+from pathlib import Path
+from typing import List
+
+from line_classifier import HEADER_FOOTER_PATTERNS, IRRELEVANT_PATTERNS, LineClassifier
+
+PROCESSED_FOLDER = Path(__file__).resolve().parent.parent / "processed"
+
+# Representative noise lines seen in raw textbook extractions
+NOISE_LINES = [
+    "Chapter 11 Physical and Cognitive Development in Adolescence",
+    "412",
+    "Page 87",
+    "Copyright © 2009 The McGraw-Hill Companies, Inc.",
+    "ISBN 978-0-07-337016-7",
+    "www.mhhe.com/papaliahd11",
+    "Figure 11.2 Timing of puberty in girls and boys",
+    "Source: Adapted from Kroger, 2007.",
+    "1998 2002 2006 2010 12.4 18.9 22.1",
+    "References",
+]
+
+
+def legacy_keep(line: str, min_line_length: int = 20) -> bool:
+    """The original clean_text_content line filter, one re call per pattern"""
+    if any(re.match(pattern, line, re.IGNORECASE) for pattern in HEADER_FOOTER_PATTERNS):
+        return False
+    if any(re.search(pattern, line, re.IGNORECASE) for pattern in IRRELEVANT_PATTERNS):
+        return False
+    if len(line) < min_line_length:
+        return False
+    if len(re.findall(r'\d', line)) > len(line) * 0.5:
+        return False
+    return True
+
+
+def load_lines(repeat: int) -> List[str]:
+    """Wrap the processed samples to ~80-column lines and interleave noise lines"""
+    lines = []
+    noise = 0
+    for path in sorted(PROCESSED_FOLDER.glob("*.txt")):
+        text = path.read_text(encoding="utf-8")
+        for paragraph in text.split("\n\n"):
+            lines.extend(textwrap.wrap(paragraph, width=80))
+            # Two noise lines after each paragraph, cycling through the list
+            lines.append(NOISE_LINES[noise % len(NOISE_LINES)])
+            lines.append(NOISE_LINES[(noise + 1) % len(NOISE_LINES)])
+            noise += 2
+    return [line.strip() for line in lines if line.strip()] * repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200, help="Times to repeat the sample lines")
+    args = parser.parse_args()
+
+    lines = load_lines(args.repeat)
+    if not lines:
+        print(f"No sample texts found in {PROCESSED_FOLDER}")
+        return
+
+    classifier = LineClassifier(HEADER_FOOTER_PATTERNS, IRRELEVANT_PATTERNS)
+
+    start = time.perf_counter()
+    legacy = [legacy_keep(line) for line in lines]
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    combined = [classifier.classify(line) is None for line in lines]
+    combined_seconds = time.perf_counter() - start
+
+    if legacy != combined:
+        mismatches = sum(a != b for a, b in zip(legacy, combined))
+        raise SystemExit(f"Classifier disagrees with legacy filter on {mismatches} lines")
+
+    reasons = {}
+    for line in lines[:len(lines) // args.repeat]:
+        reason = classifier.classify(line) or "kept"
+        reasons[reason] = reasons.get(reason, 0) + 1
+
+    print(f"Lines classified:    {len(lines)}")
+    print(f"Decisions by reason: {reasons} (per sample pass)")
+    print(f"Per-pattern loop:    {legacy_seconds * 1e3:.1f} ms ({legacy_seconds / len(lines) * 1e6:.2f} us/line)")
+    print(f"Combined classifier: {combined_seconds * 1e3:.1f} ms ({combined_seconds / len(lines) * 1e6:.2f} us/line)")
+    print(f"Speedup:             {legacy_seconds / combined_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = ".build_manifest.json"
+
+
+def file_digest(path: Path, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's contents, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def params_digest(params: Dict) -> str:
+    """Stable SHA-256 of a JSON-serializable parameter dict"""
+    encoded = json.dumps(params, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class BuildManifest:
+    """Per-stage record of which inputs were built with which parameters
+
+    Each entry is keyed by the input file name and stores the input's content
+    hash, the hash of the stage parameters and the outputs produced. A book is
+    stale when its content or the parameters changed, or an output is missing.
+    Size and mtime are kept so unchanged files are not re-hashed on every run.
+    """
+
+    def __init__(self, output_folder: Path):
+        self.path = Path(output_folder) / MANIFEST_NAME
+        self.entries: Dict[str, Dict] = {}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f).get("entries", {})
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable build manifest {self.path}: {e}")
+
+    def source_digest(self, source: Path) -> str:
+        """Content hash of ``source``, reusing the recorded one if size and mtime are unchanged"""
+        stat = source.stat()
+        entry = self.entries.get(source.name)
+        if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+            return entry["source_sha256"]
+        return file_digest(source)
+
+    def is_fresh(self, source: Path, params: Dict) -> bool:
+        """True if ``source`` was already built with ``params`` and all its outputs still exist"""
+        entry = self.entries.get(source.name)
+        if not entry:
+            return False
+        if entry.get("params_sha256") != params_digest(params):
+            return False
+        if not all(Path(output).exists() for output in entry.get("outputs", [])):
+            return False
+        return entry.get("source_sha256") == self.source_digest(source)
+
+    def outputs(self, source: Path) -> List[str]:
+        """Outputs recorded for ``source`` by its last successful build"""
+        return list(self.entries.get(source.name, {}).get("outputs", []))
+
+    def record(self, source: Path, params: Dict, outputs: List[str]):
+        """Record a successful build of ``source`` and persist the manifest"""
+        stat = source.stat()
+        self.entries[source.name] = {
+            "source_sha256": self.source_digest(source),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "params_sha256": params_digest(params),
+            "outputs": [str(output) for output in outputs],
+            "built_at": datetime.now(timezone.utc).isoformat(),
+        }
+        self.save()
+
+    def forget(self, source: Path):
+        """Drop the entry for ``source`` so it is rebuilt next time"""
+        if self.entries.pop(source.name, None) is not None:
+            self.save()
+
+    def save(self):
+        """Write the manifest atomically so an interrupted run keeps earlier entries"""
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"entries": self.entries}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def fresh_outputs(self, source: Path, params: Dict, force: bool = False) -> Optional[List[str]]:
+        """Recorded outputs if ``source`` is up to date (and not forced), else None"""
+        if force or not self.is_fresh(source, params):
+            return None
+        return self.outputs(source)
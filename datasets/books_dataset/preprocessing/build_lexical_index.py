@@ -0,0 +1,69 @@
+"""Build BM25 indexes for existing semantic chunk files and time lexical search on them.
+
+semantic_chunker.py writes ``<book>_semantic_chunks.bm25`` for every book it
+chunks; this script indexes chunk files produced before that (or copied in
+from elsewhere) without re-chunking, then runs a few queries against the
+whole folder.
+
+    python build_lexical_index.py                       # index books that have no .bm25 yet
+    python build_lexical_index.py --force               # re-index every book
+    python build_lexical_index.py --query "Erikson identity vs role confusion"
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from chunk_stream import find_semantic_chunk_files, iter_chunk_file
+
+sys.path.append(str(Path(__file__).resolve().parents[3] / "Agents" / "agents"))
+from lexical_index import INDEX_SUFFIX, BookIndex, LexicalIndex
+
+DEFAULT_QUERIES = [
+    "Erikson identity vs role confusion",
+    "Piaget formal operational stage",
+    "Kohlberg stages of moral reasoning",
+    "secure attachment in infancy",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build BM25 indexes for semantic chunk files")
+    parser.add_argument("--folder", default="semantic_chunks")
+    parser.add_argument("--force", action="store_true", help="Re-index books that already have an index")
+    parser.add_argument("--query", action="append", help="Query to time (repeatable); defaults to a few samples")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=200, help="Timed runs per query")
+    args = parser.parse_args()
+
+    folder = Path(args.folder)
+    for path in find_semantic_chunk_files(folder):
+        stem = path.stem
+        index_path = folder / (stem + INDEX_SUFFIX)
+        if index_path.exists() and not args.force:
+            print(f"Skipping {path.name} - {index_path.name} exists")
+            continue
+        header, records = {}, []
+        for header, record in iter_chunk_file(path):
+            records.append(record)
+        book_name = header.get("book_name", stem.replace("_semantic_chunks", ""))
+        start = time.perf_counter()
+        BookIndex.write(index_path, book_name, records)
+        print(f"Indexed {len(records)} chunks of {book_name} in {time.perf_counter() - start:.2f}s")
+
+    index = LexicalIndex.open_folder(folder)
+    print(f"\n{len(index.books)} books, {len(index)} chunks")
+    for query in args.query or DEFAULT_QUERIES:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            results = index.search(query, args.k)
+            timings.append(time.perf_counter() - start)
+        print(f"\n{query!r}: p50 {statistics.median(timings) * 1e3:.3f} ms")
+        for result in results:
+            print(f"  {result.score:6.2f}  {result.id}: {result.document[:90]!r}")
+
+
+if __name__ == "__main__":
+    main()
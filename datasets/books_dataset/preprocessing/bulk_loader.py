@@ -0,0 +1,174 @@
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import sqlalchemy
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+# Rough size of one float in the vector literal sent to TiDB ("-0.0123456," and friends)
+_BYTES_PER_VECTOR_VALUE = 12
+
+
+def _table_rows(rows: List[Dict]) -> List[Dict]:
+    return [
+        {"id": row["id"], "document": row["text"], "embedding": row["embedding"], "meta": row["metadata"]}
+        for row in rows
+    ]
+
+
+def bulk_insert(vector_store, rows: List[Dict]):
+    """Insert rows into a TiDBVectorClient table with one multi-row INSERT per call
+
+    TiDBVectorClient.insert adds ORM objects one by one; this goes through the
+    same table model but as a single executemany, which pymysql rewrites into a
+    multi-row ``INSERT ... VALUES (...), (...)``. Each row needs id, text,
+    embedding and metadata keys.
+    """
+    table = vector_store._table_model.__table__
+    with vector_store._bind.begin() as conn:
+        conn.execute(sqlalchemy.insert(table), _table_rows(rows))
+
+
+def bulk_upsert(vector_store, rows: List[Dict]):
+    """Like bulk_insert, but rows whose id already exists are updated in place"""
+    table = vector_store._table_model.__table__
+    stmt = mysql_insert(table)
+    stmt = stmt.on_duplicate_key_update(
+        embedding=stmt.inserted.embedding,
+        document=stmt.inserted.document,
+        meta=stmt.inserted.meta,
+    )
+    with vector_store._bind.begin() as conn:
+        conn.execute(stmt, _table_rows(rows))
+
+
+def estimate_row_bytes(document: Dict, dim: int) -> int:
+    """Approximate statement bytes a row adds: text, JSON metadata and vector literal"""
+    return (len(document["text"].encode("utf-8"))
+            + len(json.dumps(document["metadata"], ensure_ascii=False))
+            + dim * _BYTES_PER_VECTOR_VALUE)
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class PipelineStats:
+    """Row counts and per-stage latencies for one pipelined load"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.embed_seconds: List[float] = []
+        self.insert_seconds: List[float] = []
+        self.insert_rows: List[int] = []
+        self.inserted = 0
+        self.failed = 0
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        print(f"\nPipeline Summary:")
+        print(f"  - Rows inserted: {self.inserted} ({self.failed} failed) in {elapsed:.1f}s "
+              f"-> {self.inserted / elapsed if elapsed else 0:.1f} rows/s")
+        for stage, seconds in (("Embed", self.embed_seconds), ("Insert", self.insert_seconds)):
+            if seconds:
+                print(f"  - {stage}: {len(seconds)} batches, total {sum(seconds):.1f}s, "
+                      f"p50 {_percentile(seconds, 0.5) * 1e3:.0f} ms, p95 {_percentile(seconds, 0.95) * 1e3:.0f} ms")
+        if self.insert_rows:
+            print(f"  - Rows per INSERT: avg {sum(self.insert_rows) / len(self.insert_rows):.0f}, "
+                  f"max {max(self.insert_rows)}")
+
+
+class PipelinedLoader:
+    """Embed and insert documents with the two stages overlapped
+
+    Documents are embedded in batches of up to ``embed_batch_size`` (the
+    embedding API's per-request limit) on a small thread pool that keeps
+    ``prefetch`` batches ahead, while the calling thread inserts finished rows.
+    Insert batches grow until ``max_insert_rows`` or ``max_insert_bytes`` of
+    estimated statement payload, so large texts give smaller statements and
+    short ones are packed into fewer round trips.
+    """
+
+    def __init__(self, vector_store, embed: Callable[[List[str]], List[List[float]]], dim: int,
+                 embed_batch_size: int = 100, prefetch: int = 2,
+                 max_insert_rows: int = 500, max_insert_bytes: int = 8 * 1024 * 1024,
+                 insert: Optional[Callable] = None):
+        self.vector_store = vector_store
+        self.embed = embed
+        self.dim = dim
+        self.embed_batch_size = max(1, embed_batch_size)
+        self.prefetch = max(1, prefetch)
+        self.max_insert_rows = max(1, max_insert_rows)
+        self.max_insert_bytes = max_insert_bytes
+        self.insert = insert or bulk_insert
+        self.stats = PipelineStats()
+
+    def _embed_batch(self, batch: List[Dict]):
+        start = time.perf_counter()
+        try:
+            embeddings = self.embed([doc["text"] for doc in batch])
+        except Exception as e:
+            print(f"  ✗ Error embedding batch starting at {batch[0]['id']}: {e}")
+            return batch, None
+        self.stats.embed_seconds.append(time.perf_counter() - start)
+        return batch, embeddings
+
+    def _insert(self, rows: List[Dict]):
+        start = time.perf_counter()
+        try:
+            self.insert(self.vector_store, rows)
+        except Exception as e:
+            print(f"  ✗ Error inserting {len(rows)} rows starting at {rows[0]['id']}: {e}")
+            self.stats.failed += len(rows)
+            return
+        self.stats.insert_seconds.append(time.perf_counter() - start)
+        self.stats.insert_rows.append(len(rows))
+        self.stats.inserted += len(rows)
+        print(f"  ✓ Inserted {len(rows)} rows ({self.stats.inserted} total)")
+
+    def _batches(self, documents: Iterable[Dict]) -> Iterator[List[Dict]]:
+        documents = iter(documents)
+        while True:
+            batch = list(islice(documents, self.embed_batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def run(self, documents: Iterable[Dict]) -> PipelineStats:
+        """Embed and insert all documents; returns the collected stats"""
+        batches = self._batches(documents)
+        pending_rows: List[Dict] = []
+        pending_bytes = 0
+
+        with ThreadPoolExecutor(max_workers=self.prefetch) as embed_pool:
+            in_flight = deque(embed_pool.submit(self._embed_batch, batch)
+                              for batch in islice(batches, self.prefetch))
+            while in_flight:
+                batch, embeddings = in_flight.popleft().result()
+                # Keep the embedding stage busy while this thread inserts
+                for next_batch in islice(batches, 1):
+                    in_flight.append(embed_pool.submit(self._embed_batch, next_batch))
+
+                if embeddings is None:
+                    self.stats.failed += len(batch)
+                    continue
+
+                for doc, embedding in zip(batch, embeddings):
+                    row_bytes = estimate_row_bytes(doc, self.dim)
+                    if pending_rows and (len(pending_rows) >= self.max_insert_rows
+                                         or pending_bytes + row_bytes > self.max_insert_bytes):
+                        self._insert(pending_rows)
+                        pending_rows, pending_bytes = [], 0
+                    pending_rows.append({**doc, "embedding": embedding})
+                    pending_bytes += row_bytes
+
+            if pending_rows:
+                self._insert(pending_rows)
+
+        return self.stats
@@ -0,0 +1,156 @@
+import json
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+# The chunk store format lives in the agent package so retrieval can map the same files
+sys.path.append(str(Path(__file__).resolve().parents[3] / "Agents" / "agents"))
+from chunk_store import STORE_SUFFIX, ChunkStore
+
+# Characters read from disk per refill; a single chunk larger than this just triggers more refills
+BLOCK_SIZE = 1 << 16
+
+_WHITESPACE = " \t\n\r"
+_NUMBER_CHARS = "0123456789+-.eE"
+
+
+class _IncrementalReader:
+    """Pulls JSON values out of a text file without loading the whole file
+
+    Values are decoded with ``JSONDecoder.raw_decode`` from a buffer that is
+    refilled when a value runs past its end, and consumed text is dropped on
+    each refill, so memory stays at roughly one block plus the largest value.
+    """
+
+    def __init__(self, f, block_size: int = BLOCK_SIZE):
+        self.f = f
+        self.block_size = block_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        data = self.f.read(self.block_size)
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character, or '' at end of file"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' but found '{found or 'end of file'}'")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number cut off by the buffer end still decodes ("1" of "1.5"), so only trust
+                # values followed by something that cannot continue them
+                if (end < len(self.buf) and self.buf[end] not in _NUMBER_CHARS) or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+
+def _iter_json_chunks(f, array_key: str) -> Iterator[Tuple[Dict, Dict]]:
+    reader = _IncrementalReader(f)
+    header: Dict = {}
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        key = reader.value()
+        reader.expect(":")
+        if key == array_key:
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.pos += 1
+            else:
+                while True:
+                    yield header, reader.value()
+                    if reader.peek() == ",":
+                        reader.pos += 1
+                        continue
+                    reader.expect("]")
+                    break
+        else:
+            header[key] = reader.value()
+        if reader.peek() == ",":
+            reader.pos += 1
+            continue
+        reader.expect("}")
+        return
+
+
+def _iter_jsonl_chunks(f) -> Iterator[Tuple[Dict, Dict]]:
+    header = None
+    for line in f:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if header is None:
+            header = record
+            continue
+        yield header, record
+
+
+def iter_chunk_file(path: Path, array_key: str = "chunks") -> Iterator[Tuple[Dict, Dict]]:
+    """Yield (header, chunk) pairs from a semantic chunk file, one chunk in memory at a time
+
+    ``.chunks`` directories are memory-mapped chunk stores. ``.jsonl`` files
+    hold a header object on the first line and one chunk per line after it.
+    ``.json`` files are parsed incrementally: top-level keys other than
+    ``array_key`` go into the header dict, which is complete for every key
+    that precedes the chunk array in the file (SemanticChunker writes
+    ``book_name`` and ``total_chunks`` first).
+    """
+    path = Path(path)
+    if path.suffix == STORE_SUFFIX:
+        store = ChunkStore(path)
+        header = {"book_name": store.book_name, "total_chunks": len(store)}
+        for record in store:
+            yield header, record
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.suffix == ".jsonl":
+            yield from _iter_jsonl_chunks(f)
+        else:
+            yield from _iter_json_chunks(f, array_key)
+
+
+def _written_at(path: Path) -> int:
+    # A chunk store is a directory; its meta.json is written last
+    return (path / "meta.json" if path.is_dir() else path).stat().st_mtime_ns
+
+
+def find_semantic_chunk_files(folder: Path) -> List[Path]:
+    """Chunk files in the folder, one per book: the most recently written of its JSON,
+    JSON Lines and chunk store (the store wins a tie), so a stale store never
+    shadows a re-chunked book."""
+    files = {}
+    patterns = ("*_semantic_chunks.json", "*_semantic_chunks.jsonl", f"*_semantic_chunks{STORE_SUFFIX}")
+    for preference, pattern in enumerate(patterns):
+        for path in sorted(Path(folder).glob(pattern)):
+            rank = (_written_at(path), preference)
+            if path.stem not in files or rank > files[path.stem][0]:
+                files[path.stem] = (rank, path)
+    return [path for _, path in files.values()]
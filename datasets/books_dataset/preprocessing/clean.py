@@ -1,155 +1,189 @@
 import os
 import re
+import argparse
 import fitz  # PyMuPDF
 from pathlib import Path
 import logging
-from typing import List, Dict, Optional
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import islice
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
+
+from build_cache import BuildManifest
+from line_classifier import HEADER_FOOTER_PATTERNS, IRRELEVANT_PATTERNS, LineClassifier
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bump when the extraction/cleaning logic changes so cached outputs are rebuilt
+CLEANER_VERSION = 1
+
+# Normalization passes applied to each cleaned page
+_WHITESPACE = re.compile(r'\s+')
+_LOWER_UPPER = re.compile(r'([a-z])([A-Z])')
+_WORD_DIGIT = re.compile(r'(\w)(\d)')
+_DIGIT_WORD = re.compile(r'(\d)(\w)')
+_SPACE_PUNCT = re.compile(r'\s+([.,;:!?])')
+_PUNCT_LETTER = re.compile(r'([.,;:!?])([A-Za-z])')
+
+def extract_page(page, page_num: int) -> Dict:
+    """Extract the body text of a single PyMuPDF page, dropping footnote/header-sized spans"""
+    # Get text blocks with position info
+    blocks = page.get_text("dict")
+    page_text = []
+
+    for block in blocks["blocks"]:
+        if "lines" in block:  # Text block
+            block_text = ""
+            for line in block["lines"]:
+                line_text = ""
+                for span in line["spans"]:
+                    # Skip if font size is too small (likely footnotes/captions)
+                    if span["size"] < 8:
+                        continue
+                    # Skip if font size is very large (likely headers)
+                    if span["size"] > 24:
+                        continue
+                    line_text += span["text"]
+
+                if line_text.strip():
+                    block_text += line_text + " "
+
+            if block_text.strip():
+                page_text.append(block_text.strip())
+
+    # Combine all text blocks for this page
+    full_page_text = "\n".join(page_text)
+
+    return {
+        "page_num": page_num + 1,
+        "text": full_page_text,
+        "images_count": len([b for b in blocks["blocks"] if "lines" not in b])
+    }
+
+
+def extract_page_range(pdf_path: str, start: int, end: int) -> List[Dict]:
+    """Open the PDF and extract pages [start, end).
+
+    Module-level so it can be pickled into a process pool; each worker opens
+    its own document handle since fitz documents cannot be shared across processes.
+    """
+    with fitz.open(pdf_path) as doc:
+        return [extract_page(doc[page_num], page_num) for page_num in range(start, end)]
+
+
 class PDFCleaner:
-    def __init__(self, books_folder: str = "books"):
+    def __init__(self, books_folder: str = "books", workers: int = 1, pages_per_task: int = 32):
         self.books_folder = Path(books_folder)
         self.output_folder = Path("cleaned_books")
         self.output_folder.mkdir(exist_ok=True)
         
         # Common academic book headers/footers to remove
-        self.header_footer_patterns = [
-            r'^Chapter \d+.*$',
-            r'^\d+\s*$',  # Page numbers
-            r'^Page \d+.*$',
-            r'.*Copyright.*$',
-            r'.*McGraw-Hill.*$',
-            r'.*Education.*$',
-            r'.*All rights reserved.*$',
-            r'^[A-Z\s]{10,}$',  # Long uppercase headers
-            r'^\s*www\..*$',  # Website URLs
-            r'^\s*ISBN.*$',
-            r'^\s*\d{4}\s*$',  # Years
-        ]
+        self.header_footer_patterns = list(HEADER_FOOTER_PATTERNS)
         
         # Patterns for irrelevant content
-        self.irrelevant_patterns = [
-            r'\[Figure \d+.*?\]',
-            r'\[Chart \d+.*?\]',
-            r'\[Table \d+.*?\]',
-            r'\[Image \d+.*?\]',
-            r'Figure \d+\.\d+.*',
-            r'Table \d+\.\d+.*',
-            r'Chart \d+\.\d+.*',
-            r'Source:.*',
-            r'References\s*$',
-            r'Bibliography\s*$',
-            r'Index\s*$',
-            r'Appendix [A-Z]\s*$',
-        ]
+        self.irrelevant_patterns = list(IRRELEVANT_PATTERNS)
         
         # Minimum line length to consider as meaningful content
         self.min_line_length = 20
+        self._line_classifier = None
+        self._line_classifier_key = None
+
+        # Parallel extraction: number of worker processes and pages handed to each task
+        self.workers = max(1, workers)
+        self.pages_per_task = max(1, pages_per_task)
         
-    def extract_text_from_pdf(self, pdf_path: Path) -> List[Dict]:
+    def page_ranges(self, page_count: int) -> List[Tuple[int, int]]:
+        """Split a document into contiguous [start, end) page ranges for the worker pool"""
+        return [
+            (start, min(start + self.pages_per_task, page_count))
+            for start in range(0, page_count, self.pages_per_task)
+        ]
+
+    def iter_pages(self, pdf_path: Path, executor: Optional[Executor] = None) -> Iterator[Dict]:
+        """Yield extracted pages one at a time, in page order
+
+        With more than one worker, page ranges are extracted in a process pool.
+        At most ``2 * workers`` ranges are in flight, so memory stays bounded
+        by the window rather than growing with the size of the book.
+        Pass ``executor`` to reuse a pool across books.
+        """
+        with fitz.open(pdf_path) as doc:
+            page_count = len(doc)
+            logger.info(f"Processing {pdf_path.name} - {page_count} pages")
+
+            if self.workers <= 1 or page_count <= self.pages_per_task:
+                for page_num in range(page_count):
+                    yield extract_page(doc[page_num], page_num)
+                return
+
+        ranges = self.page_ranges(page_count)
+        if executor is None:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(ranges))) as pool:
+                yield from self._iter_ranges(pool, pdf_path, ranges)
+        else:
+            yield from self._iter_ranges(executor, pdf_path, ranges)
+
+    def _iter_ranges(self, executor: Executor, pdf_path: Path,
+                     ranges: List[Tuple[int, int]]) -> Iterator[Dict]:
+        """Keep a bounded window of range tasks in flight and yield their pages in order"""
+        pending = deque()
+        remaining = iter(ranges)
+        max_pending = self.workers * 2
+
+        def submit_next(count: int):
+            for start, end in islice(remaining, count):
+                pending.append(executor.submit(extract_page_range, str(pdf_path), start, end))
+
+        submit_next(max_pending)
+        while pending:
+            range_pages = pending.popleft().result()
+            submit_next(1)
+            yield from range_pages
+
+    def extract_text_from_pdf(self, pdf_path: Path, executor: Optional[Executor] = None) -> List[Dict]:
         """Extract text from PDF with metadata about images and formatting"""
-        doc = fitz.open(pdf_path)
-        pages_content = []
-        
-        logger.info(f"Processing {pdf_path.name} - {len(doc)} pages")
-        
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            
-            # Get text blocks with position info
-            blocks = page.get_text("dict")
-            page_text = []
-            
-            for block in blocks["blocks"]:
-                if "lines" in block:  # Text block
-                    block_text = ""
-                    for line in block["lines"]:
-                        line_text = ""
-                        for span in line["spans"]:
-                            # Skip if font size is too small (likely footnotes/captions)
-                            if span["size"] < 8:
-                                continue
-                            # Skip if font size is very large (likely headers)
-                            if span["size"] > 24:
-                                continue
-                            line_text += span["text"]
-                        
-                        if line_text.strip():
-                            block_text += line_text + " "
-                    
-                    if block_text.strip():
-                        page_text.append(block_text.strip())
-            
-            # Combine all text blocks for this page
-            full_page_text = "\n".join(page_text)
-            
-            pages_content.append({
-                "page_num": page_num + 1,
-                "text": full_page_text,
-                "images_count": len([b for b in blocks["blocks"] if "lines" not in b])
-            })
-        
-        doc.close()
-        return pages_content
+        return list(self.iter_pages(pdf_path, executor=executor))
     
+    @property
+    def line_classifier(self) -> LineClassifier:
+        """Compiled line filter, rebuilt if the pattern lists or min_line_length were changed"""
+        key = (tuple(self.header_footer_patterns), tuple(self.irrelevant_patterns), self.min_line_length)
+        if self._line_classifier is None or self._line_classifier_key != key:
+            self._line_classifier = LineClassifier(
+                self.header_footer_patterns, self.irrelevant_patterns, self.min_line_length
+            )
+            self._line_classifier_key = key
+        return self._line_classifier
+
     def clean_text_content(self, text: str) -> str:
         """Clean and normalize text content"""
-        # Remove headers and footers
-        lines = text.split('\n')
-        cleaned_lines = []
-        
-        for line in lines:
-            line = line.strip()
-            
-            # Skip empty lines
-            if not line:
-                continue
-                
-            # Skip lines that match header/footer patterns
-            if any(re.match(pattern, line, re.IGNORECASE) for pattern in self.header_footer_patterns):
-                continue
-                
-            # Skip lines that match irrelevant content patterns
-            if any(re.search(pattern, line, re.IGNORECASE) for pattern in self.irrelevant_patterns):
-                continue
-                
-            # Skip very short lines (likely artifacts)
-            if len(line) < self.min_line_length:
-                continue
-                
-            # Skip lines with too many numbers (likely data tables)
-            if len(re.findall(r'\d', line)) > len(line) * 0.5:
-                continue
-                
-            cleaned_lines.append(line)
+        # Remove headers/footers, irrelevant content, short artifacts and table rows
+        cleaned_lines = self.line_classifier.filter_lines(text.split('\n'))
         
         # Join lines and clean up spacing
         cleaned_text = ' '.join(cleaned_lines)
         
         # Remove multiple spaces
-        cleaned_text = re.sub(r'\s+', ' ', cleaned_text)
+        cleaned_text = _WHITESPACE.sub(' ', cleaned_text)
         
         # Remove common artifacts
-        cleaned_text = re.sub(r'([a-z])([A-Z])', r'\1 \2', cleaned_text)  # Add space before capitals
-        cleaned_text = re.sub(r'(\w)(\d)', r'\1 \2', cleaned_text)  # Space before numbers
-        cleaned_text = re.sub(r'(\d)(\w)', r'\1 \2', cleaned_text)  # Space after numbers
+        cleaned_text = _LOWER_UPPER.sub(r'\1 \2', cleaned_text)  # Add space before capitals
+        cleaned_text = _WORD_DIGIT.sub(r'\1 \2', cleaned_text)  # Space before numbers
+        cleaned_text = _DIGIT_WORD.sub(r'\1 \2', cleaned_text)  # Space after numbers
         
         # Clean up punctuation
-        cleaned_text = re.sub(r'\s+([.,;:!?])', r'\1', cleaned_text)  # Remove space before punctuation
-        cleaned_text = re.sub(r'([.,;:!?])([A-Za-z])', r'\1 \2', cleaned_text)  # Add space after punctuation
+        cleaned_text = _SPACE_PUNCT.sub(r'\1', cleaned_text)  # Remove space before punctuation
+        cleaned_text = _PUNCT_LETTER.sub(r'\1 \2', cleaned_text)  # Add space after punctuation
         
         # Convert to lowercase as requested
         cleaned_text = cleaned_text.lower()
         
         return cleaned_text.strip()
     
-    def filter_meaningful_content(self, pages_content: List[Dict]) -> str:
-        """Filter pages to keep only meaningful content"""
-        meaningful_content = []
-        
+    def iter_meaningful_content(self, pages_content: Iterable[Dict]) -> Iterator[str]:
+        """Yield the cleaned text of each page that carries meaningful content"""
         for page_info in pages_content:
             text = page_info["text"]
             
@@ -167,41 +201,64 @@ class PDFCleaner:
             
             # Only add if there's substantial content after cleaning
             if len(cleaned_text.split()) >= 30:
-                meaningful_content.append(cleaned_text)
-        
-        return '\n\n'.join(meaningful_content)
+                yield cleaned_text
+
+    def filter_meaningful_content(self, pages_content: Iterable[Dict]) -> str:
+        """Filter pages to keep only meaningful content"""
+        return '\n\n'.join(self.iter_meaningful_content(pages_content))
     
-    def process_book(self, pdf_path: Path) -> Optional[str]:
-        """Process a single book"""
+    def process_book(self, pdf_path: Path, executor: Optional[Executor] = None) -> Optional[str]:
+        """Process a single book
+
+        Pages are streamed through extract -> filter -> clean and appended to the
+        output as they arrive, so memory use does not grow with the page count.
+        The file is written under a temporary name and renamed once complete.
+        """
+        output_path = self.output_folder / f"{pdf_path.stem}_cleaned.txt"
+        partial_path = output_path.with_name(output_path.name + ".partial")
         try:
             logger.info(f"Starting processing of {pdf_path.name}")
+            self.line_classifier.rejections.clear()
             
-            # Extract text from PDF
-            pages_content = self.extract_text_from_pdf(pdf_path)
+            pages = self.iter_pages(pdf_path, executor=executor)
+            content_length = 0
+            with open(partial_path, 'w', encoding='utf-8') as f:
+                for cleaned_text in self.iter_meaningful_content(pages):
+                    if content_length:
+                        f.write('\n\n')
+                        content_length += 2
+                    f.write(cleaned_text)
+                    content_length += len(cleaned_text)
             
-            # Filter and clean content
-            cleaned_content = self.filter_meaningful_content(pages_content)
-            
-            if not cleaned_content:
+            if not content_length:
                 logger.warning(f"No meaningful content extracted from {pdf_path.name}")
+                partial_path.unlink()
                 return None
             
-            # Save cleaned content
-            output_path = self.output_folder / f"{pdf_path.stem}_cleaned.txt"
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(cleaned_content)
+            partial_path.replace(output_path)
             
             logger.info(f"Successfully processed {pdf_path.name} -> {output_path}")
-            logger.info(f"Final content length: {len(cleaned_content)} characters")
+            logger.info(f"Final content length: {content_length} characters")
+            logger.info(f"Rejected lines by reason: {dict(self.line_classifier.rejections)}")
             
             return str(output_path)
             
         except Exception as e:
             logger.error(f"Error processing {pdf_path.name}: {str(e)}")
+            partial_path.unlink(missing_ok=True)
             return None
     
-    def process_all_books(self) -> List[str]:
-        """Process all PDF books in the books folder"""
+    def cache_params(self) -> Dict:
+        """Parameters that shape the cleaned output; changing any of them invalidates the build cache"""
+        return {
+            "version": CLEANER_VERSION,
+            "header_footer_patterns": self.header_footer_patterns,
+            "irrelevant_patterns": self.irrelevant_patterns,
+            "min_line_length": self.min_line_length,
+        }
+    
+    def process_all_books(self, force: bool = False) -> List[str]:
+        """Process all PDF books in the books folder, skipping books that are up to date"""
         pdf_files = list(self.books_folder.glob("*.pdf"))
         
         if not pdf_files:
@@ -211,18 +268,51 @@ class PDFCleaner:
         logger.info(f"Found {len(pdf_files)} PDF files to process")
         
         processed_files = []
+        manifest = BuildManifest(self.output_folder)
+        params = self.cache_params()
+        
+        # Only books whose PDF or cleaning parameters changed are re-extracted
+        stale_files = []
         for pdf_path in pdf_files:
-            output_path = self.process_book(pdf_path)
-            if output_path:
-                processed_files.append(output_path)
+            cached_outputs = manifest.fresh_outputs(pdf_path, params, force=force)
+            if cached_outputs:
+                logger.info(f"Skipping {pdf_path.name} - cleaned output is up to date")
+                processed_files.extend(cached_outputs)
+            else:
+                stale_files.append(pdf_path)
+        
+        # One pool for the whole run so workers are not respawned per book
+        executor = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 and stale_files else None
+        try:
+            for pdf_path in stale_files:
+                output_path = self.process_book(pdf_path, executor=executor)
+                if output_path:
+                    manifest.record(pdf_path, params, [output_path])
+                    processed_files.append(output_path)
+                else:
+                    manifest.forget(pdf_path)
+        finally:
+            if executor is not None:
+                executor.shutdown()
         
         logger.info(f"Successfully processed {len(processed_files)} out of {len(pdf_files)} books")
         return processed_files
 
 def main():
     """Main function to clean all books"""
-    cleaner = PDFCleaner()
-    processed_files = cleaner.process_all_books()
+    parser = argparse.ArgumentParser(description="Extract and clean textbook PDFs")
+    parser.add_argument("--books-folder", default="books", help="Folder containing the source PDFs")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes for page extraction (default 1 = serial)")
+    parser.add_argument("--pages-per-task", type=int, default=32,
+                        help="Pages extracted per worker task")
+    parser.add_argument("--force", action="store_true",
+                        help="Reprocess every book, ignoring the build cache")
+    args = parser.parse_args()
+
+    cleaner = PDFCleaner(books_folder=args.books_folder, workers=args.workers,
+                         pages_per_task=args.pages_per_task)
+    processed_files = cleaner.process_all_books(force=args.force)
     
     print(f"\nProcessing complete!")
     print(f"Processed files:")
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import logging
+import random
+import time
+import urllib.request
+from typing import List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Async token bucket: ``rate`` tokens per second, bursting up to ``capacity``"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float = 1.0):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+class BackendTransport:
+    """Batched calls through an EmbeddingBackend (Gemini API or the local hashing embedder)"""
+
+    def __init__(self, backend, task_type: str):
+        self.backend = backend
+        self.task_type = task_type
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return await self.backend.embed_async(texts, self.task_type)
+
+
+class HttpTransport:
+    """Batched calls to a JSON embedding endpoint, e.g. fake_embedding_server.py
+
+    Request body: ``{"texts": [...], "task_type": ...}``; response: ``{"embeddings": [[...], ...]}``.
+    """
+
+    def __init__(self, url: str, task_type: str = "semantic_similarity", timeout: float = 60.0):
+        self.url = url
+        self.task_type = task_type
+        self.timeout = timeout
+
+    def _post(self, texts: List[str]) -> List[List[float]]:
+        body = json.dumps({"texts": texts, "task_type": self.task_type}).encode('utf-8')
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())["embeddings"]
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self._post, texts)
+
+
+class AsyncEmbeddingClient:
+    """Batched, concurrent embedding client
+
+    Texts are split into batches of ``batch_size``; at most ``max_concurrency``
+    batches are in flight, request starts are paced by a token bucket of
+    ``requests_per_second``, and failed batches are retried with exponential
+    backoff and jitter. A batch that still fails after ``max_retries`` yields
+    None for each of its texts so the caller decides how to handle it.
+    """
+
+    def __init__(self, transport, batch_size: int = 100, max_concurrency: int = 8,
+                 requests_per_second: float = 25.0, max_retries: int = 5,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0):
+        self.transport = transport
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.requests_per_second = requests_per_second
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    async def _embed_batch(self, batch_index: int, texts: List[str], semaphore: asyncio.Semaphore,
+                           bucket: TokenBucket) -> List[Optional[List[float]]]:
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                await bucket.acquire()
+                try:
+                    embeddings = await self.transport.embed_batch(texts)
+                    if len(embeddings) != len(texts):
+                        raise ValueError(f"Expected {len(texts)} embeddings, got {len(embeddings)}")
+                    return embeddings
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        logger.error(f"Embedding batch {batch_index} failed after {attempt + 1} attempts: {e}")
+                        return [None] * len(texts)
+                    delay = min(self.backoff_max, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.0)
+                    logger.warning(f"Embedding batch {batch_index} failed ({e}); retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+
+    async def embed(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Embed ``texts`` in order; entries are None where a batch failed permanently"""
+        texts = list(texts)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        bucket = TokenBucket(self.requests_per_second)
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+
+        tasks = [self._embed_batch(i, batch, semaphore, bucket) for i, batch in enumerate(batches)]
+        results: List[Optional[List[float]]] = []
+        for batch_result in await asyncio.gather(*tasks):
+            results.extend(batch_result)
+        logger.info(f"Embedded {len(texts)} texts in {len(batches)} batches")
+        return results
+
+    def embed_sync(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Blocking wrapper around ``embed`` for synchronous callers"""
+        return asyncio.run(self.embed(texts))
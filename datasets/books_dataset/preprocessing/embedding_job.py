@@ -0,0 +1,214 @@
+import hashlib
+import json
+import logging
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingJobIncomplete(RuntimeError):
+    """Raised when chunks still have no embedding after all retry rounds
+
+    The job directory keeps the checkpoint and retry queue, so running the
+    same job again only embeds the chunks listed in ``failed_indices``.
+    """
+
+    def __init__(self, job_dir: Path, failed_indices: List[int]):
+        self.job_dir = job_dir
+        self.failed_indices = failed_indices
+        super().__init__(f"{len(failed_indices)} chunks could not be embedded; "
+                         f"rerun to resume from the checkpoint in {job_dir}")
+
+
+def texts_digest(texts: List[str]) -> str:
+    digest = hashlib.sha256()
+    for text in texts:
+        digest.update(hashlib.sha256(text.encode('utf-8')).digest())
+    return digest.hexdigest()
+
+
+class EmbeddingJob:
+    """Resumable embedding of one book's chunks
+
+    State lives in ``job_dir``:
+      - ``job.json``: hash of the chunk texts, model, task type and vector dimension
+      - ``embeddings.f32``: float32 memory-mapped (chunks x dim) matrix
+      - ``done.npy``: which rows hold a real embedding
+      - ``retry_queue.jsonl``: chunks whose batch failed, with attempts and last error
+
+    Chunks are embedded in segments of ``checkpoint_every``, checkpointing after
+    each one. Failed chunks go to the retry queue and are retried in bulk for up
+    to ``retry_rounds`` rounds; anything still missing raises EmbeddingJobIncomplete
+    rather than being padded with placeholder vectors. The directory is removed
+    once every chunk has an embedding.
+    """
+
+    def __init__(self, job_dir: Path, texts: List[str], client, model: str, task_type: str,
+                 cache=None, checkpoint_every: int = 1000, retry_rounds: int = 3,
+                 retry_delay: float = 10.0):
+        self.job_dir = Path(job_dir)
+        self.texts = texts
+        self.client = client
+        self.model = model
+        self.task_type = task_type
+        self.cache = cache
+        self.checkpoint_every = max(1, checkpoint_every)
+        self.retry_rounds = retry_rounds
+        self.retry_delay = retry_delay
+
+        self.job_path = self.job_dir / "job.json"
+        self.embeddings_path = self.job_dir / "embeddings.f32"
+        self.done_path = self.job_dir / "done.npy"
+        self.retry_path = self.job_dir / "retry_queue.jsonl"
+
+        self.dim: Optional[int] = None
+        self.embeddings: Optional[np.memmap] = None
+        self.done = np.zeros(len(texts), dtype=bool)
+        self.retry_queue: Dict[int, Dict] = {}
+
+    # --- Checkpoint state ---
+    def _job_meta(self) -> Dict:
+        return {
+            "texts_sha256": texts_digest(self.texts),
+            "count": len(self.texts),
+            "model": self.model,
+            "task_type": self.task_type,
+        }
+
+    def _load(self):
+        """Resume from an existing checkpoint if it belongs to the same texts and model"""
+        if not self.job_path.exists():
+            self.job_dir.mkdir(parents=True, exist_ok=True)
+            return
+        with open(self.job_path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        if {k: saved.get(k) for k in self._job_meta()} != self._job_meta():
+            logger.info(f"Chunks changed since checkpoint {self.job_dir}; starting a new embedding job")
+            shutil.rmtree(self.job_dir)
+            self.job_dir.mkdir(parents=True, exist_ok=True)
+            return
+
+        self.dim = saved.get("dim")
+        if self.dim and self.embeddings_path.exists() and self.done_path.exists():
+            self._open_embeddings(mode='r+')
+            self.done = np.load(self.done_path)
+        if self.retry_path.exists():
+            with open(self.retry_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self.retry_queue[entry["index"]] = entry
+        logger.info(f"Resuming embedding job {self.job_dir}: {int(self.done.sum())}/{len(self.texts)} done, "
+                    f"{len(self.retry_queue)} queued for retry")
+
+    def _open_embeddings(self, mode: str):
+        self.embeddings = np.memmap(self.embeddings_path, dtype=np.float32, mode=mode,
+                                    shape=(len(self.texts), self.dim))
+
+    def _save_meta(self):
+        with open(self.job_path, 'w', encoding='utf-8') as f:
+            json.dump({**self._job_meta(), "dim": self.dim}, f)
+
+    def _checkpoint(self):
+        if self.embeddings is not None:
+            self.embeddings.flush()
+        tmp_done = self.done_path.with_name("done.tmp.npy")
+        np.save(tmp_done, self.done)
+        tmp_done.replace(self.done_path)
+
+        tmp_retry = self.retry_path.with_name("retry_queue.tmp.jsonl")
+        with open(tmp_retry, 'w', encoding='utf-8') as f:
+            for entry in self.retry_queue.values():
+                f.write(json.dumps(entry) + "\n")
+        tmp_retry.replace(self.retry_path)
+        self._save_meta()
+
+    # --- Embedding ---
+    def _store(self, indices: List[int], vectors: List[np.ndarray]):
+        if self.dim is None:
+            self.dim = int(vectors[0].shape[0])
+            self._open_embeddings(mode='w+')
+            self._save_meta()
+        for i, vector in zip(indices, vectors):
+            self.embeddings[i] = vector
+            self.done[i] = True
+            self.retry_queue.pop(i, None)
+
+    def _queue_retry(self, index: int, error: str):
+        entry = self.retry_queue.setdefault(index, {"index": index, "attempts": 0})
+        entry["attempts"] += 1
+        entry["error"] = error
+
+    def _embed(self, indices: List[int]):
+        """Embed the given chunks, storing successes and queueing failures"""
+        results = self.client.embed_sync([self.texts[i] for i in indices])
+        ok_indices, ok_vectors = [], []
+        for i, result in zip(indices, results):
+            if result is None:
+                self._queue_retry(i, "embedding request failed")
+                continue
+            vector = np.asarray(result, dtype=np.float32)
+            expected_dim = self.dim if self.dim is not None else (ok_vectors[0].shape[0] if ok_vectors else None)
+            if expected_dim is not None and vector.shape[0] != expected_dim:
+                self._queue_retry(i, f"got {vector.shape[0]} dims, expected {expected_dim}")
+                continue
+            ok_indices.append(i)
+            ok_vectors.append(vector)
+
+        if ok_indices:
+            self._store(ok_indices, ok_vectors)
+            if self.cache is not None:
+                self.cache.put_many(self.model, self.task_type, None,
+                                    [self.texts[i] for i in ok_indices], ok_vectors)
+        self._checkpoint()
+
+    def _fill_from_cache(self):
+        if self.cache is None:
+            return
+        pending = np.flatnonzero(~self.done).tolist()
+        cached = self.cache.get_many(self.model, self.task_type, None, [self.texts[i] for i in pending])
+        hits = [(i, vector) for i, vector in zip(pending, cached) if vector is not None]
+        if hits:
+            expected_dim = self.dim if self.dim is not None else hits[0][1].shape[0]
+            hits = [(i, vector) for i, vector in hits if vector.shape[0] == expected_dim]
+        if hits:
+            self._store([i for i, _ in hits], [vector for _, vector in hits])
+            self._checkpoint()
+        logger.info(f"Embedding cache hits: {len(hits)}/{len(pending)} chunks")
+
+    def run(self) -> np.ndarray:
+        """Embed every chunk, resuming from the checkpoint; returns a (chunks x dim) float32 array"""
+        if not self.texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        self._load()
+        self._fill_from_cache()
+
+        # First pass over everything not yet embedded and not already queued for retry
+        pending = [i for i in np.flatnonzero(~self.done).tolist() if i not in self.retry_queue]
+        for start in range(0, len(pending), self.checkpoint_every):
+            segment = pending[start:start + self.checkpoint_every]
+            self._embed(segment)
+            logger.info(f"Embedded {int(self.done.sum())}/{len(self.texts)} chunks "
+                        f"({len(self.retry_queue)} queued for retry)")
+
+        # Retry failed chunks in bulk
+        for round_number in range(1, self.retry_rounds + 1):
+            if not self.retry_queue:
+                break
+            logger.warning(f"Retry round {round_number}/{self.retry_rounds}: "
+                           f"{len(self.retry_queue)} chunks, waiting {self.retry_delay:.0f}s")
+            time.sleep(self.retry_delay)
+            self._embed(sorted(self.retry_queue))
+
+        missing = np.flatnonzero(~self.done).tolist()
+        if missing:
+            raise EmbeddingJobIncomplete(self.job_dir, missing)
+
+        embeddings = np.array(self.embeddings)
+        self.embeddings = None
+        shutil.rmtree(self.job_dir, ignore_errors=True)
+        return embeddings
@@ -0,0 +1,96 @@
+"""Recall, memory and latency of the reduced embedding storage modes.
+
+Embeds the chunks in semantic_chunks/ through the embedding cache (a corpus that
+was already loaded costs no API calls) and searches them by brute force with
+insertion.py's SAMPLE_QUERIES. For each stored dimension (Matryoshka prefix,
+as EMBED_STORE_DIM / ANN_SCAN_DIM) and quantization (float32, or int8 as in the
+local ANN index) it reports bytes per vector, corpus size, search latency and
+recall@k against full float32 search, without and with re-ranking the best
+k * --rerank candidates on full vectors.
+
+    python eval_storage_modes.py --dims 3072 1536 768 256 --k 10 --chunk-queries 50
+
+--chunk-queries adds pseudo-queries (the opening words of random chunks) for a
+steadier recall estimate than the three sample queries alone.
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from insertion import (EMBED_DIM, SAMPLE_QUERIES, batch_texts_to_embeddings, embedding_backend,
+                       iter_semantic_chunks_from_folder)
+
+sys.path.append(str(Path(__file__).resolve().parents[3] / "Agents" / "agents"))
+from ann_index import encode_scan, scan_query, scan_scores
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    best = np.argpartition(-scores, k - 1)[:k]
+    return best[np.argsort(-scores[best])]
+
+
+def evaluate(full: np.ndarray, queries: np.ndarray, truth, dim: int, quantize: str, k: int, rerank: int):
+    scan_dim = dim if dim < full.shape[1] else None
+    scan, scales = encode_scan(full, scan_dim, quantize)
+    size = scan.nbytes + (scales.nbytes if scales is not None else 0)
+    timings, plain_hits, rerank_hits = [], 0, 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        scores = scan_scores(scan, scales, scan_query(query, scan_dim))
+        found = top_k(scores, k)
+        timings.append(time.perf_counter() - start)
+        plain_hits += len(set(found.tolist()) & expected)
+        shortlist = top_k(scores, min(k * rerank, len(scores)))
+        reranked = shortlist[top_k(full[shortlist] @ query, k)]
+        rerank_hits += len(set(reranked.tolist()) & expected)
+    total = k * len(queries)
+    return size, statistics.median(timings), plain_hits / total, rerank_hits / total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate truncated and int8 embedding storage")
+    parser.add_argument("--folder", default="semantic_chunks")
+    parser.add_argument("--dims", type=int, nargs="+", default=[EMBED_DIM, 1536, 768, 256])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank", type=int, default=4, help="Re-rank k * this many candidates on full vectors")
+    parser.add_argument("--chunk-queries", type=int, default=0, help="Extra pseudo-queries drawn from chunks")
+    args = parser.parse_args()
+
+    texts = [doc["text"] for doc in iter_semantic_chunks_from_folder(args.folder)]
+    if len(texts) < args.k:
+        raise SystemExit(f"Need at least {args.k} chunks in {args.folder}, found {len(texts)}")
+    print(f"Embedding {len(texts)} chunks with {embedding_backend.name} (cached vectors are reused)...")
+    full = normalize(np.array(batch_texts_to_embeddings(texts, task_type="RETRIEVAL_DOCUMENT"), dtype=np.float32))
+
+    rng = random.Random(0)
+    query_texts = list(SAMPLE_QUERIES) + [" ".join(text.split()[:20])
+                                          for text in rng.sample(texts, min(args.chunk_queries, len(texts)))]
+    queries = normalize(np.array(batch_texts_to_embeddings(query_texts, task_type="RETRIEVAL_QUERY"),
+                                 dtype=np.float32))
+    truth = [set(top_k(full @ query, args.k).tolist()) for query in queries]
+
+    full_size = full.nbytes
+    print(f"\n{len(query_texts)} queries, recall@{args.k} against full {full.shape[1]}-dim float32 search\n")
+    print(f"{'dims':>5} {'type':>7} {'B/vec':>7} {'MiB':>8} {'saved':>6} {'p50 ms':>7} "
+          f"{'recall':>7} {'+rerank':>8}")
+    for dim in args.dims:
+        for quantize in ("none", "int8"):
+            size, latency, recall, reranked = evaluate(full, queries, truth, min(dim, full.shape[1]), quantize,
+                                                       args.k, args.rerank)
+            print(f"{min(dim, full.shape[1]):>5} {'float32' if quantize == 'none' else 'int8':>7} "
+                  f"{size / len(full):>7.0f} {size / 2**20:>8.2f} {1 - size / full_size:>6.0%} "
+                  f"{latency * 1e3:>7.2f} {recall:>7.3f} {reranked:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
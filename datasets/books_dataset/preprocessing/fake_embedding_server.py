@@ -0,0 +1,93 @@
+"""Local stand-in for the embedding API, for offline throughput benchmarks.
+
+Serves POST /embed with ``{"texts": [...]}`` and answers ``{"embeddings": [[...], ...]}``
+with deterministic unit vectors derived from each text's hash, after a configurable
+simulated latency. Use with embedding_client.HttpTransport:
+
+    python fake_embedding_server.py --port 8765 --latency 0.15 --dim 768
+    EMBEDDING_SERVER_URL=http://127.0.0.1:8765/embed python semantic_chunker.py
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Tuple
+
+
+def fake_embedding(text: str, dim: int) -> List[float]:
+    """Deterministic unit vector for ``text``"""
+    seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'big')
+    rng = random.Random(seed)
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class FakeEmbeddingHandler(BaseHTTPRequestHandler):
+    """Handler reading dim/latency/failure_rate from the server instance set up by make_server"""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        texts = json.loads(self.rfile.read(length))["texts"]
+
+        time.sleep(server.latency + server.per_text_latency * len(texts))
+        if server.failure_rate and random.random() < server.failure_rate:
+            self.send_error(503, "Simulated transient failure")
+            return
+
+        body = json.dumps({"embeddings": [fake_embedding(t, server.dim) for t in texts]}).encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host: str = "127.0.0.1", port: int = 0, dim: int = 768, latency: float = 0.15,
+                per_text_latency: float = 0.0, failure_rate: float = 0.0) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), FakeEmbeddingHandler)
+    server.daemon_threads = True
+    server.dim = dim
+    server.latency = latency
+    server.per_text_latency = per_text_latency
+    server.failure_rate = failure_rate
+    return server
+
+
+def start_in_thread(**kwargs) -> Tuple[ThreadingHTTPServer, str]:
+    """Start a fake server on a background thread; returns (server, embed URL)"""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/embed"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake embedding server for offline benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--dim", type=int, default=768, help="Embedding dimension")
+    parser.add_argument("--latency", type=float, default=0.15, help="Seconds of simulated latency per request")
+    parser.add_argument("--per-text-latency", type=float, default=0.0, help="Extra seconds per text in a batch")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.dim, args.latency, args.per_text_latency, args.failure_rate)
+    print(f"Fake embedding server on http://{args.host}:{args.port}/embed (dim={args.dim}, latency={args.latency}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
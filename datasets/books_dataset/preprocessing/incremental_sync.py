@@ -0,0 +1,141 @@
+import hashlib
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+import sqlalchemy
+
+# Ids per statement when reading, copying or deleting rows by id
+ID_BATCH_SIZE = 500
+
+HASH_KEY = "content_sha256"
+
+
+def content_hash(text: str, model: str) -> str:
+    """Hash of a chunk's text and the model that embeds it; a change to either needs a new vector"""
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+def _quote(name: str) -> str:
+    return f"`{name.replace('`', '``')}`"
+
+
+def table_exists(engine, table_name: str) -> bool:
+    return sqlalchemy.inspect(engine).has_table(table_name)
+
+
+def vector_dimension(engine, table_name: str) -> Optional[int]:
+    """Declared dimension of a table's ``embedding`` column; None if the table (or a fixed dimension) is missing"""
+    query = sqlalchemy.text(
+        "SELECT COLUMN_TYPE FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND COLUMN_NAME = 'embedding'"
+    )
+    with engine.connect() as conn:
+        column_type = conn.execute(query, {"table": table_name}).scalar()
+    match = re.search(r"\((\d+)\)", column_type or "")
+    return int(match.group(1)) if match else None
+
+
+def _id_batches(ids: List[str]) -> Iterator[List[str]]:
+    for start in range(0, len(ids), ID_BATCH_SIZE):
+        yield ids[start:start + ID_BATCH_SIZE]
+
+
+class ChunkSync:
+    """Incremental sync of chunk documents against an existing vector table
+
+    Every stored row carries ``content_sha256`` in its metadata. Documents
+    whose id is new or whose hash differs are yielded by ``changed_documents``
+    for embedding and upsert; the rest are only recorded, so unchanged chunks
+    are never re-embedded or rewritten. Rows written before hashes were stored
+    have no hash and are treated as changed once.
+    """
+
+    def __init__(self, engine, source_table: str, model: str):
+        self.engine = engine
+        self.source_table = source_table
+        self.model = model
+        self.stored: Dict[str, Optional[str]] = {}
+        self.seen: Set[str] = set()
+        self.unchanged: List[str] = []
+        self.changed = 0
+
+    def load_stored_hashes(self) -> int:
+        """Read id -> content hash for every row in the source table (if it exists)"""
+        self.stored = {}
+        if not table_exists(self.engine, self.source_table):
+            return 0
+        query = sqlalchemy.text(
+            f"SELECT id, JSON_UNQUOTE(JSON_EXTRACT(meta, '$.{HASH_KEY}')) FROM {_quote(self.source_table)}"
+        )
+        with self.engine.connect() as conn:
+            for row_id, stored_hash in conn.execute(query):
+                self.stored[row_id] = stored_hash
+        return len(self.stored)
+
+    def changed_documents(self, documents: Iterable[Dict]) -> Iterator[Dict]:
+        """Stamp each document with its hash and yield only the ones that need embedding"""
+        for doc in documents:
+            doc_hash = content_hash(doc["text"], self.model)
+            doc["metadata"][HASH_KEY] = doc_hash
+            self.seen.add(doc["id"])
+            if self.stored.get(doc["id"]) == doc_hash:
+                self.unchanged.append(doc["id"])
+                continue
+            self.changed += 1
+            yield doc
+
+    def removed_ids(self) -> List[str]:
+        """Stored ids that no longer appear in the documents; only valid once they were all consumed"""
+        return [row_id for row_id in self.stored if row_id not in self.seen]
+
+    def delete(self, table_name: str, ids: List[str]) -> int:
+        deleted = 0
+        for batch in _id_batches(ids):
+            with self.engine.begin() as conn:
+                result = conn.execute(
+                    sqlalchemy.text(f"DELETE FROM {_quote(table_name)} WHERE id IN :ids")
+                    .bindparams(sqlalchemy.bindparam("ids", expanding=True)),
+                    {"ids": batch},
+                )
+                deleted += result.rowcount
+        return deleted
+
+    def copy_unchanged(self, target_table: str) -> int:
+        """Copy unchanged rows, vectors included, from the source table into ``target_table``
+
+        Runs one transaction per batch so large tables stay under TiDB's
+        transaction size limit.
+        """
+        columns = "id, embedding, document, meta, create_time, update_time"
+        copied = 0
+        for batch in _id_batches(self.unchanged):
+            with self.engine.begin() as conn:
+                result = conn.execute(
+                    sqlalchemy.text(
+                        f"INSERT INTO {_quote(target_table)} ({columns}) "
+                        f"SELECT {columns} FROM {_quote(self.source_table)} WHERE id IN :ids"
+                    ).bindparams(sqlalchemy.bindparam("ids", expanding=True)),
+                    {"ids": batch},
+                )
+                copied += result.rowcount
+        return copied
+
+
+def swap_tables(engine, live_table: str, shadow_table: str):
+    """Atomically replace ``live_table`` with ``shadow_table`` and drop the previous live table
+
+    A multi-table RENAME is a single atomic DDL in TiDB, so readers see
+    either the old table or the new one and never a missing table.
+    """
+    retired_table = f"{live_table}_old"
+    live_exists = table_exists(engine, live_table)
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy.text(f"DROP TABLE IF EXISTS {_quote(retired_table)}"))
+        if live_exists:
+            conn.execute(sqlalchemy.text(
+                f"RENAME TABLE {_quote(live_table)} TO {_quote(retired_table)}, "
+                f"{_quote(shadow_table)} TO {_quote(live_table)}"
+            ))
+            conn.execute(sqlalchemy.text(f"DROP TABLE {_quote(retired_table)}"))
+        else:
+            conn.execute(sqlalchemy.text(f"RENAME TABLE {_quote(shadow_table)} TO {_quote(live_table)}"))
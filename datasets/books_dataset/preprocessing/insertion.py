@@ -1,39 +1,68 @@
 import os
+import sys
 import json
 import glob
 import hashlib
-from google import genai
-from google.genai import types
+import argparse
+import sqlalchemy
 from tidb_vector.integrations import TiDBVectorClient
 from dotenv import load_dotenv
 import uuid
 from pathlib import Path
 
+# Shared embedding helpers live in the agent package so ingestion and query time use the same cache
+sys.path.append(str(Path(__file__).resolve().parents[3] / "Agents" / "agents"))
+from embedding_backends import get_embedding_backend, truncate_embeddings
+from embedding_cache import get_embedding_cache
+
+from chunk_stream import find_semantic_chunk_files, iter_chunk_file
+from bulk_loader import PipelinedLoader, bulk_insert, bulk_upsert
+from incremental_sync import ChunkSync, swap_tables, vector_dimension
+
 # Load the connection string from the .env file
 load_dotenv()
 
-# Prefer GEMINI_API_KEY; fall back to GOOGLE_API_KEY if available
-_api_key = os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
-client = genai.Client(api_key=_api_key) if _api_key else genai.Client()
+EMBED_MODEL = "gemini-embedding-001"
+EMBED_DIM = 3072
+# Dimensions stored in TiDB: a Matryoshka prefix of the full embedding (e.g. 768 = 4x less storage).
+# The embedding cache keeps full vectors, so changing this only needs `--mode rebuild`, not re-embedding.
+EMBED_STORE_DIM = int(os.environ.get("EMBED_STORE_DIM", EMBED_DIM))
+
+# Spot checks run against the table after loading; eval_storage_modes.py measures recall on them
+SAMPLE_QUERIES = [
+    "personality development and individual traits",
+    "adolescent identity formation and self-concept",
+    "moral reasoning and ethical development",
+]
+
+# Gemini by default (GEMINI_API_KEY, falling back to GOOGLE_API_KEY); EMBEDDING_BACKEND=local runs offline
+embedding_backend = get_embedding_backend(EMBED_MODEL, EMBED_DIM)
 
 def text_to_embedding(text: str, task_type: str = "RETRIEVAL_DOCUMENT"):
-    """Generate a vector embedding for the given text using Gemini."""
-    result = client.models.embed_content(
-        model="gemini-embedding-001",
-        contents=text,
-        config=types.EmbedContentConfig(task_type=task_type, output_dimensionality=3072),
-    )
-    [embedding_obj] = result.embeddings
-    return list(embedding_obj.values)
+    """Generate a vector embedding for the given text using the configured backend."""
+    return batch_texts_to_embeddings([text], task_type=task_type)[0]
 
 def batch_texts_to_embeddings(texts: list[str], task_type: str = "RETRIEVAL_DOCUMENT") -> list[list[float]]:
-    """Batch embed a list of strings using Gemini for efficiency."""
-    result = client.models.embed_content(
-        model="gemini-embedding-001",
-        contents=texts,
-        config=types.EmbedContentConfig(task_type=task_type, output_dimensionality=3072),
+    """Batch embed a list of strings, only calling the backend for texts not in the embedding cache."""
+    cache = get_embedding_cache()
+    if cache is None:
+        return embedding_backend.embed(texts, task_type)
+    return cache.get_or_compute(
+        embedding_backend.name, task_type, EMBED_DIM, texts,
+        lambda missing: embedding_backend.embed(missing, task_type),
     )
-    return [list(e.values) for e in result.embeddings]
+
+def to_stored(vectors) -> list[list[float]]:
+    """Full embeddings reduced to the EMBED_STORE_DIM vectors kept in TiDB"""
+    if EMBED_STORE_DIM >= EMBED_DIM:
+        return vectors
+    return truncate_embeddings(vectors, EMBED_STORE_DIM).tolist()
+
+def storage_model_name() -> str:
+    """Model name recorded in chunk hashes; includes the stored size so a change re-loads every row"""
+    if EMBED_STORE_DIM >= EMBED_DIM:
+        return embedding_backend.name
+    return f"{embedding_backend.name}@{EMBED_STORE_DIM}"
 
 def create_short_book_id(book_name: str) -> str:
     """Create a short, unique identifier for book names."""
@@ -52,35 +81,32 @@ def create_short_book_id(book_name: str) -> str:
     # Fallback: create hash-based short ID
     return hashlib.md5(book_name.encode()).hexdigest()[:8]
 
-def load_semantic_chunks_from_folder(folder_path: str) -> list[dict]:
-    """Load all semantic chunks from JSON files in the specified folder."""
+def iter_semantic_chunks_from_folder(folder_path: str, errors: list | None = None):
+    """Stream documents from all semantic chunk files, parsing one chunk at a time.
+
+    Names of files that fail to parse are appended to ``errors`` when given.
+    """
     folder = Path(folder_path)
-    documents = []
     
-    # Find all JSON files in the folder
-    json_files = list(folder.glob("*_semantic_chunks.json"))
-    print(f"Found {len(json_files)} semantic chunk JSON files in {folder_path}")
+    chunk_files = find_semantic_chunk_files(folder)
+    print(f"Found {len(chunk_files)} semantic chunk files in {folder_path}")
     
-    for json_file in json_files:
+    for chunk_file in chunk_files:
+        print(f"Processing {chunk_file.name}...")
+        chunks_processed = 0
+        chunks_with_text = 0
+        book_name = None
+        
         try:
-            print(f"Processing {json_file.name}...")
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            book_name = data.get("book_name", json_file.stem.replace("_semantic_chunks", ""))
-            book_short_id = create_short_book_id(book_name)
-            total_chunks = data.get("total_chunks", 0)
-            chunking_method = data.get("chunking_method", "semantic")
-            
-            print(f"  - Book: {book_name}")
-            print(f"  - Short ID: {book_short_id}")
-            print(f"  - Total chunks: {total_chunks}")
-            
-            chunks_processed = 0
-            chunks_with_text = 0
-            
-            # Process each chunk
-            for i, chunk in enumerate(data.get("chunks", [])):
+            for i, (header, chunk) in enumerate(iter_chunk_file(chunk_file)):
+                if book_name is None:
+                    book_name = header.get("book_name", chunk_file.stem.replace("_semantic_chunks", ""))
+                    book_short_id = create_short_book_id(book_name)
+                    chunking_method = header.get("chunking_method", "semantic")
+                    print(f"  - Book: {book_name}")
+                    print(f"  - Short ID: {book_short_id}")
+                    print(f"  - Total chunks: {header.get('total_chunks', 0)}")
+                
                 chunks_processed += 1
                 
                 # Handle different possible chunk structures
@@ -109,7 +135,7 @@ def load_semantic_chunks_from_folder(folder_path: str) -> list[dict]:
                     "word_count": word_count,
                     "char_count": char_count,
                     "chunking_method": chunking_method,
-                    "source_file": json_file.name
+                    "source_file": chunk_file.name
                 }
                 
                 # Add optional fields only if they have data
@@ -120,99 +146,149 @@ def load_semantic_chunks_from_folder(folder_path: str) -> list[dict]:
                 
                 # Only add chunks with meaningful text
                 if text and text.strip() and len(text.strip()) > 10:
-                    documents.append({
+                    chunks_with_text += 1
+                    yield {
                         "id": doc_id,
                         "text": text.strip(),
                         "metadata": metadata
-                    })
-                    chunks_with_text += 1
+                    }
             
             print(f"  - Processed: {chunks_processed} chunks, Valid text: {chunks_with_text}")
                 
         except Exception as e:
-            print(f"Error processing {json_file}: {e}")
+            print(f"Error processing {chunk_file}: {e}")
+            if errors is not None:
+                errors.append(chunk_file.name)
             continue
-    
-    return documents
+
+def load_semantic_chunks_from_folder(folder_path: str) -> list[dict]:
+    """Load all semantic chunks from the chunk files in the specified folder."""
+    return list(iter_semantic_chunks_from_folder(folder_path))
 
 def main():
     """Main function to insert semantic chunks into TiDB Vector Database"""
+    parser = argparse.ArgumentParser(description="Load semantic chunks into TiDB")
+    parser.add_argument("--mode", choices=["sync", "shadow", "rebuild"], default="sync",
+                        help="sync: upsert new/changed chunks and delete removed ones in place; "
+                             "shadow: sync into a copy of the table and swap it in atomically; "
+                             "rebuild: re-embed everything into a fresh table and swap it in")
+    mode = parser.parse_args().mode
+
     # Configuration
     semantic_chunks_folder = "semantic_chunks"
     table_name = "semantic_chunks_dataset"
 
-    print("Loading semantic chunks from folder...")
-    documents = load_semantic_chunks_from_folder(semantic_chunks_folder)
-    print(f"\nPrepared {len(documents)} total documents from semantic chunks")
-
-    if not documents:
+    if not find_semantic_chunk_files(Path(semantic_chunks_folder)):
         print("No documents found. Please check the folder path and JSON files.")
         return
 
-    # Show summary by book
-    book_counts = {}
-    for doc in documents:
-        book = doc["metadata"]["book_short_id"]
-        book_counts[book] = book_counts.get(book, 0) + 1
-
-    print("\nChunks per book:")
-    for book_id, count in book_counts.items():
-        # Find the full name for display
-        full_name = next((doc["metadata"]["book_name"] for doc in documents 
-                         if doc["metadata"]["book_short_id"] == book_id), book_id)
-        print(f"  - {book_id} ({full_name[:50]}...): {count} chunks")
-
-    # Create vector store with target dimension (3072)
-    embed_model_dims = 3072
+    # Create vector store with the stored dimension (3072 unless EMBED_STORE_DIM truncates it)
+    embed_model_dims = EMBED_STORE_DIM
+    connection_string = os.environ.get('TIDB_DATABASE_URL')
 
-    print(f"\nConnecting to TiDB and creating table '{table_name}'...")
+    # sync upserts changed chunks into the live table; shadow/rebuild load a copy and swap it in
+    if mode == "sync":
+        print(f"\nConnecting to TiDB and syncing table '{table_name}' in place...")
+        target_table = table_name
+        # Checked before TiDBVectorClient, which rejects a mismatched column with a bare traceback
+        check_engine = sqlalchemy.create_engine(connection_string)
+        try:
+            stored_dims = vector_dimension(check_engine, table_name)
+        finally:
+            check_engine.dispose()
+        if stored_dims is not None and stored_dims != embed_model_dims:
+            raise SystemExit(f"'{table_name}' stores {stored_dims}-dim vectors but EMBED_STORE_DIM is "
+                             f"{embed_model_dims}; sync cannot change the column, run with --mode rebuild instead")
+    else:
+        target_table = f"{table_name}_shadow"
+        print(f"\nConnecting to TiDB and building shadow table '{target_table}'...")
     vector_store = TiDBVectorClient(
-        table_name=table_name,
-        connection_string=os.environ.get('TIDB_DATABASE_URL'),
+        table_name=target_table,
+        connection_string=connection_string,
         vector_dimension=embed_model_dims,
-        drop_existing_table=True,  # Recreate table to avoid any schema issues
+        drop_existing_table=(mode != "sync"),  # shadow tables always start from a fresh schema
     )
+    engine = vector_store._bind
 
-    # Batch-embed and insert in chunks
-    batch_size = 10  # Even smaller batches for reliability
-    total = len(documents)
-    print(f"\nEmbedding and inserting {total} semantic chunks in batches of {batch_size}...")
+    sync = ChunkSync(engine, table_name, storage_model_name())
+    if mode != "rebuild":
+        print(f"Found {sync.load_stored_hashes()} chunks already stored in '{table_name}'")
 
-    successful_inserts = 0
-    failed_batches = 0
+    # Documents stream from disk through the hash check into the embed/insert pipeline
+    load_errors = []
+    book_counts = {}
+    book_names = {}
 
-    for start in range(0, total, batch_size):
-        end = min(start + batch_size, total)
-        chunk = documents[start:end]
-        texts = [d["text"] for d in chunk]
-        
-        try:
-            print(f"Processing batch {start//batch_size + 1}: chunks {start+1}-{end}")
-            
-            # Check ID lengths before processing
-            for doc in chunk:
-                if len(doc["id"]) > 50:  # Reasonable limit
-                    print(f"  Warning: ID too long: {doc['id']}")
-            
-            embeddings = batch_texts_to_embeddings(texts, task_type="RETRIEVAL_DOCUMENT")
-            vector_store.insert(
-                ids=[d["id"] for d in chunk],
-                texts=texts,
-                embeddings=embeddings,
-                metadatas=[d["metadata"] for d in chunk],
-            )
-            successful_inserts += len(chunk)
-            print(f"  ✓ Successfully inserted {len(chunk)} chunks")
-            
-        except Exception as e:
-            print(f"  ✗ Error processing batch {start}-{end}: {e}")
-            failed_batches += 1
-            continue
+    def tracked(documents):
+        for doc in documents:
+            book = doc["metadata"]["book_short_id"]
+            book_counts[book] = book_counts.get(book, 0) + 1
+            book_names.setdefault(book, doc["metadata"]["book_name"])
+            if len(doc["id"]) > 36:  # id column is VARCHAR(36)
+                print(f"  Warning: ID too long: {doc['id']}")
+            yield doc
+
+    # Embed batch N+1 while batch N is being inserted, packing rows into large multi-row INSERTs
+    loader = PipelinedLoader(
+        vector_store,
+        embed=lambda texts: to_stored(batch_texts_to_embeddings(texts, task_type="RETRIEVAL_DOCUMENT")),
+        dim=embed_model_dims,
+        embed_batch_size=int(os.environ.get("EMBED_BATCH_SIZE", 100)),
+        max_insert_rows=int(os.environ.get("INSERT_MAX_ROWS", 500)),
+        max_insert_bytes=int(os.environ.get("INSERT_MAX_BYTES", 8 * 1024 * 1024)),
+        insert=bulk_upsert if mode == "sync" else bulk_insert,
+    )
+    print(f"\nStreaming semantic chunks; embedding and upserting new or changed ones "
+          f"(embed batches of {loader.embed_batch_size}, up to {loader.max_insert_rows} rows per INSERT)...")
+    documents = iter_semantic_chunks_from_folder(semantic_chunks_folder, errors=load_errors)
+    stats = loader.run(sync.changed_documents(tracked(documents)))
+    successful_inserts = stats.inserted
+    total = sum(book_counts.values())
+
+    print(f"\nPrepared {total} total documents from semantic chunks")
+    print("\nChunks per book:")
+    for book_id, count in book_counts.items():
+        print(f"  - {book_id} ({book_names[book_id][:50]}...): {count} chunks")
+
+    if total == 0 or load_errors:
+        # A missing or half-read file would look like deleted chunks, so leave the table as it is
+        print(f"\nCould not read every chunk file ({', '.join(load_errors) or 'no documents'}); "
+              f"skipping deletions and table swap.")
+        stats.report()
+        return
+
+    removed_ids = sync.removed_ids()
+    if mode == "sync":
+        deleted = sync.delete(table_name, removed_ids)
+    else:
+        copied = sync.copy_unchanged(target_table)
+        print(f"Copied {copied} unchanged chunks from '{table_name}'")
+        deleted = len(removed_ids)
 
     print(f"\nInsertion Summary:")
     print(f"  - Total chunks: {total}")
-    print(f"  - Successfully inserted: {successful_inserts}")
-    print(f"  - Failed batches: {failed_batches}")
+    print(f"  - Unchanged (skipped): {len(sync.unchanged)}")
+    print(f"  - New or changed: {sync.changed}")
+    print(f"  - Successfully upserted: {successful_inserts}")
+    print(f"  - Failed chunks: {stats.failed}")
+    print(f"  - Removed: {deleted}")
+    cache = get_embedding_cache()
+    if cache is not None:
+        print(f"  - Embedding cache hits/misses: {cache.hits}/{cache.misses}")
+    stats.report()
+
+    if mode != "sync":
+        if stats.failed:
+            print(f"\n{stats.failed} chunks failed; keeping the current '{table_name}' "
+                  f"and leaving '{target_table}' for inspection.")
+            return
+        swap_tables(engine, table_name, target_table)
+        print(f"\nSwapped '{target_table}' in as '{table_name}'")
+        vector_store = TiDBVectorClient(
+            table_name=table_name,
+            connection_string=connection_string,
+            vector_dimension=embed_model_dims,
+        )
 
     def print_result(query, result):
         print(f"\nSearch results for: \"{query}\"")
@@ -230,21 +306,15 @@ def main():
             print(f"   Text: \"{r.document[:120]}...\"")
             print()
 
-    # Test the semantic search only if we have successful insertions
-    if successful_inserts > 0:
+    # Test the semantic search only if the table has content
+    if successful_inserts > 0 or sync.unchanged:
         print("\n" + "="*60)
         print("TESTING SEMANTIC SEARCH ON HUMAN DEVELOPMENT CONTENT")
         print("="*60)
 
-        test_queries = [
-            "personality development and individual traits",
-            "adolescent identity formation and self-concept", 
-            "moral reasoning and ethical development"
-        ]
-
-        for query in test_queries:
+        for query in SAMPLE_QUERIES:
             try:
-                query_embedding = text_to_embedding(query, task_type="RETRIEVAL_QUERY")
+                query_embedding = to_stored([text_to_embedding(query, task_type="RETRIEVAL_QUERY")])[0]
                 search_result = vector_store.query(query_embedding, k=3)
                 print_result(query, search_result)
             except Exception as e:
@@ -252,7 +322,7 @@ def main():
 
     print(f"Successfully processed semantic chunks from your books!")
     print(f"Database table: {table_name}")
-    print(f"Total documents inserted: {successful_inserts}")
+    print(f"Total documents upserted: {successful_inserts}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,168 @@
+import re
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+# Common academic book headers/footers to remove
+HEADER_FOOTER_PATTERNS = [
+    r'^Chapter \d+.*$',
+    r'^\d+\s*$',  # Page numbers
+    r'^Page \d+.*$',
+    r'.*Copyright.*$',
+    r'.*McGraw-Hill.*$',
+    r'.*Education.*$',
+    r'.*All rights reserved.*$',
+    r'^[A-Z\s]{10,}$',  # Long uppercase headers
+    r'^\s*www\..*$',  # Website URLs
+    r'^\s*ISBN.*$',
+    r'^\s*\d{4}\s*$',  # Years
+]
+
+# Patterns for irrelevant content
+IRRELEVANT_PATTERNS = [
+    r'\[Figure \d+.*?\]',
+    r'\[Chart \d+.*?\]',
+    r'\[Table \d+.*?\]',
+    r'\[Image \d+.*?\]',
+    r'Figure \d+\.\d+.*',
+    r'Table \d+\.\d+.*',
+    r'Chart \d+\.\d+.*',
+    r'Source:.*',
+    r'References\s*$',
+    r'Bibliography\s*$',
+    r'Index\s*$',
+    r'Appendix [A-Z]\s*$',
+]
+
+# Rejection reasons, in the order PDFCleaner has always applied its filters
+HEADER_FOOTER = "header_footer"
+IRRELEVANT = "irrelevant"
+TOO_SHORT = "too_short"
+NUMERIC = "numeric"
+
+_DIGIT_PATTERN = re.compile(r'\d')
+
+# Shortest literal worth using as a prefilter keyword
+_MIN_KEYWORD_LENGTH = 3
+
+
+def _required_literal(pattern: str) -> Optional[str]:
+    """Longest run of plain characters every match of ``pattern`` must contain, if any
+
+    Only top-level literals are considered (never ones inside groups, branches or
+    repeats), so the pattern cannot match a line that lacks this substring.
+    """
+    best, run = "", []
+    for op, av in sre_parse.parse(pattern, re.IGNORECASE):
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+        if len(run) > len(best):
+            best = "".join(run)
+        run = []
+    if len(run) > len(best):
+        best = "".join(run)
+    return best.casefold() if len(best) >= _MIN_KEYWORD_LENGTH else None
+
+
+def _combine(patterns: List[str], indices: List[int]) -> Optional[re.Pattern]:
+    """Compile the selected patterns into one IGNORECASE alternation, one named group each"""
+    if not indices:
+        return None
+    return re.compile("|".join(f"(?P<p{i}>{patterns[i]})" for i in indices), re.IGNORECASE)
+
+
+class _PatternGroup:
+    """A pattern list compiled into at most two alternations
+
+    Patterns that require a literal keyword are only tried when one of the
+    keywords occurs in the case-folded line; the rest are always tried.
+    ``find`` returns the index of a matching pattern, or None.
+    """
+
+    def __init__(self, patterns: List[str], anchored: bool):
+        self.patterns = list(patterns)
+        self.anchored = anchored
+
+        literals = [_required_literal(pattern) for pattern in self.patterns]
+        self.keywords = tuple(sorted({literal for literal in literals if literal}))
+        self._always = _combine(self.patterns, [i for i, literal in enumerate(literals) if not literal])
+        self._gated = _combine(self.patterns, [i for i, literal in enumerate(literals) if literal])
+
+    def _run(self, regex: re.Pattern, line: str) -> Optional[int]:
+        match = regex.match(line) if self.anchored else regex.search(line)
+        return int(match.lastgroup[1:]) if match else None
+
+    def find(self, line: str, folded: str) -> Optional[int]:
+        if self._always is not None:
+            index = self._run(self._always, line)
+            if index is not None:
+                return index
+        if self._gated is not None and any(keyword in folded for keyword in self.keywords):
+            return self._run(self._gated, line)
+        return None
+
+
+class LineClassifier:
+    """Single-pass line filter for PDFCleaner.clean_text_content
+
+    The header/footer patterns (``re.match`` semantics) and irrelevant-content
+    patterns (``re.search`` semantics) are each compiled once into combined
+    alternations. Patterns that need a literal keyword such as "copyright" or
+    "figure" sit behind a substring prefilter on the case-folded line, so body
+    text usually costs a handful of ``in`` checks and no regex scan at all.
+    Keep/reject decisions are identical to checking the patterns one by one;
+    ``explain`` also reports which filter (and which pattern) rejected a line.
+    """
+
+    def __init__(self, header_footer_patterns: List[str], irrelevant_patterns: List[str],
+                 min_line_length: int = 20):
+        self.min_line_length = min_line_length
+        self._header_footer = _PatternGroup(header_footer_patterns, anchored=True)
+        self._irrelevant = _PatternGroup(irrelevant_patterns, anchored=False)
+
+        # Count of rejected lines per reason, accumulated until cleared
+        self.rejections = Counter()
+
+    def explain(self, line: str) -> Tuple[Optional[str], Optional[str]]:
+        """Return (reason, pattern) for a stripped line, or (None, None) if it is kept"""
+        folded = line.casefold()
+
+        index = self._header_footer.find(line, folded)
+        if index is not None:
+            return HEADER_FOOTER, self._header_footer.patterns[index]
+
+        index = self._irrelevant.find(line, folded)
+        if index is not None:
+            return IRRELEVANT, self._irrelevant.patterns[index]
+
+        if len(line) < self.min_line_length:
+            return TOO_SHORT, None
+
+        # Too many numbers (likely data tables)
+        if len(_DIGIT_PATTERN.findall(line)) > len(line) * 0.5:
+            return NUMERIC, None
+
+        return None, None
+
+    def classify(self, line: str) -> Optional[str]:
+        """Return the rejection reason for a stripped line, or None if it should be kept"""
+        return self.explain(line)[0]
+
+    def filter_lines(self, lines: Iterable[str]) -> List[str]:
+        """Strip lines and keep the meaningful ones, tallying rejections in ``self.rejections``"""
+        kept = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            reason = self.classify(line)
+            if reason is None:
+                kept.append(line)
+            else:
+                self.rejections[reason] += 1
+        return kept
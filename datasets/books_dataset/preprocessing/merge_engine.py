@@ -0,0 +1,83 @@
+from typing import Dict, List
+
+import numpy as np
+
+
+def _as_pairwise_dtype(embeddings: np.ndarray) -> np.ndarray:
+    # Same dtype rule as sklearn's cosine_similarity: float32 stays float32, everything else float64
+    embeddings = np.asarray(embeddings)
+    dtype = np.float32 if embeddings.dtype == np.float32 else np.float64
+    return np.ascontiguousarray(embeddings, dtype=dtype)
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize rows, leaving all-zero rows at zero (as sklearn's normalize does)"""
+    norms = np.sqrt(np.einsum('ij,ij->i', matrix, matrix))
+    norms[norms == 0.0] = 1.0
+    return matrix / norms[:, np.newaxis]
+
+
+def merge_adjacent_chunks(chunks: List[str], embeddings: np.ndarray,
+                          similarity_threshold: float, max_chunk_size: int) -> List[Dict]:
+    """Vectorized equivalent of SemanticChunker's original adjacent-chunk merge
+
+    Embeddings are normalized once and all neighbor similarities are computed
+    up front, which covers every comparison made while the running group is a
+    single chunk. Only after a merge does the running embedding differ from a
+    single chunk's; it is then updated in place in a preallocated buffer using
+    the original pairwise-average rule, and compared with one dot product.
+    Text lengths are tracked as integers so merged strings are only built for
+    the chunks that are actually emitted.
+    """
+    if len(chunks) == 0:
+        return []
+
+    embeddings = _as_pairwise_dtype(embeddings)
+    normalized = _normalize_rows(embeddings)
+    neighbor_similarity = np.einsum('ij,ij->i', normalized[:-1], normalized[1:])
+    lengths = [len(chunk) for chunk in chunks]
+
+    merged_chunks = []
+    running = np.empty_like(embeddings[0])
+    group_start = 0
+    group_length = lengths[0]
+    group_indices = [0]
+    group_scores = []
+
+    def emit():
+        merged_chunks.append({
+            'text': " ".join(chunks[group_start:group_start + len(group_indices)]),
+            'metadata': {
+                'original_indices': group_indices,
+                'similarity_scores': group_scores,
+            }
+        })
+
+    for i in range(1, len(chunks)):
+        if len(group_indices) == 1:
+            similarity = neighbor_similarity[i - 1]
+        else:
+            norm = np.sqrt(np.dot(running, running))
+            running_normalized = running / norm if norm != 0.0 else running
+            similarity = np.dot(running_normalized, normalized[i])
+
+        combined_length = group_length + 1 + lengths[i]
+        if similarity > similarity_threshold and combined_length <= max_chunk_size:
+            if len(group_indices) == 1:
+                running[:] = embeddings[i - 1]
+            # Same arithmetic as np.mean([running, embeddings[i]], axis=0)
+            np.add(running, embeddings[i], out=running)
+            running /= 2
+            group_length = combined_length
+            group_indices.append(i)
+            group_scores.append(float(similarity))
+        else:
+            emit()
+            group_start = i
+            group_length = lengths[i]
+            group_indices = [i]
+            group_scores = []
+
+    # Don't forget the last chunk
+    emit()
+    return merged_chunks
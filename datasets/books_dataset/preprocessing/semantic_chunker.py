@@ -1,39 +1,70 @@
 import os
 import re
+import sys
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple
 import numpy as np
-import google.generativeai as genai
-from sklearn.metrics.pairwise import cosine_similarity
 import json
 import logging
+import argparse
+
+from build_cache import BuildManifest
+from embedding_client import AsyncEmbeddingClient, BackendTransport, HttpTransport
+from embedding_job import EmbeddingJob, texts_digest
+from merge_engine import merge_adjacent_chunks
+
+# Shared embedding helpers live in the agent package so ingestion and query time use the same cache
+sys.path.append(str(Path(__file__).resolve().parents[3] / "Agents" / "agents"))
+from embedding_backends import EmbeddingBackend, get_embedding_backend
+from embedding_cache import get_embedding_cache
+from chunk_store import STORE_SUFFIX, ChunkStore
+from lexical_index import INDEX_SUFFIX as LEXICAL_SUFFIX, BookIndex
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bump when the chunking logic changes so cached outputs are rebuilt
+CHUNKER_VERSION = 1
+
 class SemanticChunker:
-    def __init__(self, cleaned_books_folder: str = "cleaned_books", api_key: str = None):
+    def __init__(self, cleaned_books_folder: str = "cleaned_books", api_key: str = None,
+                 embedding_backend: Optional[EmbeddingBackend] = None):
         self.cleaned_books_folder = Path(cleaned_books_folder)
         self.output_folder = Path("semantic_chunks")
         self.output_folder.mkdir(exist_ok=True)
         
-        # Configure Gemini API
-        if api_key:
-            genai.configure(api_key=api_key)
-        else:
-            # Try to get API key from environment variable
-            api_key = os.getenv('GEMINI_API_KEY')
-            if not api_key:
-                raise ValueError("Please provide Gemini API key either as parameter or set GEMINI_API_KEY environment variable")
-            genai.configure(api_key=api_key)
-        
         # Chunking parameters
         self.sentence_window_size = 3  # Number of sentences to combine for initial chunks
         self.similarity_threshold = 0.75  # Threshold for semantic similarity
         self.min_chunk_size = 100  # Minimum characters per chunk
         self.max_chunk_size = 1000  # Maximum characters per chunk
         
+        # Embedding settings used for merging
+        self.embedding_model = "models/embedding-004"
+        self.embedding_task_type = "semantic_similarity"
+        
+        # Embedding client: chunks per request, requests in flight, request rate limit
+        self.embedding_batch_size = 100
+        self.embedding_concurrency = 8
+        self.embedding_requests_per_second = 25.0
+        # Resumable embedding jobs: chunks per checkpoint and bulk retry rounds for failures
+        self.embedding_checkpoint_every = 1000
+        self.embedding_retry_rounds = 3
+        # Point at fake_embedding_server.py to benchmark without the Gemini API
+        self.embedding_server_url = os.getenv('EMBEDDING_SERVER_URL')
+        # "json" (pretty-printed) or "jsonl" (header line + one chunk per line, cheap to stream)
+        self.output_format = "json"
+        # Also write a memory-mappable columnar copy (chunk_store.py) for fast loading
+        self.write_chunk_store = True
+        # Also write a BM25 inverted index (lexical_index.py) for the agent's hybrid/lexical search
+        self.write_lexical_index = True
+        
+        # Gemini by default (needs api_key or GEMINI_API_KEY); EMBEDDING_BACKEND=local runs offline
+        if embedding_backend is None and not self.embedding_server_url:
+            embedding_backend = get_embedding_backend(self.embedding_model, api_key=api_key, title="Text Chunk")
+        self.embedding_backend = embedding_backend
+        
     def split_into_sentences(self, text: str) -> List[str]:
         """Split text into sentences using regex patterns"""
         # Improved sentence splitting that handles abbreviations and edge cases
@@ -91,80 +122,89 @@ class SemanticChunker:
         
         return sub_chunks
     
-    def get_embeddings(self, texts: List[str]) -> np.ndarray:
-        """Get embeddings for a list of texts using Gemini"""
-        embeddings = []
-        
-        for i, text in enumerate(texts):
-            try:
-                # Use Gemini's embedding model
-                result = genai.embed_content(
-                    model="models/embedding-004",  # Latest Gemini embedding model
-                    content=text,
-                    task_type="semantic_similarity",
-                    title="Text Chunk"
-                )
-                embeddings.append(result['embedding'])
-                
-                # Log progress
-                if (i + 1) % 50 == 0:
-                    logger.info(f"Generated embeddings for {i + 1}/{len(texts)} chunks")
-                    
-            except Exception as e:
-                logger.error(f"Error getting embedding for chunk {i}: {str(e)}")
-                # Use zero vector as fallback
-                embeddings.append([0.0] * 768)  # Assuming 768-dimensional embeddings
-        
-        return np.array(embeddings)
+    @property
+    def embedding_model_id(self) -> str:
+        """Identity of the embedding source, used in cache keys and the build manifest"""
+        if self.embedding_server_url:
+            return f"server:{self.embedding_server_url}"
+        return self.embedding_backend.name
+    
+    def embedding_client(self) -> AsyncEmbeddingClient:
+        """Batched, concurrent client for the configured embedding backend or server"""
+        if self.embedding_server_url:
+            transport = HttpTransport(self.embedding_server_url, task_type=self.embedding_task_type)
+        else:
+            transport = BackendTransport(self.embedding_backend, self.embedding_task_type)
+        return AsyncEmbeddingClient(
+            transport,
+            batch_size=self.embedding_batch_size,
+            max_concurrency=self.embedding_concurrency,
+            requests_per_second=self.embedding_requests_per_second,
+        )
+    
+    def get_embeddings(self, texts: List[str], job_name: Optional[str] = None) -> np.ndarray:
+        """Get embeddings for a list of texts using Gemini, reusing cached vectors
+
+        Runs as a resumable EmbeddingJob checkpointed under ``semantic_chunks/.embedding_jobs``.
+        Chunks that still fail after the retry rounds raise EmbeddingJobIncomplete;
+        rerunning resumes from the checkpoint and only embeds what is missing.
+        """
+        job_name = job_name or texts_digest(texts)[:16]
+        job = EmbeddingJob(
+            self.output_folder / ".embedding_jobs" / job_name,
+            texts,
+            self.embedding_client(),
+            self.embedding_model_id,
+            self.embedding_task_type,
+            cache=get_embedding_cache(),
+            checkpoint_every=self.embedding_checkpoint_every,
+            retry_rounds=self.embedding_retry_rounds,
+        )
+        return job.run()
     
     def merge_similar_chunks(self, chunks: List[str], embeddings: np.ndarray) -> List[Dict]:
         """Merge semantically similar adjacent chunks"""
-        if len(chunks) == 0:
-            return []
-        
-        merged_chunks = []
-        current_chunk = chunks[0]
-        current_embedding = embeddings[0]
-        chunk_metadata = {
-            'original_indices': [0],
-            'similarity_scores': []
+        return merge_adjacent_chunks(chunks, embeddings, self.similarity_threshold, self.max_chunk_size)
+    
+    def chunk_records(self, semantic_chunks: List[Dict]):
+        """Output records for merged chunks, in order"""
+        for i, chunk_info in enumerate(semantic_chunks):
+            yield {
+                'chunk_id': i,
+                'text': chunk_info['text'],
+                'word_count': len(chunk_info['text'].split()),
+                'char_count': len(chunk_info['text']),
+                'original_indices': chunk_info['metadata']['original_indices'],
+                'similarity_scores': chunk_info['metadata']['similarity_scores']
+            }
+    
+    def write_json(self, book_name: str, records: List[Dict]) -> Path:
+        """Write one pretty-printed JSON document with every chunk"""
+        output_data = {
+            'book_name': book_name,
+            'total_chunks': len(records),
+            'chunks': records
         }
-        
-        for i in range(1, len(chunks)):
-            # Calculate cosine similarity with current chunk
-            similarity = cosine_similarity([current_embedding], [embeddings[i]])[0][0]
-            
-            # If similar enough and combined chunk isn't too large, merge
-            combined_text = current_chunk + " " + chunks[i]
-            if (similarity > self.similarity_threshold and 
-                len(combined_text) <= self.max_chunk_size):
-                
-                current_chunk = combined_text
-                current_embedding = np.mean([current_embedding, embeddings[i]], axis=0)
-                chunk_metadata['original_indices'].append(i)
-                chunk_metadata['similarity_scores'].append(float(similarity))
-                
-            else:
-                # Save current chunk and start new one
-                merged_chunks.append({
-                    'text': current_chunk,
-                    'metadata': chunk_metadata.copy()
-                })
-                
-                current_chunk = chunks[i]
-                current_embedding = embeddings[i]
-                chunk_metadata = {
-                    'original_indices': [i],
-                    'similarity_scores': []
-                }
-        
-        # Don't forget the last chunk
-        merged_chunks.append({
-            'text': current_chunk,
-            'metadata': chunk_metadata
-        })
-        
-        return merged_chunks
+        output_path = self.output_folder / f"{book_name}_semantic_chunks.json"
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(output_data, f, indent=2, ensure_ascii=False)
+        return output_path
+    
+    def write_jsonl(self, book_name: str, records: List[Dict]) -> Path:
+        """Write a header line followed by one compact JSON line per chunk"""
+        output_path = self.output_folder / f"{book_name}_semantic_chunks.jsonl"
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'book_name': book_name, 'total_chunks': len(records)},
+                               ensure_ascii=False) + "\n")
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n")
+        return output_path
+    
+    def chunk_store_path(self, book_name: str) -> Path:
+        return self.output_folder / f"{book_name}_semantic_chunks{STORE_SUFFIX}"
+    
+    def lexical_index_path(self, book_name: str) -> Path:
+        return self.output_folder / f"{book_name}_semantic_chunks{LEXICAL_SUFFIX}"
     
     def process_book(self, book_path: Path) -> Optional[str]:
         """Process a single cleaned book file"""
@@ -189,34 +229,22 @@ class SemanticChunker:
             
             # Step 3: Generate embeddings
             logger.info("Generating embeddings...")
-            embeddings = self.get_embeddings(initial_chunks)
+            embeddings = self.get_embeddings(initial_chunks, job_name=book_path.stem)
             
             # Step 4: Merge similar chunks
             logger.info("Merging semantically similar chunks...")
             semantic_chunks = self.merge_similar_chunks(initial_chunks, embeddings)
             
             # Step 5: Save results
-            output_data = {
-                'book_name': book_path.stem,
-                'total_chunks': len(semantic_chunks),
-                'chunks': []
-            }
-            
-            for i, chunk_info in enumerate(semantic_chunks):
-                chunk_data = {
-                    'chunk_id': i,
-                    'text': chunk_info['text'],
-                    'word_count': len(chunk_info['text'].split()),
-                    'char_count': len(chunk_info['text']),
-                    'original_indices': chunk_info['metadata']['original_indices'],
-                    'similarity_scores': chunk_info['metadata']['similarity_scores']
-                }
-                output_data['chunks'].append(chunk_data)
-            
-            # Save as JSON
-            output_path = self.output_folder / f"{book_path.stem}_semantic_chunks.json"
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(output_data, f, indent=2, ensure_ascii=False)
+            records = list(self.chunk_records(semantic_chunks))
+            if self.output_format == "jsonl":
+                output_path = self.write_jsonl(book_path.stem, records)
+            else:
+                output_path = self.write_json(book_path.stem, records)
+            if self.write_chunk_store:
+                ChunkStore.write(self.chunk_store_path(book_path.stem), book_path.stem, records)
+            if self.write_lexical_index:
+                BookIndex.write(self.lexical_index_path(book_path.stem), book_path.stem, records)
             
             # Also save as readable text format
             text_output_path = self.output_folder / f"{book_path.stem}_chunks.txt"
@@ -240,8 +268,23 @@ class SemanticChunker:
             logger.error(f"Error processing {book_path.name}: {str(e)}")
             return None
     
-    def process_all_books(self) -> List[str]:
-        """Process all cleaned books"""
+    def cache_params(self) -> Dict:
+        """Parameters that shape the chunk output; changing any of them invalidates the build cache"""
+        return {
+            "version": CHUNKER_VERSION,
+            "sentence_window_size": self.sentence_window_size,
+            "similarity_threshold": self.similarity_threshold,
+            "min_chunk_size": self.min_chunk_size,
+            "max_chunk_size": self.max_chunk_size,
+            "embedding_model": self.embedding_model_id,
+            "embedding_task_type": self.embedding_task_type,
+            "output_format": self.output_format,
+            "chunk_store": self.write_chunk_store,
+            "lexical_index": self.write_lexical_index,
+        }
+    
+    def process_all_books(self, force: bool = False) -> List[str]:
+        """Process all cleaned books, skipping books whose text and parameters are unchanged"""
         text_files = list(self.cleaned_books_folder.glob("*.txt"))
         
         if not text_files:
@@ -251,23 +294,49 @@ class SemanticChunker:
         logger.info(f"Found {len(text_files)} cleaned text files to process")
         
         processed_files = []
+        manifest = BuildManifest(self.output_folder)
+        params = self.cache_params()
+        
         for text_path in text_files:
+            cached_outputs = manifest.fresh_outputs(text_path, params, force=force)
+            if cached_outputs:
+                logger.info(f"Skipping {text_path.name} - semantic chunks are up to date")
+                processed_files.append(cached_outputs[0])
+                continue
+            
             output_path = self.process_book(text_path)
             if output_path:
+                outputs = [output_path, str(self.output_folder / f"{text_path.stem}_chunks.txt")]
+                if self.write_chunk_store:
+                    outputs.append(str(self.chunk_store_path(text_path.stem)))
+                if self.write_lexical_index:
+                    outputs.append(str(self.lexical_index_path(text_path.stem)))
+                manifest.record(text_path, params, outputs)
                 processed_files.append(output_path)
+            else:
+                manifest.forget(text_path)
         
         logger.info(f"Successfully processed {len(processed_files)} out of {len(text_files)} books")
         return processed_files
 
 def main():
     """Main function to perform semantic chunking"""
-    # Get API key from environment or prompt user
+    parser = argparse.ArgumentParser(description="Split cleaned books into semantic chunks")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-chunk every book, ignoring the build cache")
+    parser.add_argument("--format", choices=["json", "jsonl"], default="json",
+                        help="Chunk output format; jsonl is compact and streams line by line")
+    args = parser.parse_args()
+    
+    # Get API key from environment or prompt user (not needed for the local backend)
     api_key = os.getenv('GEMINI_API_KEY')
-    if not api_key:
+    uses_gemini = os.getenv('EMBEDDING_BACKEND', 'gemini').lower() == 'gemini'
+    if not api_key and uses_gemini and not os.getenv('EMBEDDING_SERVER_URL'):
         api_key = input("Enter your Gemini API key: ")
     
     chunker = SemanticChunker(api_key=api_key)
-    processed_files = chunker.process_all_books()
+    chunker.output_format = args.format
+    processed_files = chunker.process_all_books(force=args.force)
     
     print(f"\nSemantic chunking complete!")
     print(f"Processed files:")
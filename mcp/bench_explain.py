@@ -0,0 +1,82 @@
+"""EXPLAIN and timing of the events queries before and after the schema.py migration
+
+    TIDB_HOST=127.0.0.1 TIDB_PORT=4000 TIDB_USER=root TIDB_DATABASE=college \\
+        python bench_explain.py --seed 50000
+
+Prints each query's plan and median latency. The legacy by-type query should
+show a full table scan, while the migrated ones use idx_events_type_lc and
+idx_events_date_time (TiDB: IndexLookUp / IndexRangeScan, MySQL: type=ref/range).
+"""
+import argparse
+import statistics
+import time
+
+import mysql.connector
+
+from college import TIDB_CONFIG, EVENTS_IN_DURATION_WHERE, EVENTS_BY_TYPE_WHERE, LEGACY_EVENTS_BY_TYPE_WHERE
+from events_query import DEFAULT_PAGE_SIZE, build_page_query
+from load_test import seed_events
+from schema import migrate
+
+
+def page_query(where: str, params: tuple, ignore_index: bool = False):
+    """First page of a query, exactly as the API sends it"""
+    query, query_params = build_page_query(where, params, None, None, DEFAULT_PAGE_SIZE)
+    if ignore_index:
+        query = query.replace("FROM events", "FROM events IGNORE INDEX (idx_events_date_time)")
+    return query, query_params
+
+
+CASES = [
+    ("by type, LOWER(event_type)", *page_query(LEGACY_EVENTS_BY_TYPE_WHERE, ("Exam",))),
+    ("by type, event_type_lc", *page_query(EVENTS_BY_TYPE_WHERE, ("Exam",))),
+    ("range, ignoring index", *page_query(EVENTS_IN_DURATION_WHERE, ("2025-09-01", "2025-09-14"), True)),
+    ("range, (event_date, start_time)", *page_query(EVENTS_IN_DURATION_WHERE, ("2025-09-01", "2025-09-14"))),
+]
+
+
+def explain(cursor, query: str, params: tuple):
+    cursor.execute("EXPLAIN " + query, params)
+    columns = [column[0] for column in cursor.description]
+    return columns, cursor.fetchall()
+
+
+def time_query(cursor, query: str, params: tuple, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        cursor.execute(query, params)
+        cursor.fetchall()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN and time the events queries")
+    parser.add_argument("--seed", type=int, default=0, help="Recreate the events table with this many rows first")
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.seed:
+        seed_events(args.seed)
+
+    conn = mysql.connector.connect(**TIDB_CONFIG)
+    try:
+        if not migrate(conn).indexed:
+            raise SystemExit("events table is missing event_type_lc after migration")
+        with conn.cursor() as cursor:
+            cursor.execute("ANALYZE TABLE events")
+            cursor.fetchall()
+            for name, query, params in CASES:
+                columns, plan = explain(cursor, query, params)
+                median = time_query(cursor, query, params, args.runs)
+                print(f"\n== {name}: median {median * 1e3:.2f} ms over {args.runs} runs")
+                print(" | ".join(columns))
+                for row in plan:
+                    print(" | ".join(str(value) for value in row))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
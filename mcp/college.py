@@ -1,8 +1,20 @@
 import logging
+import threading
+from contextlib import ExitStack, asynccontextmanager, contextmanager
 import mysql.connector
-from fastapi import FastAPI
+from mysql.connector import pooling
+from typing import Callable, List, Optional, Tuple
+from fastapi import FastAPI, Header, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from dotenv import load_dotenv
 import os
+
+from schema import prepare_schema
+from events_query import (DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, STREAM_FETCH_SIZE, BatchRequest, EventFilter,
+                          NdjsonPager, batch_payload, build_batch_query, build_page_query, page_offset,
+                          page_payload, parse_fields)
+from event_cache import VERSION_QUERY, CachedResponse, EventQueryCache, check_admin_token, etag_response
+
 # Logging setup
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger("tidb-api")
@@ -18,41 +30,231 @@ TIDB_CONFIG = {
     'database': os.environ.get('TIDB_DATABASE')
 }
 
-def get_db_connection():
+# Connection pool config (mysql-connector caps pool_size at 32)
+POOL_SIZE = int(os.environ.get('TIDB_POOL_SIZE', 8))
+# Seconds a request waits for a free connection before failing
+POOL_TIMEOUT = float(os.environ.get('TIDB_POOL_TIMEOUT', 10))
+
+# Filters shared by the sync app and the async one in college_async.py; events_query.py adds
+# the projection, keyset condition, ORDER BY event_date, start_time and LIMIT
+EVENTS_IN_DURATION_WHERE = "event_date BETWEEN %s AND %s"
+# Uses the indexed generated column added by schema.py
+EVENTS_BY_TYPE_WHERE = "event_type_lc = LOWER(%s)"
+# Full table scan; only used while the events table has not been migrated
+LEGACY_EVENTS_BY_TYPE_WHERE = "LOWER(event_type) = LOWER(%s)"
+
+# Add the lookup column and indexes at startup (schema.py); set to 0 if the DB user cannot run DDL
+AUTO_MIGRATE = os.environ.get('TIDB_AUTO_MIGRATE', '1') == '1'
+
+def events_by_type_where(schema_ready: bool) -> str:
+    return EVENTS_BY_TYPE_WHERE if schema_ready else LEGACY_EVENTS_BY_TYPE_WHERE
+
+def event_filter_where(event_filter: EventFilter, schema_ready: bool) -> Tuple[str, tuple]:
+    """WHERE clause and params for one batch filter; range and type are combined with AND"""
+    clauses, params = [], ()
+    if event_filter.start_date is not None or event_filter.end_date is not None:
+        if event_filter.start_date is None or event_filter.end_date is None:
+            raise ValueError("start_date and end_date must be given together")
+        clauses.append(EVENTS_IN_DURATION_WHERE)
+        params += (event_filter.start_date.isoformat(), event_filter.end_date.isoformat())
+    if event_filter.event_type:
+        clauses.append(events_by_type_where(schema_ready))
+        params += (event_filter.event_type,)
+    if not clauses:
+        raise ValueError("Each query needs a start_date/end_date range, an event_type, or both")
+    return " AND ".join(clauses), params
+
+def batch_query(batch: BatchRequest, schema_ready: bool, keyset_paging: bool):
+    """Cache key, statement, params, projection and page offsets answering every filter of a batch request"""
+    pages, key = [], []
+    for event_filter in batch.queries:
+        where, params = event_filter_where(event_filter, schema_ready)
+        pages.append((where, params, event_filter.cursor, page_offset(event_filter.cursor, keyset_paging)))
+        key.append((where, tuple(str(param).lower() for param in params), event_filter.cursor))
+    field_list = parse_fields(batch.fields)
+    query, query_params = build_batch_query(pages, field_list, batch.limit)
+    offsets = [offset for _, _, _, offset in pages]
+    return ("batch", tuple(key), batch.fields, batch.limit), query, query_params, field_list, offsets
+
+db_pool = None
+schema_ready = False
+# False when the events table has no `id` column to page by (schema.py); pages then use OFFSET
+keyset_paging = True
+# mysql-connector raises immediately when the pool is empty, so requests queue here instead
+_pool_slots = threading.BoundedSemaphore(POOL_SIZE)
+
+def create_db_pool():
+    """Open POOL_SIZE connections to TiDB up front"""
+    global db_pool
     try:
-        conn = mysql.connector.connect(**TIDB_CONFIG)
-        return conn
+        db_pool = pooling.MySQLConnectionPool(
+            pool_name="tidb-api",
+            pool_size=POOL_SIZE,
+            pool_reset_session=True,
+            **TIDB_CONFIG,
+        )
+        log.info(f"Opened TiDB connection pool with {POOL_SIZE} connections")
     except mysql.connector.Error as err:
         log.error(f"Error connecting to TiDB: {err}")
         raise
 
+def close_db_pool():
+    global db_pool
+    if db_pool is not None:
+        # Closes the idle connections; checked-out ones are closed when returned
+        db_pool._remove_connections()
+        db_pool = None
+        log.info("Closed TiDB connection pool")
+
+@contextmanager
+def get_db_connection():
+    """Check out a pooled connection, returning it to the pool on exit
+
+    The pool pings each connection as it is checked out and reconnects
+    it if TiDB dropped it, so callers always get a live connection.
+    """
+    if db_pool is None:
+        raise RuntimeError("TiDB connection pool is not initialized")
+    if not _pool_slots.acquire(timeout=POOL_TIMEOUT):
+        raise pooling.PoolError(f"No TiDB connection available after {POOL_TIMEOUT}s")
+    try:
+        conn = db_pool.get_connection()
+        try:
+            yield conn
+        finally:
+            conn.close()  # returns the connection to the pool
+    finally:
+        _pool_slots.release()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global schema_ready, keyset_paging
+    schema_ready, keyset_paging = prepare_schema(TIDB_CONFIG, apply=AUTO_MIGRATE)
+    create_db_pool()
+    try:
+        yield
+    finally:
+        close_db_pool()
+
 # FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+event_cache = EventQueryCache()
 
-@app.get("/get_events_in_duration")
-def get_events_in_duration(start_date: str, end_date: str):
+@app.get("/health")
+def health():
+    """Liveness plus a round trip through the connection pool"""
     try:
         with get_db_connection() as conn:
-            with conn.cursor(dictionary=True) as cursor:
-                query = """
-                SELECT * FROM events 
-                WHERE event_date BETWEEN %s AND %s 
-                ORDER BY event_date, start_time
-                """
-                cursor.execute(query, (start_date, end_date))
-                events = cursor.fetchall()
-                return {"events": events}
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+        return {"status": "ok", "pool_size": POOL_SIZE, "cache": event_cache.stats()}
+    except Exception as e:
+        return JSONResponse(status_code=503, content={"status": "error", "error": str(e)})
+
+def fetch_all(query: str, params: tuple):
+    with get_db_connection() as conn:
+        with conn.cursor(dictionary=True) as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+
+def cached_events(key: tuple, query: str, params: tuple, to_payload: Callable) -> CachedResponse:
+    """Serve an events query from the cache, re-running it and building the payload from its rows on a miss"""
+    if event_cache.version_check_due():
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(VERSION_QUERY)
+                event_cache.note_version(cursor.fetchall())
+    entry = event_cache.get(key)
+    if entry is None:
+        generation = event_cache.generation
+        entry = event_cache.put(key, to_payload(fetch_all(query, params)), generation)
+    return entry
+
+def stream_events(query: str, params: tuple, fields: Optional[List[str]], limit: int, offset: Optional[int]):
+    """NDJSON lines read from an unbuffered cursor, so memory stays flat for large pages
+
+    The query runs and its first rows are fetched before this returns, so pool and
+    query errors reach the endpoint's usual error response instead of a 200 stream.
+    """
+    resources = ExitStack()
+    try:
+        conn = resources.enter_context(get_db_connection())
+        cursor = resources.enter_context(conn.cursor(dictionary=True))
+        cursor.execute(query, params)
+        rows = cursor.fetchmany(STREAM_FETCH_SIZE)
+    except BaseException:
+        resources.close()
+        raise
+    return _ndjson_lines(resources, cursor, rows, NdjsonPager(fields, limit, offset))
+
+def _ndjson_lines(resources: ExitStack, cursor, rows: list, pager: NdjsonPager):
+    with resources:
+        try:
+            while rows:
+                for row in rows:
+                    line = pager.feed(row)
+                    if line:
+                        yield line
+                rows = cursor.fetchmany(STREAM_FETCH_SIZE)
+        except Exception as e:
+            # The 200 headers are already sent; end with an error line rather than a silently short page
+            log.error(f"Event stream failed: {e}")
+            yield pager.error(e)
+            return
+    tail = pager.finish()
+    if tail:
+        yield tail
+
+def events_response(request: Request, key: tuple, where: str, params: tuple,
+                    fields: Optional[str], cursor: Optional[str], limit: int, format: str):
+    field_list = parse_fields(fields)
+    offset = page_offset(cursor, keyset_paging)
+    query, query_params = build_page_query(where, params, field_list, cursor, limit, offset)
+    if format == "ndjson":
+        return StreamingResponse(stream_events(query, query_params, field_list, limit, offset),
+                                 media_type="application/x-ndjson")
+    entry = cached_events(key + (fields, cursor, limit), query, query_params,
+                          lambda rows: page_payload(rows, field_list, limit, offset))
+    return etag_response(request, entry)
+
+@app.get("/get_events_in_duration")
+def get_events_in_duration(start_date: str, end_date: str, request: Request,
+                           limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                           cursor: Optional[str] = None, fields: Optional[str] = None,
+                           format: str = Query("json", pattern="^(json|ndjson)$")):
+    try:
+        return events_response(request, ("duration", start_date, end_date), EVENTS_IN_DURATION_WHERE,
+                               (start_date, end_date), fields, cursor, limit, format)
     except Exception as e:
         return {"error": str(e)}
 
 @app.get("/get_events_by_type")
-def get_events_by_type(event_type: str):
+def get_events_by_type(event_type: str, request: Request,
+                       limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                       cursor: Optional[str] = None, fields: Optional[str] = None,
+                       format: str = Query("json", pattern="^(json|ndjson)$")):
     try:
-        with get_db_connection() as conn:
-            with conn.cursor(dictionary=True) as cursor:
-                query = "SELECT * FROM events WHERE LOWER(event_type) = LOWER(%s)"
-                cursor.execute(query, (event_type,))
-                events = cursor.fetchall()
-                return {"events": events}
+        # The lookup is case-insensitive, so "Exam" and "exam" share an entry
+        return events_response(request, ("type", event_type.lower()), events_by_type_where(schema_ready),
+                               (event_type,), fields, cursor, limit, format)
     except Exception as e:
         return {"error": str(e)}
+
+@app.post("/get_events_batch")
+def get_events_batch(batch: BatchRequest, request: Request):
+    """Several range/type lookups answered by one UNION ALL statement, i.e. one DB round trip"""
+    try:
+        key, query, params, field_list, offsets = batch_query(batch, schema_ready, keyset_paging)
+        entry = cached_events(key, query, params,
+                              lambda rows: batch_payload(rows, offsets, field_list, batch.limit))
+        return etag_response(request, entry)
+    except Exception as e:
+        return {"error": str(e)}
+
+@app.post("/admin/invalidate_cache")
+def invalidate_cache(x_admin_token: Optional[str] = Header(default=None)):
+    """Drop all cached event responses, e.g. right after the calendar is edited"""
+    if not check_admin_token(x_admin_token):
+        return JSONResponse(status_code=403, content={"error": "invalid or missing admin token"})
+    return {"status": "ok", "cleared": event_cache.invalidate()}
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+from contextlib import AsyncExitStack, asynccontextmanager
+import aiomysql
+from typing import Callable, List, Optional
+from fastapi import FastAPI, Header, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import os
+
+from college import TIDB_CONFIG, AUTO_MIGRATE, EVENTS_IN_DURATION_WHERE, batch_query, events_by_type_where
+from schema import prepare_schema
+from events_query import (DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, STREAM_FETCH_SIZE, BatchRequest, NdjsonPager,
+                          batch_payload, build_page_query, page_offset, page_payload, parse_fields)
+from event_cache import VERSION_QUERY, CachedResponse, EventQueryCache, check_admin_token, etag_response
+
+# Same endpoints as college.py, served from the event loop with aiomysql.
+# Run with: uvicorn college_async:app
+log = logging.getLogger("tidb-api-async")
+
+# Requests beyond this many in-flight queries wait on the pool without holding a thread
+ASYNC_POOL_MIN_SIZE = int(os.environ.get('TIDB_ASYNC_POOL_MIN_SIZE', 2))
+ASYNC_POOL_SIZE = int(os.environ.get('TIDB_ASYNC_POOL_SIZE', 20))
+# Reconnect connections idle longer than this (TiDB Cloud drops idle connections)
+ASYNC_POOL_RECYCLE = int(os.environ.get('TIDB_POOL_RECYCLE', 300))
+
+db_pool = None
+schema_ready = False
+keyset_paging = True
+
+async def create_db_pool():
+    global db_pool
+    try:
+        db_pool = await aiomysql.create_pool(
+            host=TIDB_CONFIG['host'],
+            port=TIDB_CONFIG['port'],
+            user=TIDB_CONFIG['user'],
+            password=TIDB_CONFIG['password'] or "",
+            db=TIDB_CONFIG['database'],
+            minsize=ASYNC_POOL_MIN_SIZE,
+            maxsize=ASYNC_POOL_SIZE,
+            pool_recycle=ASYNC_POOL_RECYCLE,
+            autocommit=True,
+        )
+        log.info(f"Opened async TiDB connection pool (max {ASYNC_POOL_SIZE} connections)")
+    except Exception as err:
+        log.error(f"Error connecting to TiDB: {err}")
+        raise
+
+async def close_db_pool():
+    global db_pool
+    if db_pool is not None:
+        db_pool.close()
+        await db_pool.wait_closed()
+        db_pool = None
+        log.info("Closed async TiDB connection pool")
+
+async def fetch_all(query: str, params: tuple):
+    if db_pool is None:
+        raise RuntimeError("TiDB connection pool is not initialized")
+    async with db_pool.acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(query, params)
+            return await cursor.fetchall()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global schema_ready, keyset_paging
+    # One-off DDL check at startup, so the blocking driver is fine here
+    schema_ready, keyset_paging = await asyncio.to_thread(prepare_schema, TIDB_CONFIG, AUTO_MIGRATE)
+    await create_db_pool()
+    try:
+        yield
+    finally:
+        await close_db_pool()
+
+# FastAPI app
+app = FastAPI(lifespan=lifespan)
+event_cache = EventQueryCache()
+
+@app.get("/health")
+async def health():
+    """Liveness plus a round trip through the connection pool"""
+    try:
+        await fetch_all("SELECT 1", ())
+        return {"status": "ok", "pool_size": ASYNC_POOL_SIZE, "cache": event_cache.stats()}
+    except Exception as e:
+        return JSONResponse(status_code=503, content={"status": "error", "error": str(e)})
+
+async def cached_events(key: tuple, query: str, params: tuple, to_payload: Callable) -> CachedResponse:
+    """Serve an events query from the cache, re-running it and building the payload from its rows on a miss"""
+    if event_cache.version_check_due():
+        event_cache.note_version(await fetch_all(VERSION_QUERY, ()))
+    entry = event_cache.get(key)
+    if entry is None:
+        generation = event_cache.generation
+        entry = event_cache.put(key, to_payload(await fetch_all(query, params)), generation)
+    return entry
+
+async def stream_events(query: str, params: tuple, fields: Optional[List[str]], limit: int,
+                        offset: Optional[int]):
+    """NDJSON lines read from a server-side cursor, so memory stays flat for large pages
+
+    The query runs and its first rows are fetched before this returns, so pool and
+    query errors reach the endpoint's usual error response instead of a 200 stream.
+    """
+    if db_pool is None:
+        raise RuntimeError("TiDB connection pool is not initialized")
+    resources = AsyncExitStack()
+    try:
+        conn = await resources.enter_async_context(db_pool.acquire())
+        cursor = await resources.enter_async_context(conn.cursor(aiomysql.SSDictCursor))
+        await cursor.execute(query, params)
+        rows = await cursor.fetchmany(STREAM_FETCH_SIZE)
+    except BaseException:
+        await resources.aclose()
+        raise
+    return _ndjson_lines(resources, cursor, rows, NdjsonPager(fields, limit, offset))
+
+async def _ndjson_lines(resources: AsyncExitStack, cursor, rows: list, pager: NdjsonPager):
+    async with resources:
+        try:
+            while rows:
+                for row in rows:
+                    line = pager.feed(row)
+                    if line:
+                        yield line
+                rows = await cursor.fetchmany(STREAM_FETCH_SIZE)
+        except Exception as e:
+            # The 200 headers are already sent; end with an error line rather than a silently short page
+            log.error(f"Event stream failed: {e}")
+            yield pager.error(e)
+            return
+    tail = pager.finish()
+    if tail:
+        yield tail
+
+async def events_response(request: Request, key: tuple, where: str, params: tuple,
+                          fields: Optional[str], cursor: Optional[str], limit: int, format: str):
+    field_list = parse_fields(fields)
+    offset = page_offset(cursor, keyset_paging)
+    query, query_params = build_page_query(where, params, field_list, cursor, limit, offset)
+    if format == "ndjson":
+        return StreamingResponse(await stream_events(query, query_params, field_list, limit, offset),
+                                 media_type="application/x-ndjson")
+    entry = await cached_events(key + (fields, cursor, limit), query, query_params,
+                                lambda rows: page_payload(rows, field_list, limit, offset))
+    return etag_response(request, entry)
+
+@app.get("/get_events_in_duration")
+async def get_events_in_duration(start_date: str, end_date: str, request: Request,
+                                 limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                                 cursor: Optional[str] = None, fields: Optional[str] = None,
+                                 format: str = Query("json", pattern="^(json|ndjson)$")):
+    try:
+        return await events_response(request, ("duration", start_date, end_date), EVENTS_IN_DURATION_WHERE,
+                                     (start_date, end_date), fields, cursor, limit, format)
+    except Exception as e:
+        return {"error": str(e)}
+
+@app.get("/get_events_by_type")
+async def get_events_by_type(event_type: str, request: Request,
+                             limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                             cursor: Optional[str] = None, fields: Optional[str] = None,
+                             format: str = Query("json", pattern="^(json|ndjson)$")):
+    try:
+        # The lookup is case-insensitive, so "Exam" and "exam" share an entry
+        return await events_response(request, ("type", event_type.lower()), events_by_type_where(schema_ready),
+                                     (event_type,), fields, cursor, limit, format)
+    except Exception as e:
+        return {"error": str(e)}
+
+@app.post("/get_events_batch")
+async def get_events_batch(batch: BatchRequest, request: Request):
+    """Several range/type lookups answered by one UNION ALL statement, i.e. one DB round trip"""
+    try:
+        key, query, params, field_list, offsets = batch_query(batch, schema_ready, keyset_paging)
+        entry = await cached_events(key, query, params,
+                                    lambda rows: batch_payload(rows, offsets, field_list, batch.limit))
+        return etag_response(request, entry)
+    except Exception as e:
+        return {"error": str(e)}
+
+@app.post("/admin/invalidate_cache")
+async def invalidate_cache(x_admin_token: Optional[str] = Header(default=None)):
+    """Drop all cached event responses, e.g. right after the calendar is edited"""
+    if not check_admin_token(x_admin_token):
+        return JSONResponse(status_code=403, content={"error": "invalid or missing admin token"})
+    return {"status": "ok", "cleared": event_cache.invalidate()}
@@ -0,0 +1,133 @@
+import hashlib
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+log = logging.getLogger("tidb-api")
+
+# Cache config
+CACHE_TTL = float(os.environ.get('EVENT_CACHE_TTL', 300))
+CACHE_MAX_ENTRIES = int(os.environ.get('EVENT_CACHE_MAX_ENTRIES', 1024))
+# Optional cheap query whose result changes whenever events change, e.g.
+# "SELECT MAX(updated_at), COUNT(*) FROM events"; checked at most every VERSION_CHECK_INTERVAL seconds
+VERSION_QUERY = os.environ.get('EVENT_CACHE_VERSION_QUERY')
+VERSION_CHECK_INTERVAL = float(os.environ.get('EVENT_CACHE_VERSION_INTERVAL', 30))
+# Token for POST /admin/invalidate_cache; the endpoint is disabled when unset
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+
+class CachedResponse:
+    """A serialized JSON payload with its ETag"""
+
+    __slots__ = ("body", "etag", "expires")
+
+    def __init__(self, body: bytes, expires: float):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.expires = expires
+
+
+def serialize(payload: Any) -> bytes:
+    """Same bytes FastAPI's JSONResponse would send for payload"""
+    return json.dumps(jsonable_encoder(payload), ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+class EventQueryCache:
+    """In-process TTL + LRU cache of serialized event query responses
+
+    Entries expire after ``ttl`` seconds, the least recently used entry is
+    dropped beyond ``max_entries``, and ``invalidate`` clears everything (the
+    admin endpoint, or a change in the value of the version query).
+    Thread-safe, so the sync app's threadpool workers can share it.
+    """
+
+    def __init__(self, ttl: float = CACHE_TTL, max_entries: int = CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_checked = 0.0
+        # Bumped by invalidate so results fetched before an invalidation are not cached after it
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, payload: Any, generation: Optional[int] = None) -> CachedResponse:
+        """Cache payload under key, unless the cache was invalidated since ``generation`` was read"""
+        entry = CachedResponse(serialize(payload), time.monotonic() + self.ttl)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self) -> int:
+        with self._lock:
+            cleared = len(self._entries)
+            self._entries.clear()
+            self.generation += 1
+        log.info(f"Event cache invalidated ({cleared} entries)")
+        return cleared
+
+    def version_check_due(self) -> bool:
+        """True at most once per VERSION_CHECK_INTERVAL, and only when a version query is configured"""
+        if not VERSION_QUERY:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            if now - self._version_checked < VERSION_CHECK_INTERVAL:
+                return False
+            self._version_checked = now
+            return True
+
+    def note_version(self, version: Any):
+        """Record the version query's result, clearing the cache if it changed"""
+        with self._lock:
+            changed = self._version is not None and version != self._version
+            self._version = version
+        if changed:
+            self.invalidate()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def etag_response(request: Request, entry: CachedResponse) -> Response:
+    """304 if the client already has this payload (If-None-Match), else the cached JSON body"""
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if entry.etag in tags or "*" in tags:
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+def check_admin_token(token: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
@@ -0,0 +1,227 @@
+import base64
+import datetime
+import json
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, Field
+
+from schema import INTERNAL_COLUMNS
+
+# Page size config: responses are capped no matter how wide the requested range is
+DEFAULT_PAGE_SIZE = int(os.environ.get('EVENTS_PAGE_SIZE', 100))
+MAX_PAGE_SIZE = int(os.environ.get('EVENTS_MAX_PAGE_SIZE', 1000))
+# Rows pulled from the server-side cursor per fetch in NDJSON mode
+STREAM_FETCH_SIZE = 200
+# Filters accepted by one batch request; every filter is one more subquery in the UNION
+MAX_BATCH_QUERIES = int(os.environ.get('EVENTS_MAX_BATCH_QUERIES', 10))
+
+# Keyset order; matches idx_events_date_time plus the primary key as tie-breaker, so the
+# events table needs a unique, non-NULL `id` column (schema.py checks this at startup).
+# start_time may be NULL: MySQL and TiDB sort NULLs first, and build_page_query's keyset
+# condition handles a NULL start_time in the cursor explicitly.
+KEY_COLUMNS = ("event_date", "start_time", "id")
+# Fallback order for an events table without `id`: pages are taken with LIMIT/OFFSET and the
+# cursor holds the row offset, so rows tied on both columns may repeat or go missing across pages
+OFFSET_ORDER = ("event_date", "start_time")
+_FIELD_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Comma-separated column names to return, or None for all columns"""
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    for name in names:
+        if not _FIELD_NAME.match(name) or name in INTERNAL_COLUMNS:
+            raise ValueError(f"Invalid field name: {name!r}")
+    return names
+
+
+def _sql_value(value):
+    # TIME columns come back as timedelta; send them back in a form MySQL/TiDB compare as TIME
+    if isinstance(value, datetime.timedelta):
+        seconds = int(value.total_seconds())
+        return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}.{value.microseconds:06d}"
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return value
+
+
+def _encode(key) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode("utf-8")).decode("ascii")
+
+
+def _decode(cursor: str):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except ValueError as err:
+        raise ValueError("Invalid cursor") from err
+
+
+def encode_cursor(row: Dict) -> str:
+    return _encode([_sql_value(row[column]) for column in KEY_COLUMNS])
+
+
+def decode_cursor(cursor: str) -> Tuple:
+    key = _decode(cursor)
+    if not isinstance(key, list) or len(key) != len(KEY_COLUMNS):
+        raise ValueError("Invalid cursor")
+    return tuple(key)
+
+
+def page_offset(cursor: Optional[str], keyset: bool) -> Optional[int]:
+    """Row offset a page starts at when paging by OFFSET, or None when paging by keyset"""
+    if keyset:
+        return None
+    if not cursor:
+        return 0
+    key = _decode(cursor)
+    if not isinstance(key, dict) or not isinstance(key.get("offset"), int) or key["offset"] < 0:
+        raise ValueError("Invalid cursor")
+    return key["offset"]
+
+
+def next_cursor(last_row: Dict, offset: Optional[int], limit: int) -> str:
+    """Cursor of the page after one ending with ``last_row`` (see page_offset)"""
+    return encode_cursor(last_row) if offset is None else _encode({"offset": offset + limit})
+
+
+def build_page_query(where: str, params: Sequence, fields: Optional[List[str]],
+                     cursor: Optional[str], limit: int, offset: Optional[int] = None) -> Tuple[str, tuple]:
+    """SELECT for one keyset page of events matching ``where``
+
+    Fetches ``limit + 1`` rows so the caller can tell whether there is a
+    next page. The keyset condition is spelled out rather than written as a
+    row comparison so both TiDB and MySQL turn it into an index range. A
+    ``start_time = NULL`` comparison would match nothing, so a cursor on an
+    event without a start time continues with the NULLs after its id and then
+    every timed event of that date.
+
+    With an ``offset`` (see page_offset) the page is taken in OFFSET_ORDER with
+    LIMIT/OFFSET instead, and ``cursor`` is ignored.
+    """
+    order = KEY_COLUMNS if offset is None else OFFSET_ORDER
+    if fields is None:
+        select = "*"
+    else:
+        columns = list(dict.fromkeys(list(fields) + list(order)))
+        select = ", ".join(f"`{column}`" for column in columns)
+    sql = f"SELECT {select} FROM events WHERE {where}"
+    params = list(params)
+    if offset is not None:
+        sql += f" ORDER BY {', '.join(order)} LIMIT %s OFFSET %s"
+        params += [limit + 1, offset]
+        return sql, tuple(params)
+    if cursor:
+        event_date, start_time, event_id = decode_cursor(cursor)
+        if start_time is None:
+            sql += (" AND (event_date > %s OR (event_date = %s AND "
+                    "(start_time IS NOT NULL OR id > %s)))")
+            params += [event_date, event_date, event_id]
+        else:
+            sql += (" AND (event_date > %s OR (event_date = %s AND "
+                    "(start_time > %s OR (start_time = %s AND id > %s))))")
+            params += [event_date, event_date, start_time, start_time, event_id]
+    sql += " ORDER BY event_date, start_time, id LIMIT %s"
+    params.append(limit + 1)
+    return sql, tuple(params)
+
+
+def project(row: Dict, fields: Optional[List[str]]) -> Dict:
+    """The requested fields of a row; without a projection, every column except INTERNAL_COLUMNS"""
+    if fields is None:
+        return {column: value for column, value in row.items() if column not in INTERNAL_COLUMNS}
+    return {field: row[field] for field in fields}
+
+
+def page_payload(rows: List[Dict], fields: Optional[List[str]], limit: int, offset: Optional[int] = None) -> Dict:
+    """{"events": [...], "next_cursor": ...} from the ``limit + 1`` rows of build_page_query"""
+    page = rows[:limit]
+    cursor = next_cursor(page[-1], offset, limit) if len(rows) > limit else None
+    return {"events": [project(row, fields) for row in page], "next_cursor": cursor}
+
+
+class EventFilter(BaseModel):
+    """One filter of a batch request: a date range, an event type, or both"""
+    start_date: Optional[datetime.date] = None
+    end_date: Optional[datetime.date] = None
+    event_type: Optional[str] = None
+    cursor: Optional[str] = None
+
+
+class BatchRequest(BaseModel):
+    queries: List[EventFilter] = Field(min_length=1, max_length=MAX_BATCH_QUERIES)
+    limit: int = Field(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+    fields: Optional[str] = None
+
+
+def build_batch_query(pages: Sequence[Tuple[str, Sequence, Optional[str], Optional[int]]],
+                      fields: Optional[List[str]], limit: int) -> Tuple[str, tuple]:
+    """One statement answering several (where, params, cursor, offset) pages
+
+    Each page is the build_page_query SELECT wrapped as a derived table, so it
+    keeps its own ORDER BY/LIMIT and index range; the results are combined with
+    UNION ALL and tagged with ``batch_index``. Cursors go through the same
+    NULL-safe keyset condition as single pages. The offsets are all None or all
+    set, since they follow from the table's schema.
+    """
+    parts, params = [], []
+    for index, (where, page_params, cursor, offset) in enumerate(pages):
+        sql, query_params = build_page_query(where, page_params, fields, cursor, limit, offset)
+        parts.append(f"SELECT {index} AS batch_index, q{index}.* FROM ({sql}) AS q{index}")
+        params.extend(query_params)
+    # UNION ALL does not preserve the derived tables' order, so sort the combined rows again
+    # (NULL start_times first, as within each page, so next_cursor stays valid)
+    order = ", ".join(("batch_index",) + (KEY_COLUMNS if pages[0][3] is None else OFFSET_ORDER))
+    return " UNION ALL ".join(parts) + f" ORDER BY {order}", tuple(params)
+
+
+def batch_payload(rows: List[Dict], offsets: Sequence[Optional[int]], fields: Optional[List[str]],
+                  limit: int) -> Dict:
+    """{"results": [page_payload, ...]} in the order the filters were given, one per page offset"""
+    grouped = [[] for _ in offsets]
+    for row in rows:
+        index = row.pop("batch_index")
+        grouped[int(index)].append(row)
+    return {"results": [page_payload(page_rows, fields, limit, offset)
+                        for page_rows, offset in zip(grouped, offsets)]}
+
+
+class NdjsonPager:
+    """Turns the ``limit + 1`` rows of build_page_query into NDJSON lines
+
+    One line per event; when there is another page, a final
+    ``{"next_cursor": ...}`` line follows the events.
+    """
+
+    def __init__(self, fields: Optional[List[str]], limit: int, offset: Optional[int] = None):
+        self.fields = fields
+        self.limit = limit
+        self.offset = offset
+        self.count = 0
+        self.last_row = None
+        self.has_more = False
+
+    def feed(self, row: Dict) -> Optional[bytes]:
+        if self.count >= self.limit:
+            self.has_more = True
+            return None
+        self.count += 1
+        self.last_row = row
+        return _line(project(row, self.fields))
+
+    def finish(self) -> Optional[bytes]:
+        if self.has_more and self.last_row is not None:
+            return _line({"next_cursor": next_cursor(self.last_row, self.offset, self.limit)})
+        return None
+
+    def error(self, err: Exception) -> bytes:
+        """Terminal line for a failure after the response started; the stream has no next_cursor"""
+        return _line({"error": str(err)})
+
+
+def _line(obj) -> bytes:
+    return json.dumps(jsonable_encoder(obj), ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
@@ -0,0 +1,177 @@
+"""Load test: sync (college.py) vs async (college_async.py) calendar endpoints
+
+Runs against a local MySQL-compatible stand-in configured through the usual
+TIDB_* variables, e.g. ``tiup playground`` (port 4000) or
+``docker run -e MYSQL_ROOT_PASSWORD=pw -e MYSQL_DATABASE=college -p 3306:3306 mysql:8``:
+
+    TIDB_HOST=127.0.0.1 TIDB_PORT=3306 TIDB_USER=root TIDB_PASSWORD=pw TIDB_DATABASE=college \\
+        python load_test.py --seed 2000 --concurrency 10 100 300
+
+Each app is started in its own single-worker uvicorn process. For every
+concurrency level the script reports throughput, latency percentiles and
+errors. ``--seed`` (re)creates a synthetic ``events`` table first. The event
+query cache is disabled unless ``--cache`` is given.
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import date, time as dtime, timedelta
+from pathlib import Path
+
+import httpx
+import mysql.connector
+
+from college import TIDB_CONFIG
+
+EVENT_TYPES = ["exam", "lecture", "holiday", "seminar", "workshop", "deadline", "sports", "cultural"]
+
+APPS = {"sync": "college:app", "async": "college_async:app"}
+
+
+def seed_events(rows: int):
+    """Create a synthetic events table with ``rows`` events spread over two academic years"""
+    conn = mysql.connector.connect(**TIDB_CONFIG)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS events")
+            cursor.execute("""
+                CREATE TABLE events (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    event_name VARCHAR(255) NOT NULL,
+                    event_type VARCHAR(64) NOT NULL,
+                    event_date DATE NOT NULL,
+                    start_time TIME,
+                    end_time TIME,
+                    location VARCHAR(255),
+                    description TEXT
+                )
+            """)
+            rng = random.Random(0)
+            start = date(2025, 7, 1)
+            values = []
+            for i in range(rows):
+                event_type = rng.choice(EVENT_TYPES)
+                hour = rng.randint(8, 17)
+                values.append((
+                    f"{event_type.title()} {i}",
+                    event_type if rng.random() < 0.8 else event_type.upper(),
+                    start + timedelta(days=rng.randint(0, 729)),
+                    dtime(hour, 0), dtime(hour + 1, 30),
+                    f"Room {rng.randint(100, 499)}",
+                    f"Synthetic {event_type} event for load testing",
+                ))
+            cursor.executemany(
+                "INSERT INTO events (event_name, event_type, event_date, start_time, end_time, location, description) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                values,
+            )
+        conn.commit()
+        print(f"Seeded {rows} events")
+    finally:
+        conn.close()
+
+
+def random_request(rng: random.Random):
+    """Mix of the two calendar lookups the agent makes: short ranges and by-type queries"""
+    if rng.random() < 0.6:
+        start = date(2025, 7, 1) + timedelta(days=rng.randint(0, 700))
+        end = start + timedelta(days=rng.choice([1, 7, 14, 30]))
+        return "/get_events_in_duration", {"start_date": start.isoformat(), "end_date": end.isoformat()}
+    return "/get_events_by_type", {"event_type": rng.choice(EVENT_TYPES)}
+
+
+def start_server(app: str, port: int, cache: bool) -> subprocess.Popen:
+    env = os.environ.copy()
+    if not cache:
+        # Every request reaches the database, so the comparison measures the driver path
+        env["EVENT_CACHE_TTL"] = "0"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--workers", "1", "--log-level", "warning"],
+        cwd=Path(__file__).resolve().parent,
+        env=env,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        if server.poll() is not None:
+            raise RuntimeError(f"{app} exited with code {server.returncode}")
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"{app} did not become healthy within 30s")
+
+
+async def run_level(base_url: str, concurrency: int, total_requests: int, timeout: float):
+    """Fire ``total_requests`` requests with at most ``concurrency`` in flight"""
+    latencies, errors = [], 0
+    rng = random.Random(concurrency)
+    requests = [random_request(rng) for _ in range(total_requests)]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        queue = iter(requests)
+
+        async def worker():
+            nonlocal errors
+            for path, params in queue:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path, params=params)
+                    if response.status_code != 200 or "error" in response.json():
+                        errors += 1
+                        continue
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def percentile(values, fraction):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the sync and async calendar APIs under load")
+    parser.add_argument("--seed", type=int, default=0, help="Recreate the events table with this many rows first")
+    parser.add_argument("--apps", nargs="+", choices=list(APPS), default=list(APPS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100, 300])
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per concurrency level")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--cache", action="store_true", help="Keep the event query cache enabled")
+    args = parser.parse_args()
+
+    if args.seed:
+        seed_events(args.seed)
+
+    print(f"{'app':6} {'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for name in args.apps:
+        server = start_server(APPS[name], args.port, args.cache)
+        try:
+            for concurrency in args.concurrency:
+                latencies, errors, elapsed = asyncio.run(
+                    run_level(f"http://127.0.0.1:{args.port}", concurrency, args.requests, args.timeout))
+                print(f"{name:6} {concurrency:>5} {len(latencies) / elapsed:>8.0f} "
+                      f"{percentile(latencies, 0.5) * 1e3:>8.1f} {percentile(latencies, 0.95) * 1e3:>8.1f} "
+                      f"{percentile(latencies, 0.99) * 1e3:>8.1f} {errors:>7}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
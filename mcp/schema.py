@@ -0,0 +1,80 @@
+import logging
+from typing import NamedTuple
+
+import mysql.connector
+
+log = logging.getLogger("tidb-api")
+
+# Columns added for indexing only; events_query.py keeps them out of API responses
+INTERNAL_COLUMNS = ("event_type_lc",)
+
+# Index-friendly layout for the events table. Each step is skipped when its column or index already exists.
+MIGRATIONS = [
+    # LOWER(event_type) in a WHERE clause cannot use an index; an indexed generated column can.
+    # VIRTUAL because TiDB cannot ALTER TABLE ADD a STORED generated column; the index stores the values.
+    ("column", "event_type_lc",
+     "ALTER TABLE events ADD COLUMN event_type_lc VARCHAR(255) "
+     "AS (LOWER(event_type)) VIRTUAL"),
+    ("index", "idx_events_type_lc",
+     "CREATE INDEX idx_events_type_lc ON events (event_type_lc, event_date, start_time)"),
+    # Serves BETWEEN on event_date with rows already in ORDER BY event_date, start_time order
+    ("index", "idx_events_date_time",
+     "CREATE INDEX idx_events_date_time ON events (event_date, start_time)"),
+]
+
+
+class SchemaState(NamedTuple):
+    indexed: bool  # the events table has the indexed event_type_lc lookup column
+    keyset: bool   # the events table has the `id` column keyset pagination orders by
+
+
+# Assumed when the schema cannot be inspected, as before the migrations existed
+UNCHECKED = SchemaState(indexed=False, keyset=True)
+
+
+def _exists(cursor, kind: str, name: str) -> bool:
+    if kind == "column":
+        cursor.execute(
+            "SELECT 1 FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'events' AND COLUMN_NAME = %s",
+            (name,),
+        )
+    else:
+        cursor.execute(
+            "SELECT 1 FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'events' AND INDEX_NAME = %s",
+            (name,),
+        )
+    return bool(cursor.fetchall())
+
+
+def migrate(conn, apply: bool = True) -> SchemaState:
+    """Apply missing MIGRATIONS (or only check, if not ``apply``) and report what the table supports"""
+    with conn.cursor() as cursor:
+        keyset = _exists(cursor, "column", "id")
+        if not keyset:
+            log.error("events table has no `id` column; paging events with LIMIT/OFFSET, "
+                      "which is slower and may repeat or skip events sharing a date and start time")
+        try:
+            for kind, name, ddl in MIGRATIONS:
+                if not apply or _exists(cursor, kind, name):
+                    continue
+                log.info(f"Migrating events table: adding {kind} {name}")
+                cursor.execute(ddl)
+        except mysql.connector.Error as err:
+            log.error(f"Could not migrate the events table, falling back to unindexed queries: {err}")
+            return SchemaState(False, keyset)
+        return SchemaState(_exists(cursor, "column", "event_type_lc"), keyset)
+
+
+def prepare_schema(config: dict, apply: bool = True) -> SchemaState:
+    """Connect once and migrate; a failed migration (e.g. no ALTER privilege) is logged and reported as unindexed"""
+    try:
+        conn = mysql.connector.connect(**config)
+        try:
+            return migrate(conn, apply)
+        finally:
+            conn.close()
+    except mysql.connector.Error as err:
+        log.error(f"Could not inspect the events table, falling back to unindexed queries: {err}")
+        return UNCHECKED